@@ -1,11 +1,64 @@
 #!/bin/bash
-# Scraper les données de Steam et les enregistrer dans un fichier CSV seulement si les fichiers sont manquants
-if [ -f "data/steam_search.csv" ]; then
+# Mode de scraping (SCRAPE_MODE) :
+#   skip        (défaut) scraper seulement si le fichier CSV est manquant
+#   incremental re-scraper en ne refaisant que les jeux dont la ligne de recherche a changé
+#   full        re-scraper tout le catalogue
+# Un scraping interrompu (conteneur arrêté, processus tué) reprend là où il s'était arrêté au lancement suivant
+# (CRAWL_RESUMABLE=0 pour repartir de zéro) : le CSV n'est écrit qu'une fois le scraping terminé.
+SCRAPE_MODE="${SCRAPE_MODE:-skip}"
+CRAWL_RESUMABLE="${CRAWL_RESUMABLE:-1}"
+# CRAWL_WORKERS > 1 : scraping réparti entre plusieurs processus (mode html, MONGO_URI obligatoire)
+if [ "$SCRAPE_MODE" = "skip" ] && [ -f "data/steam_search.csv" ]; then
     sleep 10
+    # Charger les données du CSV existant dans MongoDB
+    python steam_mongoDB.py
 else
-    scrapy crawl steam_search_spider -o data/steam_search.csv -t csv
+    if [ "$SCRAPE_MODE" = "incremental" ]; then
+        CRAWL_INCREMENTAL=1
+    else
+        CRAWL_INCREMENTAL=0
+    fi
+    # Export CSV facultatif (EXPORT_CSV=0 pour s'en passer), écrit à côté puis renommé à la fin du scraping.
+    # Après une reprise, les jeux déjà scrapés sont renvoyés à l'export : le fichier est complet.
+    FEED_OPTIONS=""
+    if [ "${EXPORT_CSV:-1}" = "1" ]; then
+        FEED_OPTIONS="-O data/steam_search.partial.csv"
+    fi
+    # Les pipelines écrivent les jeux dans MongoDB et Elasticsearch pendant le scraping (MONGO_URI, ELASTICSEARCH_URL)
+    if [ "${CRAWL_WORKERS:-1}" -gt 1 ]; then
+        # Scraping réparti entre CRAWL_WORKERS processus (frontière MongoDB, voir steam_project/frontier.py).
+        # L'identifiant du passage est gardé dans data/crawl_run jusqu'à sa fin : un passage interrompu est rejoint au lancement suivant.
+        [ -f data/crawl_run ] || date -u +%Y%m%d%H%M%S > data/crawl_run
+        CRAWL_RUN="$(cat data/crawl_run)"
+        # Un export par worker, complété (-o) d'un lancement à l'autre, puis fusionné en fin de passage
+        WORKER_FEED=()
+        if [ "${EXPORT_CSV:-1}" = "1" ]; then
+            WORKER_FEED=(-o "data/steam_search.partial.%(worker_name)s.csv")
+        fi
+        if python -m steam_project.frontier crawl --workers "$CRAWL_WORKERS" --run "$CRAWL_RUN" -- \
+            -s CRAWL_PROFILE="${CRAWL_PROFILE:-polite}" -s CRAWL_INCREMENTAL="$CRAWL_INCREMENTAL" "${WORKER_FEED[@]}"; then
+            rm data/crawl_run
+            PARTS=(data/steam_search.partial.*.csv)
+            if [ -f "${PARTS[0]}" ]; then
+                # Une ligne d'en-tête par lancement dans chaque export : seule la première est gardée
+                HEADER="$(head -n 1 "${PARTS[0]}")"
+                { echo "$HEADER"; cat "${PARTS[@]}" | grep -vxF "$HEADER"; } > data/steam_search.csv
+                rm "${PARTS[@]}"
+            fi
+        else
+            echo "Distributed crawl $CRAWL_RUN not finished, data/steam_search.csv left unchanged (it will resume on next start)."
+        fi
+    else
+        scrapy crawl steam_search_spider -s CRAWL_PROFILE="${CRAWL_PROFILE:-polite}" -s CRAWL_INCREMENTAL="$CRAWL_INCREMENTAL" \
+            -s CRAWL_RESUMABLE="$CRAWL_RESUMABLE" $FEED_OPTIONS
+        if [ -f "data/steam_search.partial.csv" ]; then
+            if [ "$CRAWL_RESUMABLE" != "1" ] || python -m steam_project.checkpoint --finished; then
+                mv data/steam_search.partial.csv data/steam_search.csv
+            else
+                echo "Crawl not finished, data/steam_search.csv left unchanged (it will resume on next start)."
+            fi
+        fi
+    fi
 fi
-# Charger les données dans MongoDB
-python steam_mongoDB.py
 # Lancer l'application Streamlit
-streamlit run Home.py --server.port=8501 --server.address=0.0.0.0
\ No newline at end of file
+streamlit run Home.py --server.port=8501 --server.address=0.0.0.0
@@ -1,8 +1,12 @@
+import math
+
 import streamlit as st
-import pymongo
 import pandas as pd
 import plotly.express as px
 
+from steam_project import repository
+from steam_project.dashboard import cache_sidebar
+
 st.set_page_config(page_title="Steam Scraper", page_icon="https://store.steampowered.com/favicon.ico", layout="wide")
 
 # Titre principal
@@ -30,30 +34,45 @@ ZERROUG Meliana - LEDEY Damien
 [Lien du projet GitHub](https://github.com/meliana-zerroug/test_data_eng.git)
             """)
 
-# MongoDB connexion 
-@st.cache_resource
-def get_database():
-    client = pymongo.MongoClient('mongodb://mongodb:27017/')
-    return client['projet']['steam_games']
-
-# Récupérer toutes les données
-@st.cache_data
-def load_data():
-    df = pd.read_csv('./steam_project/data/steam_search.csv')
-    # Vérifier que la colonne price existe, sinon ajouter une valeur par défaut
-    if 'price' not in df.columns:
-        df['price'] = 'N/A'
-    return df
+# Colonnes affichées : les autres ne sont pas lues
+HOME_COLUMNS = ["app_id", "title", "release", "review_text", "review_score", "review_count", "price", "tags"]
+PAGE_SIZES = [10, 25, 50, 100]
+
+
+def page_start(page, page_size):
+    # Dernier app_id connu avant la page demandée, et nombre de jeux à sauter depuis celui-ci
+    cursors = st.session_state["home_cursors"]
+    known = max([known for known in cursors if known < page], default=0)
+    return cursors.get(known), (page - 1 - known) * page_size
 
 st.sidebar.success("Sélectionnez une démo ci-dessus.")
 
-data_load_state = st.text('Chargement des données...')
+st.subheader('Données brutes extraites de Steam')
 
-collection = get_database()
-cur = collection.find({}, {'_id': 0})
-data = pd.DataFrame(list(cur))
+# Les requêtes sont mises en cache par chargement (voir steam_project/repository.py)
+load_id = repository.load_id()
+game_count = repository.game_count()
+page_size = st.selectbox("Jeux par page", PAGE_SIZES)
+page_count = max(math.ceil(game_count / page_size), 1)
 
-data_load_state.empty()
+# Les positions des pages déjà vues ne valent que pour un chargement et une taille de page
+signature = (load_id, page_size)
+if st.session_state.get("home_signature") != signature:
+    st.session_state["home_signature"] = signature
+    st.session_state["home_cursors"] = {}
+    st.session_state["home_page"] = 1
 
-st.subheader('Données brutes extraites de Steam')
-data_load_state = st.write(data.head(10))
\ No newline at end of file
+page = min(st.session_state.get("home_page", 1), page_count)
+st.session_state["home_page"] = page
+after_app_id, skip = page_start(page, page_size)
+# Une page de jeux triés par app_id : seules les colonnes affichées sont transférées, en un seul aller-retour.
+# Pagination par plage sur l'index unique app_id ; skip ne sert que pour sauter directement à une page lointaine
+games = repository.games_page(after_app_id, skip, page_size, HOME_COLUMNS)
+if games:
+    st.session_state["home_cursors"][page] = games[-1]["app_id"]
+
+st.write(f"{game_count} jeux, page {page} sur {page_count}.")
+st.dataframe(pd.DataFrame(games, columns=HOME_COLUMNS), hide_index=True, use_container_width=True)
+st.number_input("Page", min_value=1, max_value=page_count, key="home_page")
+
+cache_sidebar()
@@ -0,0 +1,7 @@
+# Scripts de mesure de performance, à lancer depuis le dossier steam_project :
+#
+#     python -m benchmarks.bench_mongo_queries
+#     python -m benchmarks.bench_spider_modes
+#     python -m benchmarks.bench_snapshot
+#     python -m benchmarks.bench_parse
+#     python -m benchmarks.bench_frontier
@@ -0,0 +1,74 @@
+# Débit du scraping réparti selon le nombre de workers.
+#
+# Pour chaque nombre de workers, un passage complet est lancé avec
+# steam_project.frontier (une frontière MongoDB locale, base projet_bench)
+# et rejoué sur un enregistrement (RECORDING_MODE=replay) : sans réseau ni
+# limitation de débit, seul le travail des workers (parsing, frontière,
+# écriture des jeux) est mesuré. Le tableau donne le débit global,
+# l'accélération et l'efficacité par rapport au premier passage.
+#
+#     python -m benchmarks.bench_frontier --workers 1 2 4 --games 10000
+#     python -m steam_project.frontier report --compare bench-...-w1,bench-...-w2   # comparaison relue plus tard
+
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+
+from scrapy.utils.project import get_project_settings
+
+from benchmarks.bench_parse import record_synthetic
+from steam_project.frontier import MongoFrontier, print_scaling, run_workers, scaling
+from steam_project.recordings import Recording
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Débit du scraping réparti pour plusieurs nombres de workers.")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://mongodb:27017/"))
+    parser.add_argument("--database", default="projet_bench")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--recording", default="benchmarks/results/recording", help="dossier d'enregistrement (RECORDING_DIR)")
+    parser.add_argument("--games", type=int, default=10_000, help="taille de l'enregistrement synthétique créé s'il n'existe pas")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--output", default="benchmarks/results/frontier.json")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    recording = Recording(args.recording)
+    if not len(recording):
+        print(f"No recording in {args.recording}, recording {args.games} synthetic games.")
+        recording = record_synthetic(args.recording, args.games, args.page_size)
+
+    # Chaque worker écrit dans la base de mesure, sans Elasticsearch ni état incrémental ni export
+    os.environ["MONGO_URI"] = args.mongo_uri
+    scrapy_args = [
+        "-s", f"MONGO_URI={args.mongo_uri}", "-s", f"MONGO_DATABASE={args.database}", "-s", "ELASTICSEARCH_URL=",
+        "-s", "RECORDING_MODE=replay", "-s", f"RECORDING_DIR={args.recording}", "-s", "SEARCH_MAX_PAGES=100000",
+        "-s", "CRAWL_STATE_FILE=", "-s", "CRAWL_REPORT_FILE=", "-s", "LOG_LEVEL=WARNING",
+    ]
+    prefix = datetime.now(timezone.utc).strftime("bench-%Y%m%d%H%M%S")
+    settings = get_project_settings()
+    settings.setdict({"MONGO_URI": args.mongo_uri, "MONGO_DATABASE": args.database, "CRAWL_WORKER": "bench"})
+
+    reports = []
+    for workers in args.workers:
+        run_id = f"{prefix}-w{workers}"
+        print(f"Run {run_id}: {workers} workers...")
+        codes = run_workers(run_id, workers, scrapy_args, worker_prefix=run_id)
+        settings.set("CRAWL_RUN", run_id)
+        report = MongoFrontier.from_settings(settings).report()
+        report["exit_codes"] = codes
+        reports.append(report)
+
+    rows = scaling(reports)
+    print_scaling(rows)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump({"responses": len(recording), "scaling": rows, "runs": reports}, file, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# Benchmark des requêtes MongoDB des pages Streamlit.
+#
+# Remplit une collection synthétique (1 000 000 de jeux par défaut) dans une
+# base dédiée, crée les index déclarés par le chargeur, puis exécute chaque
+# requête des pages en relevant son plan d'exécution (explain) et sa latence.
+#
+# Une requête censée utiliser un index qui se retrouve en COLLSCAN, ou dont la
+# latence dépasse celle d'une référence enregistrée, est signalée comme une
+# régression (code de sortie 1).
+#
+#     python -m benchmarks.bench_mongo_queries --size 1000000 --save-baseline benchmarks/mongo_baseline.json
+#     python -m benchmarks.bench_mongo_queries --baseline benchmarks/mongo_baseline.json
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import pymongo
+
+from benchmarks.synthetic import synthetic_games
+from steam_project.analytics import SUMMARIES, refresh_analytics
+from steam_project.mongo_indexes import ensure_indexes
+
+BENCH_LOAD_ID = "bench"
+HOME_PROJECTION = {"_id": 0, "app_id": 1, "title": 1, "release": 1, "review_text": 1, "review_score": 1,
+                   "review_count": 1, "price": 1, "tags": 1}
+
+# Requêtes des pages, dans leur forme actuelle. expect_index indique si la requête doit pouvoir s'appuyer sur un index.
+QUERIES = [
+    {"page": "Home", "name": "first_page", "expect_index": True,
+     "kind": "find", "filter": {}, "projection": HOME_PROJECTION, "sort": [("app_id", pymongo.ASCENDING)], "limit": 50},
+    {"page": "Home", "name": "range_page", "expect_index": True,
+     "kind": "find", "filter": {"$or": [{"app_id": {"$gt": 500_000}}, {"app_id": {"$type": "string"}}]}, "projection": HOME_PROJECTION,
+     "sort": [("app_id", pymongo.ASCENDING)], "limit": 50},
+
+    # Agrégats précalculés par le chargeur, puis lus par la page Interprétation
+    *[{"page": "Chargement", "name": name.replace("analytics_", ""), "expect_index": False,
+       "kind": "aggregate", "pipeline": pipeline} for name, pipeline in SUMMARIES.items()],
+    *[{"page": "Interprétation", "name": name.replace("analytics_", ""), "expect_index": True,
+       "kind": "find", "collection": name, "filter": {"load_id": BENCH_LOAD_ID}, "projection": {"_id": 0, "load_id": 0}}
+      for name in SUMMARIES],
+
+    # La page Recherche n'interroge qu'Elasticsearch (et la collection loads pour le load_id)
+    {"page": "Recherche", "name": "load_id", "expect_index": True,
+     "kind": "find", "collection": "loads", "filter": {"_id": "steam_games"}, "projection": {"load_id": 1}},
+
+    {"page": "Exemple", "name": "random_games", "expect_index": False,
+     "kind": "aggregate", "pipeline": [{'$sample': {'size': 5}}]},
+    {"page": "Exemple", "name": "worst_rated", "expect_index": True,
+     "kind": "find", "filter": {"review_score": {"$type": "number"}}, "sort": [("review_score", pymongo.ASCENDING)], "limit": 5},
+    {"page": "Exemple", "name": "top_tags", "expect_index": False,
+     "kind": "aggregate", "pipeline": [
+         {'$project': {'tags': 1}}, {'$unwind': "$tags"},
+         {'$group': {'_id': "$tags", 'count': {'$sum': 1}}}, {'$sort': {'count': -1}}, {'$limit': 10}]},
+    {"page": "Exemple", "name": "title_search", "expect_index": True,
+     "kind": "find", "filter": {"$text": {"$search": "sport"}}, "projection": {"score": {"$meta": "textScore"}},
+     "sort": [("score", {"$meta": "textScore"})], "limit": 10},
+]
+
+# ================== Exécution et plans d'exécution ==========================
+def run_query(database, query):
+    collection = database[query.get("collection", "steam_games")]
+    if query["kind"] == "find":
+        cursor = collection.find(query["filter"], query.get("projection"))
+        if query.get("sort"):
+            cursor = cursor.sort(query["sort"])
+        if query.get("limit"):
+            cursor = cursor.limit(query["limit"])
+        return list(cursor)
+    if query["kind"] == "aggregate":
+        return list(collection.aggregate(query["pipeline"], allowDiskUse=True))
+    raise ValueError(f"Unknown query kind {query['kind']!r} (expected find or aggregate)")
+
+
+def explain_query(database, query):
+    collection = database[query.get("collection", "steam_games")]
+    if query["kind"] == "find":
+        command = {"find": collection.name, "filter": query["filter"]}
+        if query.get("projection"):
+            command["projection"] = query["projection"]
+        if query.get("sort"):
+            command["sort"] = dict(query["sort"])
+        if query.get("limit"):
+            command["limit"] = query["limit"]
+    elif query["kind"] == "aggregate":
+        command = {"aggregate": collection.name, "pipeline": query["pipeline"], "cursor": {}}
+    else:
+        raise ValueError(f"Unknown query kind {query['kind']!r} (expected find or aggregate)")
+    return collection.database.command("explain", command, verbosity="queryPlanner")
+
+
+def plan_stages(node, stages=None):
+    # Toutes les étapes du plan retenu (les plans rejetés sont ignorés)
+    stages = [] if stages is None else stages
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "rejectedPlans":
+                continue
+            if key == "stage" and isinstance(value, str):
+                stages.append(value)
+            else:
+                plan_stages(value, stages)
+    elif isinstance(node, list):
+        for item in node:
+            plan_stages(item, stages)
+    return stages
+
+
+def measure(database, query, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = run_query(database, query)
+        timings.append((time.perf_counter() - started) * 1000)
+    stages = plan_stages(explain_query(database, query))
+    return {
+        "page": query["page"],
+        "name": query["name"],
+        "stages": sorted(set(stages)),
+        "collscan": "COLLSCAN" in stages,
+        "expect_index": query["expect_index"],
+        "results": len(results),
+        "median_ms": round(statistics.median(timings), 2),
+        "max_ms": round(max(timings), 2),
+    }
+
+# ================== Données synthétiques ====================================
+def populate(database, size, batch_size, force):
+    collection = database['steam_games']
+    if not force and collection.estimated_document_count() == size:
+        print(f"Reusing {size} synthetic games in {collection.full_name}.")
+    else:
+        collection.drop()
+        started = time.perf_counter()
+        batch = []
+        for game in synthetic_games(size):
+            batch.append(game)
+            if len(batch) == batch_size:
+                collection.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            collection.insert_many(batch, ordered=False)
+        print(f"Inserted {size} synthetic games in {time.perf_counter() - started:.1f}s.")
+    ensure_indexes(collection)
+    for name in SUMMARIES:
+        database[name].drop()
+    refresh_analytics(database, BENCH_LOAD_ID)
+
+# ================== Programme principal =====================================
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    reference = {(row["page"], row["name"]): row for row in baseline}
+    for row in results:
+        if row["expect_index"] and row["collscan"]:
+            regressions.append(f"{row['page']}/{row['name']}: COLLSCAN ({', '.join(row['stages'])})")
+        previous = reference.get((row["page"], row["name"]))
+        if previous and row["median_ms"] > previous["median_ms"] * (1 + tolerance):
+            regressions.append(f"{row['page']}/{row['name']}: {row['median_ms']} ms (baseline {previous['median_ms']} ms)")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Plans d'exécution et latences des requêtes des pages sur une collection synthétique.")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://mongodb:27017/"))
+    parser.add_argument("--database", default="projet_bench")
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--force", action="store_true", help="regénère la collection même si elle a déjà la bonne taille")
+    parser.add_argument("--output", default="benchmarks/results/mongo_queries.json")
+    parser.add_argument("--baseline", help="rapport de référence à comparer")
+    parser.add_argument("--save-baseline", help="enregistre aussi le rapport comme nouvelle référence")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="hausse de latence médiane tolérée par rapport à la référence")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    database = pymongo.MongoClient(args.mongo_uri)[args.database]
+    populate(database, args.size, args.batch_size, args.force)
+
+    results = [measure(database, query, args.repeat) for query in QUERIES]
+    for row in results:
+        print(f"{row['page']:<15} {row['name']:<15} {row['median_ms']:>10.2f} ms  {'COLLSCAN' if row['collscan'] else 'index':<9} {', '.join(row['stages'])}")
+
+    baseline = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["queries"]
+    regressions = find_regressions(results, baseline, args.tolerance)
+
+    report = {"size": args.size, "repeat": args.repeat, "queries": results, "regressions": regressions}
+    for path in filter(None, [args.output, args.save_baseline]):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
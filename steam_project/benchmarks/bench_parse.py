@@ -0,0 +1,175 @@
+# Benchmark du parsing du spider sur un enregistrement de réponses.
+#
+# Les callbacks parse et parse_hover sont rejoués sur les réponses d'un
+# enregistrement (voir steam_project/recordings.py), sans réseau ni moteur
+# Scrapy : les réponses sont chargées en mémoire avant la mesure, seul le
+# temps passé dans les callbacks est compté. Pour chaque callback on relève
+# le nombre de jeux traités par seconde et le temps CPU par jeu.
+#
+# Sans enregistrement réel, un enregistrement synthétique est créé à partir de
+# benchmarks.fixtures (même balisage que les pages Steam).
+#
+#     scrapy crawl steam_search_spider -s RECORDING_MODE=record -s SEARCH_MAX_PAGES=20    # enregistrement réel
+#     python -m benchmarks.bench_parse --recording data/recordings --save-baseline benchmarks/parse_baseline.json
+#     python -m benchmarks.bench_parse --recording data/recordings --baseline benchmarks/parse_baseline.json
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+
+import scrapy
+from scrapy.crawler import Crawler
+from scrapy.settings import Settings
+from scrapy.statscollectors import MemoryStatsCollector
+
+from benchmarks.fixtures import Fixtures
+from steam_project.recordings import Recording
+from steam_project.spiders.steam_search_spider import SteamSearchSpiderSpider
+
+
+def make_spider(max_pages):
+    settings = Settings()
+    settings.setmodule("steam_project.settings")
+    settings.set("SEARCH_MAX_PAGES", max_pages)
+    # Pas d'état persistant : tous les hovers sont demandés
+    settings.set("CRAWL_STATE_FILE", None)
+    # Crawler sans moteur : seulement les réglages et les stats lus par les callbacks
+    crawler = Crawler(SteamSearchSpiderSpider, settings)
+    crawler.stats = MemoryStatsCollector(crawler)
+    return SteamSearchSpiderSpider.from_crawler(crawler)
+
+
+def record_synthetic(directory, games, page_size):
+    # Parcours complet du spider sur les réponses synthétiques, chaque réponse est enregistrée
+    fixtures = Fixtures(games, page_size)
+    recording = Recording(directory)
+    spider = make_spider(-(-games // page_size))
+    queue = deque(spider.start_requests())
+    while queue:
+        request = queue.popleft()
+        response = fixtures.route(request)
+        recording.save(response)
+        callback = request.callback or spider.parse
+        queue.extend(result for result in callback(response, **request.cb_kwargs) if isinstance(result, scrapy.Request))
+    return recording
+
+
+def replay(recording, max_pages):
+    # Un passage complet : les requêtes émises par le spider sont servies par l'enregistrement
+    spider = make_spider(max_pages)
+    responses = {url: recording.response(url) for url in recording.urls()}
+    cpu = Counter()
+    wall = Counter()
+    calls = Counter()
+    games = Counter()
+    missing = 0
+
+    queue = deque(spider.start_requests())
+    while queue:
+        request = queue.popleft()
+        recorded = responses.get(request.url)
+        if recorded is None:
+            missing += 1
+            continue
+        # Nouvel objet à chaque passage : le texte décodé mis en cache par la réponse n'est pas réutilisé
+        response = recorded.replace(request=request)
+        callback = request.callback or spider.parse
+        name = callback.__name__
+
+        started_wall, started_cpu = time.perf_counter(), time.process_time()
+        results = list(callback(response, **request.cb_kwargs))
+        wall[name] += time.perf_counter() - started_wall
+        cpu[name] += time.process_time() - started_cpu
+        calls[name] += 1
+
+        for result in results:
+            if isinstance(result, scrapy.Request):
+                queue.append(result)
+                # Une requête hover émise par parse correspond à une ligne de jeu traitée
+                if result.callback == spider.parse_hover:
+                    games[name] += 1
+            else:
+                games[name] += 1
+    return {name: {"calls": calls[name], "games": games[name], "wall_s": wall[name], "cpu_s": cpu[name]} for name in calls}, missing
+
+
+def best_of(recording, max_pages, repeat):
+    # Meilleur passage par callback : le moins perturbé par le reste de la machine
+    best = {}
+    missing = 0
+    for _ in range(repeat):
+        run, missing = replay(recording, max_pages)
+        for name, row in run.items():
+            if name not in best or row["cpu_s"] < best[name]["cpu_s"]:
+                best[name] = row
+    results = []
+    for name, row in best.items():
+        results.append({
+            "callback": name,
+            "calls": row["calls"],
+            "games": row["games"],
+            "games_per_s": round(row["games"] / row["wall_s"], 1) if row["wall_s"] else None,
+            "cpu_ms_per_game": round(row["cpu_s"] * 1000 / row["games"], 4) if row["games"] else None,
+            "cpu_ms_per_call": round(row["cpu_s"] * 1000 / row["calls"], 4),
+        })
+    return results, missing
+
+
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    reference = {row["callback"]: row for row in baseline}
+    for row in results:
+        previous = reference.get(row["callback"])
+        if previous and previous["cpu_ms_per_game"] and row["cpu_ms_per_game"] > previous["cpu_ms_per_game"] * (1 + tolerance):
+            regressions.append(f"{row['callback']}: {row['cpu_ms_per_game']} CPU ms per game (baseline {previous['cpu_ms_per_game']})")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Débit et temps CPU par jeu des callbacks du spider sur un enregistrement.")
+    parser.add_argument("--recording", default="benchmarks/results/recording", help="dossier d'enregistrement (RECORDING_DIR)")
+    parser.add_argument("--games", type=int, default=10_000, help="taille de l'enregistrement synthétique créé s'il n'existe pas")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--max-pages", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", help="rapport de référence à comparer")
+    parser.add_argument("--save-baseline", help="enregistre aussi le rapport comme nouvelle référence")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="hausse du temps CPU par jeu tolérée par rapport à la référence")
+    parser.add_argument("--output", default="benchmarks/results/parse.json")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    recording = Recording(args.recording)
+    if not len(recording):
+        print(f"No recording in {args.recording}, recording {args.games} synthetic games.")
+        recording = record_synthetic(args.recording, args.games, args.page_size)
+
+    results, missing = best_of(recording, args.max_pages, args.repeat)
+    print(f"{len(recording)} recorded responses, {missing} requests not in the recording.")
+    print(f"{'callback':<18} {'calls':>7} {'games':>7} {'games/s':>10} {'CPU ms/game':>12} {'CPU ms/call':>12}")
+    for row in results:
+        print(f"{row['callback']:<18} {row['calls']:>7} {row['games']:>7} {row['games_per_s']:>10} {row['cpu_ms_per_game']:>12} {row['cpu_ms_per_call']:>12}")
+
+    baseline = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["callbacks"]
+    regressions = find_regressions(results, baseline, args.tolerance)
+
+    report = {"recording": args.recording, "responses": len(recording), "repeat": args.repeat, "callbacks": results, "regressions": regressions}
+    for path in filter(None, [args.output, args.save_baseline]):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
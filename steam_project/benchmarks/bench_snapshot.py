@@ -0,0 +1,119 @@
+# Benchmark de lecture du catalogue : CSV contre instantané Parquet.
+#
+# Pour chaque taille, le même catalogue synthétique est écrit en CSV (format
+# de l'export Scrapy) et en instantané Parquet, puis relu dans un processus
+# neuf pour mesurer le temps de chargement, la mémoire occupée par le
+# DataFrame chargé (RSS après chargement moins RSS avant) et la RSS maximale :
+#
+#   - csv              pd.read_csv du fichier entier, comme l'ancienne page d'accueil
+#   - parquet          instantané entier
+#   - parquet_columns  seulement les colonnes de la page d'accueil
+#   - parquet_filtered colonnes de la page d'accueil, jeux sortis depuis 2020 à 10€ au plus
+#
+#     python -m benchmarks.bench_snapshot --sizes 10000,100000,1000000
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_games
+from steam_project.snapshot import read_snapshot, write_snapshot
+
+HOME_COLUMNS = ["app_id", "title", "release", "review_text", "review_score", "review_count", "price", "tags"]
+FILTERS = [("release_year", ">=", 2020), ("price_eur", "<=", 10)]
+CASES = ["csv", "parquet", "parquet_columns", "parquet_filtered"]
+
+
+def write_files(size, directory):
+    csv_path = os.path.join(directory, f"steam_{size}.csv")
+    snapshot = os.path.join(directory, f"snapshot_{size}")
+    if not os.path.exists(csv_path):
+        # Tags joints par des virgules et date en texte, comme dans l'export Scrapy
+        chunk = []
+        for game in synthetic_games(size):
+            chunk.append({**game, "tags": ",".join(game["tags"]), "release": f"{game['release']:%d %b, %Y}"})
+            if len(chunk) == 100_000:
+                pd.DataFrame(chunk).to_csv(csv_path, mode="a", header=not os.path.exists(csv_path), index=False)
+                chunk = []
+        if chunk:
+            pd.DataFrame(chunk).to_csv(csv_path, mode="a", header=not os.path.exists(csv_path), index=False)
+    if not os.path.exists(os.path.join(snapshot, "current")):
+        write_snapshot(synthetic_games(size), "current", snapshot)
+    return csv_path, os.path.join(snapshot, "current")
+
+
+def current_rss_mb():
+    # Deuxième champ de /proc/self/statm : pages résidentes (Linux)
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * resource.getpagesize() / 2**20
+
+
+def load(case, csv_path, snapshot, results):
+    # Exécuté dans un processus neuf : les mesures ne dépendent que de ce chargement
+    baseline_mb = current_rss_mb()
+    started = time.perf_counter()
+    if case == "csv":
+        df = pd.read_csv(csv_path)
+    elif case == "parquet":
+        df = read_snapshot(snapshot)
+    elif case == "parquet_columns":
+        df = read_snapshot(snapshot, columns=HOME_COLUMNS)
+    else:
+        df = read_snapshot(snapshot, columns=HOME_COLUMNS, filters=FILTERS)
+    elapsed = time.perf_counter() - started
+    # ru_maxrss est exprimé en Ko sous Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put({"seconds": round(elapsed, 3), "rows": len(df), "load_rss_mb": round(current_rss_mb() - baseline_mb, 1),
+                 "peak_rss_mb": round(peak_mb, 1)})
+
+
+def measure(case, csv_path, snapshot):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=load, args=(case, csv_path, snapshot, results))
+    process.start()
+    row = results.get()
+    process.join()
+    return row
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Temps de chargement et mémoire du catalogue en CSV et en Parquet.")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--directory", default="benchmarks/results/snapshot_data")
+    parser.add_argument("--keep-files", action="store_true", help="garde les fichiers générés pour les exécutions suivantes")
+    parser.add_argument("--output", default="benchmarks/results/snapshot.json")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.makedirs(args.directory, exist_ok=True)
+    results = []
+    print(f"{'rows':>9} {'case':<17} {'seconds':>8} {'rows read':>10} {'load RSS MB':>12} {'peak RSS MB':>12} {'file MB':>8}")
+    for size in [int(size) for size in args.sizes.split(",")]:
+        csv_path, snapshot = write_files(size, args.directory)
+        sizes_mb = {
+            "csv": os.path.getsize(csv_path) / 2**20,
+            "parquet": sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(snapshot) for name in names) / 2**20,
+        }
+        for case in CASES:
+            row = {"size": size, "case": case, **measure(case, csv_path, snapshot),
+                   "file_mb": round(sizes_mb["csv" if case == "csv" else "parquet"], 1)}
+            results.append(row)
+            print(f"{size:>9} {case:<17} {row['seconds']:>8.3f} {row['rows']:>10} {row['load_rss_mb']:>12.1f} {row['peak_rss_mb']:>12.1f} {row['file_mb']:>8.1f}")
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    if not args.keep_files:
+        shutil.rmtree(args.directory)
+
+
+if __name__ == "__main__":
+    main()
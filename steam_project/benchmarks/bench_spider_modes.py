@@ -0,0 +1,91 @@
+# Benchmark des deux modes du spider sur des réponses enregistrées.
+#
+# Le spider est rejoué hors ligne : chaque requête émise reçoit sa réponse
+# depuis benchmarks.fixtures, et seul le temps passé dans les callbacks du
+# spider est mesuré. On compare pour chaque mode le nombre de requêtes HTTP
+# nécessaires, le débit de traitement (requêtes par seconde hors réseau) et le
+# temps CPU par jeu.
+#
+#     python -m benchmarks.bench_spider_modes --games 10000
+
+import argparse
+import json
+import os
+import time
+from collections import deque
+
+import scrapy
+from scrapy.crawler import Crawler
+from scrapy.settings import Settings
+from scrapy.statscollectors import MemoryStatsCollector
+
+from benchmarks.fixtures import Fixtures
+from steam_project.spiders.steam_search_spider import SteamSearchSpiderSpider
+
+
+def replay(fixtures, mode, max_pages):
+    settings = Settings()
+    settings.setmodule("steam_project.settings")
+    settings.set("SEARCH_MAX_PAGES", max_pages)
+    # Pas d'état persistant : chaque mode refait toutes ses requêtes
+    settings.set("CRAWL_STATE_FILE", None)
+    # Crawler sans moteur : seulement les réglages et les stats lus par les callbacks
+    crawler = Crawler(SteamSearchSpiderSpider, settings)
+    crawler.stats = MemoryStatsCollector(crawler)
+    spider = SteamSearchSpiderSpider.from_crawler(crawler, mode=mode)
+
+    queue = deque(spider.start_requests())
+    requests = items = 0
+    wall = cpu = 0.0
+    while queue:
+        request = queue.popleft()
+        response = fixtures.route(request)
+        requests += 1
+        callback = request.callback or spider.parse
+
+        started_wall, started_cpu = time.perf_counter(), time.process_time()
+        results = list(callback(response, **request.cb_kwargs))
+        wall += time.perf_counter() - started_wall
+        cpu += time.process_time() - started_cpu
+
+        for result in results:
+            if isinstance(result, scrapy.Request):
+                queue.append(result)
+            else:
+                items += 1
+    return {
+        "mode": mode,
+        "requests": requests,
+        "items": items,
+        "requests_per_item": round(requests / items, 3) if items else None,
+        "parse_s": round(wall, 3),
+        "requests_per_s": round(requests / wall, 1) if wall else None,
+        "cpu_ms_per_item": round(cpu * 1000 / items, 3) if items else None,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare les modes html et json du spider sur des réponses enregistrées.")
+    parser.add_argument("--games", type=int, default=10_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--output", default="benchmarks/results/spider_modes.json")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    fixtures = Fixtures(args.games, args.page_size)
+    max_pages = -(-args.games // args.page_size)
+
+    results = [replay(fixtures, mode, max_pages) for mode in ("html", "json")]
+    print(f"{'mode':<6} {'requests':>9} {'items':>7} {'req/item':>9} {'req/s':>9} {'CPU ms/item':>12}")
+    for row in results:
+        print(f"{row['mode']:<6} {row['requests']:>9} {row['items']:>7} {row['requests_per_item']:>9} {row['requests_per_s']:>9} {row['cpu_ms_per_item']:>12}")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump({"games": args.games, "page_size": args.page_size, "modes": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# Réponses Steam enregistrées pour rejouer le spider hors ligne.
+#
+# Les pages sont reconstruites à partir des jeux synthétiques, avec le même
+# balisage que les pages réelles (lignes search_result_row, hover app_tag,
+# fragment results_html de l'API de recherche, réponses JSON de l'API du
+# magasin). route() renvoie la réponse correspondant à une requête du spider.
+
+import json
+from html import escape
+from urllib.parse import parse_qs, unquote, urlparse
+
+from scrapy.http import HtmlResponse, TextResponse
+
+from benchmarks.synthetic import TAGS, synthetic_games
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+TAG_IDS = {tag: 1000 + index for index, tag in enumerate(TAGS)}
+
+
+def search_row(game):
+    review = ""
+    if game["review_count"]:
+        tooltip = f"{game['review_text']}<br>{game['review_score']}% of the {game['review_count']:,} user reviews for this game are positive."
+        review = f'<span class="search_review_summary positive" data-tooltip-html="{escape(tooltip)}"></span>'
+    release = game["release"]
+    price = "" if game["price_eur"] == 0 else f'<div class="discount_final_price">{game["price"]}</div>'
+    return (
+        f'<a href="https://store.steampowered.com/app/{game["app_id"]}/" data-ds-appid="{game["app_id"]}" class="search_result_row ds_collapse_flag">'
+        f'<div class="search_capsule"><img src="{game["thumbnail_link"]}"></div>'
+        f'<div class="responsive_search_name_combined"><div class="col search_name ellipsis"><span class="title">{escape(game["title"])}</span></div>'
+        f'<div class="search_released responsive_secondrow">{release.day} {MONTHS[release.month - 1]}, {release.year}</div>'
+        f'<div class="search_reviewscore responsive_secondrow">{review}</div>'
+        f'<div class="col search_price_discount_combined responsive_secondrow"><div class="discount_block">{price}</div></div></div></a>'
+    )
+
+
+def search_page(games, page, total):
+    start = (page - 1) * len(games) + 1
+    rows = "\n".join(search_row(game) for game in games)
+    return (
+        '<html><head><title>Steam Search</title></head><body><div id="search_resultsRows">'
+        f'{rows}</div><div class="search_pagination"><div class="search_pagination_left">'
+        f'showing {start} - {start + len(games) - 1} of {total:,}</div></div></body></html>'
+    )
+
+
+def search_results(games, start, total):
+    return json.dumps({"success": 1, "start": start, "total_count": total,
+                       "results_html": "\n".join(search_row(game) for game in games)})
+
+
+def hover_page(game):
+    tags = "".join(f'<div class="app_tag">{escape(tag)}</div>' for tag in game["tags"])
+    return (
+        f'<div class="hover_app"><h4 class="hover_title">{escape(game["title"])}</h4>'
+        f'<div class="hover_body"><div class="hover_tag_row">{tags}</div></div></div>'
+    )
+
+
+def tag_list():
+    return json.dumps({"response": {"version_hash": "1", "tags": [{"tagid": tag_id, "name": tag} for tag, tag_id in TAG_IDS.items()]}})
+
+
+def store_items(games):
+    return json.dumps({"response": {"store_items": [
+        {"appid": game["app_id"], "success": 1, "visible": True, "name": game["title"],
+         "tags": [{"tagid": TAG_IDS[tag], "weight": 1000 - rank} for rank, tag in enumerate(game["tags"])]}
+        for game in games
+    ]}})
+
+
+class Fixtures:
+    # Catalogue synthétique de `count` jeux, découpé en pages de `page_size`
+
+    def __init__(self, count, page_size=100, seed=42):
+        self.games = list(synthetic_games(count, seed))
+        self.by_app_id = {str(game["app_id"]): game for game in self.games}
+        self.page_size = page_size
+
+    def page_games(self, start):
+        return self.games[start:start + self.page_size]
+
+    def route(self, request):
+        url = urlparse(request.url)
+        query = parse_qs(url.query)
+        if url.path == "/search":
+            page = int(query["page"][0])
+            body = search_page(self.page_games((page - 1) * self.page_size), page, len(self.games))
+            return HtmlResponse(url=request.url, body=body, encoding="utf-8", request=request)
+        if url.path.startswith("/apphoverpublic/"):
+            body = hover_page(self.by_app_id[unquote(url.path.rsplit("/", 1)[1])])
+            return HtmlResponse(url=request.url, body=body, encoding="utf-8", request=request)
+        if url.path == "/search/results/":
+            start = int(query["start"][0])
+            body = search_results(self.page_games(start), start, len(self.games))
+            return TextResponse(url=request.url, body=body, encoding="utf-8", request=request)
+        if url.path.startswith("/IStoreService/GetTagList"):
+            return TextResponse(url=request.url, body=tag_list(), encoding="utf-8", request=request)
+        if url.path.startswith("/IStoreBrowseService/GetItems"):
+            ids = [item["appid"] for item in json.loads(query["input_json"][0])["ids"]]
+            body = store_items([self.by_app_id[str(app_id)] for app_id in ids])
+            return TextResponse(url=request.url, body=body, encoding="utf-8", request=request)
+        raise ValueError(f"No fixture for {request.url}")
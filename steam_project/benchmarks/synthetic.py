@@ -0,0 +1,57 @@
+# Génération de jeux Steam synthétiques pour les benchmarks.
+#
+# Les documents ont la même forme que ceux écrits par le chargeur (champs
+# normalisés) et des distributions proches des données réelles : beaucoup de
+# jeux bon marché, des notes centrées autour de 80%, quelques tags très
+# fréquents et une longue traîne.
+
+import random
+from datetime import datetime, timedelta
+
+TAGS = [
+    "Indépendant", "Jeu solo", "Action", "Aventure", "Casual", "Simulation", "Stratégie", "RPG",
+    "2D", "3D", "Multijoueur", "Atmosphère", "Puzzle", "Exploration", "Pixel Art", "Coloré",
+    "Horreur", "Survie", "Monde ouvert", "Coop", "Coop en ligne", "Plateforme", "Tir", "FPS",
+    "Roguelike", "Roguelite", "Sport", "Course", "Science-fiction", "Fantasy", "Anime", "VR",
+    "Gestion", "Construction", "Tour par tour", "Jeu de cartes", "Metroidvania", "Visual Novel",
+    "JcJ", "JcE", "Free-to-play", "Accès anticipé", "Difficile", "Mignon", "Riche en récits",
+]
+WORDS = [
+    "Dark", "Space", "Legend", "Quest", "Simulator", "Tales", "Kingdom", "Shadow", "Star", "Racing",
+    "Sport", "Dungeon", "Island", "City", "Hero", "Zombie", "Farm", "Craft", "Escape", "Night",
+    "Football", "Empire", "Souls", "Tower", "Defense", "Builder", "Odyssey", "Chronicles", "Rogue", "Drift",
+]
+REVIEW_TEXTS = [(95, "Overwhelmingly Positive"), (80, "Very Positive"), (70, "Mostly Positive"),
+                (40, "Mixed"), (20, "Mostly Negative"), (0, "Overwhelmingly Negative")]
+PRICES = [0.0, 0.99, 2.99, 4.99, 7.99, 9.99, 14.99, 19.99, 24.99, 29.99, 39.99, 49.99, 59.99, 69.99, 79.99, 99.99]
+PRICE_WEIGHTS = [12, 6, 10, 12, 9, 10, 8, 8, 5, 5, 4, 3, 3, 2, 1, 1]
+# Un jeu sur BUNDLE_EVERY est un lot, avec un app_id composé comme sur Steam ("377160,435870")
+BUNDLE_EVERY = 250
+
+
+def synthetic_game(rng, app_id):
+    score = min(100, max(0, int(rng.gauss(78, 14))))
+    count = int(rng.paretovariate(1.1) * 10)
+    price_eur = rng.choices(PRICES, PRICE_WEIGHTS)[0]
+    tags = rng.sample(TAGS[:12], 4) + rng.sample(TAGS[12:], rng.randint(2, 10))
+    return {
+        "app_id": app_id,
+        "title": " ".join(rng.sample(WORDS, rng.randint(1, 4))) + f" {app_id}",
+        "thumbnail_link": f"https://shared.fastly.steamstatic.com/store_item_assets/steam/apps/{app_id}/capsule_231x87.jpg",
+        "release": datetime(2005, 1, 1) + timedelta(days=rng.randint(0, 7500)),
+        "review_text": next(text for threshold, text in REVIEW_TEXTS if score >= threshold),
+        "review_score": score,
+        "review_count": count,
+        "price": "Gratuit" if price_eur == 0 else f"{price_eur:.2f}€".replace(".", ","),
+        "price_eur": price_eur,
+        "tags": tags,
+    }
+
+
+def synthetic_games(count, seed=42):
+    rng = random.Random(seed)
+    for app_id in range(10, 10 + count):
+        if app_id % BUNDLE_EVERY == 0:
+            yield synthetic_game(rng, f"{app_id},{app_id + 1}")
+        else:
+            yield synthetic_game(rng, app_id)
@@ -1,22 +1,47 @@
+import time
+from datetime import date
+from functools import partial
+
 import streamlit as st
-import pymongo
 import pandas as pd
 import plotly.express as px
 
+from steam_project import repository
+from steam_project.dashboard import cache_sidebar
+
 st.set_page_config(page_title="Exploration des données", page_icon="https://store.steampowered.com/favicon.ico", layout="wide")
 
 # ================== Connexion à la base de données MongoDB ==================
-@st.cache_resource
-def get_database():
-    client = pymongo.MongoClient('mongodb://mongodb:27017/')
-    database = client['projet']
-    collection = database['steam_games']
-    return collection
-
-collection = get_database()
+# Client partagé par toutes les pages et toutes les sessions (voir steam_project/repository.py)
+
+# Les agrégats de cette page sont précalculés à chaque chargement des données (voir steam_project/analytics.py) :
+# on ne lit que de petites collections de synthèse, quelle que soit la taille du catalogue
+load_id = repository.load_id()
+page_started = time.perf_counter()
+
+# Sections de la page : agrégat lu et paramètres de lecture
+SUMMARIES = {
+    "tags":        ("analytics_tag_counts", {"sort": [('count', -1)], "limit": 25}),         # Les 25 tags les plus fréquents
+    "prices":      ("analytics_price_buckets", {"sort": [('key', 1)]}),                     # Nombre de jeux par fourchette de 10€
+    "scores":      ("analytics_score_buckets", {"sort": [('key', 1)]}),                     # Nombre de jeux par fourchette de note
+    "tag_scores":  ("analytics_tag_scores", {"sort": [('average_review_score', -1)]}),      # Note moyenne par tag
+    "price_scores": ("analytics_price_scores", {"sort": [('average_review_score', -1)]}),   # Note moyenne par fourchette de prix
+}
 
 st.title("Interprétation des données Steam Scraper")
 
+if load_id is None:
+    st.info("Les statistiques seront disponibles à la fin du premier chargement des données.")
+    cache_sidebar()
+    st.stop()
+
+# Les cinq lectures partent en parallèle dès maintenant : le texte de la page s'affiche pendant ce temps et
+# chaque graphique est dessiné dès que sa propre requête répond (voir la boucle en fin de page)
+results = repository.run_concurrently({
+    section: partial(repository.summary, name, load_id, **options) for section, (name, options) in SUMMARIES.items()
+})
+charts = {}
+
 st.markdown("""
             ---
             Sur cette page, nous allons explorer les données que nous avons collectées à partir de Steam. 
@@ -34,17 +59,11 @@ st.markdown("""
 # ================== Analyse des catégories de jeux les plus populaires ==================
 st.header("Catégories de jeux les plus populaires")
 
-cur = collection.aggregate([
-    { '$match':     { 'tags': { '$type': 'string' } } },            # On vérifie que le champ tags est bien une chaîne de caractères
-    { '$project':   { 'tags': { '$split': ["$tags", ","] } } },     # On divise les tags en une liste
-    { '$unwind':    "$tags" },                                      # On décompose la liste pour avoir un document par tag
-    { '$group':     { '_id': "$tags" , 'count': { '$sum': 1 } } },  # On groupe par tag et on compte le nombre de jeux par tag
-    { '$sort':      { 'count': -1 } },                              # On trie par nombre de jeux décroissant
-    { '$limit':     25 }                                            # On limite à 25 résultats
-])
+def tags_chart(cur):
+    df = pd.DataFrame(list(cur))
+    st.bar_chart(data=df, x='key', y='count')
 
-df = pd.DataFrame(list(cur))
-st.bar_chart(data=df, x='_id', y='count')
+charts["tags"] = (st.empty(), tags_chart)
 
 st.markdown("""
             Nous pouvons voir que les catégories les plus populaires sont jeu solo, action et aventure. 
@@ -61,36 +80,13 @@ st.markdown("---")
 # ============================ Analyse des prix des jeux ==============================
 st.header("Analyse des prix des jeux")
 
-# On récupère le nombre de jeux par fourchette de prix
-
-cur = collection.aggregate([
-    { '$addFields': {
-        'price_cleaned': {
-            '$cond': {
-                'if': { '$eq': ["$price", "Gratuit"] }, 
-                'then': 0, 
-
-                'else': {
-                    '$toDouble': {
-                        '$replaceOne': {
-                            'input': {
-                                '$replaceOne': { 
-                                    'input': "$price", 
-                                    'find': "€", 
-                                    'replacement': "" 
-                                }
-                            },
-                            'find': ",", 
-                            'replacement': "." 
-    }}}}}}},
-    { '$match':     { 'price_cleaned': { '$type': 'number' } } },                                                                       # On vérifie que le champ price_cleaned est bien un nombre
-    { '$bucket':    { 'groupBy': "$price_cleaned", 'boundaries': [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 1000], 'default': "others" } },   # On regroupe les prix par fourchette de 10€
-])
-df = pd.DataFrame(list(cur))
-
-df.drop(df[df['_id'] == "others"].index, inplace=True)
-
-st.bar_chart(data=df, x='_id', y='count')
+# Nombre de jeux par fourchette de prix
+def prices_chart(cur):
+    df = pd.DataFrame(list(cur))
+    df.drop(df[df['key'] == "others"].index, inplace=True)
+    st.bar_chart(data=df, x='key', y='count')
+
+charts["prices"] = (st.empty(), prices_chart)
 
 st.markdown("""
             Nous pouvons voir que la grande majorité des jeux sont gratuits ou à moins de 10€. 
@@ -107,16 +103,13 @@ st.markdown("---")
 # ============================ Analyse des notes des jeux ==============================
 st.header("Analyse des notes des jeux")
 
-# On récupère le nombre de jeux par fourchette de note
-cur = collection.aggregate([
-    { '$match':     { 'review_score': { '$type': 'number' } } },                                                           # On vérifie que le champ review_score est bien un nombre
-    { '$bucket':    { 'groupBy': "$review_score", 'boundaries': [0, 20, 40, 60, 80, 90, 95, 100], 'default': "100+" } },   # On regroupe les notes par fourchette de 20%
-])
-df = pd.DataFrame(list(cur))
-
-df.drop(df[df['_id'] == "100+"].index, inplace=True)
+# Nombre de jeux par fourchette de note
+def scores_chart(cur):
+    df = pd.DataFrame(list(cur))
+    df.drop(df[df['key'] == "100+"].index, inplace=True)
+    st.bar_chart(data=df, x='key', y='count')
 
-st.bar_chart(data=df, x='_id', y='count')
+charts["scores"] = (st.empty(), scores_chart)
 
 st.markdown("""
             Nous observons une homogénénéité, avec une gausienne, dans les notes autour de 80%. 
@@ -128,26 +121,20 @@ st.markdown("---")
 # ============================ Analyse des liens entre tags et notes ==============================
 st.header("Analyse des liens entre les catégories et les notes")
 
-cur = collection.aggregate([
-    { '$match':     { 'tags': { '$type': 'string' } } },            # On vérifie que le champ tags est bien une chaîne de caractères
-    { '$project':   { 'tags': { '$split': ["$tags", ","] }, 'review_score': { '$convert': { 'input': "$review_score", 'to': "int", 'onError': None, 'onNull': None } } } },     # On divise les tags en une liste et on conserve le score de review
-    { '$unwind':    "$tags" },                                      # On décompose la liste pour avoir un document par tag
-    { '$group':     { '_id': "$tags" , 'count': { '$sum': 1 }, 'average_review_score': { '$avg': "$review_score" } } },  # On groupe par tag et on compte le nombre de jeux par tag et on calcule la moyenne des notes
-    { '$sort':      { 'average_review_score': -1 } }                # On trie par popularité moyenne décroissante
-])
-
-cur_list = list(cur)
-df1 = pd.DataFrame(cur_list[:10])
-df2 = pd.DataFrame(cur_list[-10:])
-
-# On affiche les 10 catégories les mieux notées et les 10 catégories les moins bien notées dans deux colonnes différentes pour les comparer facilement
-col1, col2 = st.columns(2)
-with col1:
-    st.subheader("Catégories les mieux notées")
-    st.bar_chart(data=df1, x='_id', y='average_review_score')
-with col2:
-    st.subheader("Catégories les moins bien notées")
-    st.bar_chart(data=df2, x='_id', y='average_review_score')
+def tag_scores_chart(cur_list):
+    df1 = pd.DataFrame(cur_list[:10])
+    df2 = pd.DataFrame(cur_list[-10:])
+
+    # On affiche les 10 catégories les mieux notées et les 10 catégories les moins bien notées dans deux colonnes différentes pour les comparer facilement
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Catégories les mieux notées")
+        st.bar_chart(data=df1, x='key', y='average_review_score')
+    with col2:
+        st.subheader("Catégories les moins bien notées")
+        st.bar_chart(data=df2, x='key', y='average_review_score')
+
+charts["tag_scores"] = (st.empty(), tag_scores_chart)
 
 st.markdown("""
             Ces données nous permettent de voir quelles sont les catégories dans lesquelles les jeux recoivent les meilleures et les pires notes.
@@ -159,37 +146,67 @@ st.markdown("---")
 # ============================ Analyse des liens entre prix et notes ==============================
 st.header("Analyse des liens entre les prix et les notes")
 
-cur = collection.aggregate([
-    { '$addFields': {
-        'price_cleaned': {
-            '$cond': {
-                'if': { '$eq': ["$price", "Gratuit"] }, 
-                'then': 0, 
-
-                'else': {
-                    '$toDouble': {
-                        '$replaceOne': {
-                            'input': {
-                                '$replaceOne': { 
-                                    'input': "$price", 
-                                    'find': "€", 
-                                    'replacement': "" 
-                                }
-                            },
-                            'find': ",", 
-                            'replacement': "." 
-    }}}}}, 'review_score': { '$convert': { 'input': "$review_score", 'to': "int", 'onError': None, 'onNull': None } }
-    }},
-    { '$match':     { 'price_cleaned': { '$type': 'number' }, 'review_score': { '$type': 'number' } } },                                                                       # On vérifie que le champ price_cleaned est bien un nombre et que review_score est bien un entier
-    { '$bucket':    { 'groupBy': "$price_cleaned", 'boundaries': [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 1000], 'default': "others",
-                     'output': { 'average_review_score': { '$avg': "$review_score" }, 'count': { '$sum': 1 } } } },   # On regroupe les prix par fourchette de 10€
-    { '$sort':      { 'average_review_score': -1 } }
-])
-
-df = pd.DataFrame(list(cur))
-df.drop(df[df['_id'] == "others"].index, inplace=True)
-st.bar_chart(data=df, x='_id', y='average_review_score')
+def price_scores_chart(cur):
+    df = pd.DataFrame(list(cur))
+    df.drop(df[df['key'] == "others"].index, inplace=True)
+    st.bar_chart(data=df, x='key', y='average_review_score')
+
+charts["price_scores"] = (st.empty(), price_scores_chart)
 
 st.markdown("""
             Nous voyons ques les jeux les mieux notés sont les jeux à 80-90€ et à 10-20€.
-            """)
\ No newline at end of file
+            """)
+
+st.markdown("---")
+
+# ============================ Évolution par année de sortie ==============================
+st.header("Évolution des jeux selon leur année de sortie")
+
+# Lu dans l'instantané Parquet du chargement : seules les partitions des années choisies et trois colonnes sont lues.
+# cache_resource partage le DataFrame mappé en mémoire entre les sessions ; un nouveau load_id change la clé du cache
+@st.cache_resource(max_entries=8)
+def release_years(load_id, first_year, last_year):
+    return repository.catalogue(load_id, ["release_year", "review_score", "price_eur"],
+                                [("release_year", ">=", first_year), ("release_year", "<=", last_year)])
+
+first_year, last_year = st.slider("Années de sortie", 1997, date.today().year, (2010, date.today().year))
+catalogue = release_years(load_id, first_year, last_year)
+if catalogue is None:
+    st.info("L'instantané du catalogue sera disponible à la fin du prochain chargement des données.")
+else:
+    by_year = catalogue.groupby("release_year").agg(
+        jeux=("release_year", "size"), note_moyenne=("review_score", "mean"), prix_median=("price_eur", "median"),
+    ).reset_index()
+    by_year = by_year.astype({"release_year": "int64", "jeux": "int64", "note_moyenne": "float64", "prix_median": "float64"})
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Nombre de jeux")
+        st.bar_chart(data=by_year, x="release_year", y="jeux")
+    with col2:
+        st.subheader("Note moyenne et prix médian (€)")
+        st.line_chart(data=by_year, x="release_year", y=["note_moyenne", "prix_median"])
+
+st.markdown("""
+            Le nombre de jeux publiés chaque année augmente fortement depuis l'ouverture de Steam aux petits studios,
+            alors que la note moyenne et le prix médian restent assez stables.
+            """)
+
+# ============================ Affichage des graphiques ==============================
+# Chaque graphique remplace son emplacement dès que sa requête répond, dans l'ordre d'arrivée
+for placeholder, _ in charts.values():
+    placeholder.caption("Chargement...")
+
+timings = {}
+for section, rows, seconds in results:
+    placeholder, chart = charts[section]
+    with placeholder.container():
+        chart(rows)
+        st.caption(f"Requête {SUMMARIES[section][0]} : {seconds * 1000:.0f} ms")
+    timings[section] = {"requête (ms)": round(seconds * 1000, 1), "affiché à (ms)": round((time.perf_counter() - page_started) * 1000, 1)}
+
+with st.sidebar.expander("Temps des requêtes"):
+    st.dataframe(pd.DataFrame.from_dict(timings, orient="index"), use_container_width=True)
+    st.write(f"Premier graphique après {min(row['affiché à (ms)'] for row in timings.values()):.0f} ms, "
+             f"page complète après {(time.perf_counter() - page_started) * 1000:.0f} ms.")
+
+cache_sidebar()
@@ -1,107 +1,63 @@
-import os
-import re
+import json
+import math
+import time
 
 import pandas as pd
-import pymongo
 import streamlit as st
-from elasticsearch import Elasticsearch
-
-def clean_price(price_str):
-    if price_str is None:
-        return 0.0
-    if isinstance(price_str, (int, float)):
-        return float(price_str)
-    if not isinstance(price_str, str):
-        return 0.0
-    lower_price = price_str.lower()
-    if "gratuit" in lower_price or "free" in lower_price:
-        return 0.0
-    match = re.findall(r"[0-9]+(?:[.,][0-9]+)?", price_str)
-    if not match:
-        return 0.0
-    clean = match[0].replace(",", ".")
-    try:
-        return float(clean)
-    except ValueError:
-        return 0.0
-
-
-def clean_avis_count(avis_str):
-    if not isinstance(avis_str, str):
-        return 0
-    clean = ''.join(filter(str.isdigit, avis_str))
-    return int(clean) if clean else 0
+from elasticsearch.exceptions import NotFoundError
 
+from steam_project import repository
+from steam_project.dashboard import cache_sidebar
 
 st.set_page_config(page_title="Recherche", page_icon="https://store.steampowered.com/favicon.ico", layout="wide")
 
 DEFAULT_MAX_PRICE = 60
+SUGGESTIONS = 8
+
+# Taille maximale de la fenêtre from/size d'Elasticsearch (index.max_result_window)
+MAX_RESULT_WINDOW = 10000
+PIT_KEEP_ALIVE = "5m"
+# Seuls les champs affichés sont transférés
+SOURCE_FIELDS = ["app_id", "thumbnail_link", "title", "review_score", "review_count", "price"]
+# Tris possibles, tous calculés par Elasticsearch sur des champs numériques ou keyword
+SORTS = {
+    "Pertinence": ["_score"],
+    "Note": [{"review_score": "desc"}],
+    "Nombre d'avis": [{"review_count": "desc"}],
+    "Prix croissant": [{"price_eur": "asc"}],
+    "Titre": [{"title.sort": "asc"}],
+}
+
+# On garde que les catégories les + pertinentes (sinon il y en a trop)
+WHITELIST = [ #catégories récupérées sur steam 
+    "Action", "Aventure", "RPG", "Stratégie", "Simulation", 
+    "Sport", "Course", "Casse-tête", "Combat", "Plateforme",
+    "FPS", "Tir", "Moba", "Battle Royale", "Metroidvania", 
+    "Roguelike", "Roguelite", "Hack 'n' Slash", "Point & Click", 
+    "Horreur", "Horreur psychologique", "Survie", "Infiltration", 
+    "Rythme", "Visual Novel", "Beat Them All", "Tower Defense",
+    "Science-fiction", "Cyberpunk", "Fantasy", "Médiéval", 
+    "Postapocalyptique", "Espace", "Zombies", "Guerre", 
+    "Historique", "Western", "Monde ouvert", "Bac à sable",
+    "Multijoueur", "Coop", "Coop en ligne", "MMORPG", 
+    "JcJ", "JcE", "2D", "3D", "Pixel Art", "Rétro", "Anime", "VR",
+    "Gestion", "Construction", "Tour par tour", "Stratégie en temps réel",
+    "Jeu de cartes", "Construction de decks", "Physique"
+]
+
+# Nombre de jeux par catégorie, calculé par Elasticsearch sur le champ keyword "tags"
+TAGS_AGGREGATION = {"terms": {"field": "tags", "include": WHITELIST, "size": len(WHITELIST)}}
 
-# MongoDB connexion
-@st.cache_resource
-def get_database():
-    client = pymongo.MongoClient('mongodb://mongodb:27017/')
-    return client['projet']['steam_games']
-
-collection = get_database()
-
-
-@st.cache_data
-# On définit une fonction qui filtre les catégories pour garder que les catégories les + pertinentes (sinon il y en a trop) et on nettoie 
-def get_tags_list():
-    WHITELIST = [ #catégories récupérées sur steam 
- 
-        "Action", "Aventure", "RPG", "Stratégie", "Simulation", 
-        "Sport", "Course", "Casse-tête", "Combat", "Plateforme",
-        "FPS", "Tir", "Moba", "Battle Royale", "Metroidvania", 
-        "Roguelike", "Roguelite", "Hack 'n' Slash", "Point & Click", 
-        "Horreur", "Horreur psychologique", "Survie", "Infiltration", 
-        "Rythme", "Visual Novel", "Beat Them All", "Tower Defense",
-        "Science-fiction", "Cyberpunk", "Fantasy", "Médiéval", 
-        "Postapocalyptique", "Espace", "Zombies", "Guerre", 
-        "Historique", "Western", "Monde ouvert", "Bac à sable",
-        "Multijoueur", "Coop", "Coop en ligne", "MMORPG", 
-        "JcJ", "JcE", "2D", "3D", "Pixel Art", "Rétro", "Anime", "VR",
-        "Gestion", "Construction", "Tour par tour", "Stratégie en temps réel",
-        "Jeu de cartes", "Construction de decks", "Physique"
-    ]
-    
-    try:
-        raw_tags = collection.distinct("tags")
-    except Exception:
-        return sorted(WHITELIST)
-    
-    existing_clean_tags = set()
-    
-    for item in raw_tags:
-        if isinstance(item, list):
-            for t in item:
-                if isinstance(t, str):
-                    clean_t = t.strip() # On enlève les espaces 
-                    if clean_t in WHITELIST:
-                        existing_clean_tags.add(clean_t)
-                        
-        elif isinstance(item, str):
-            # On découpe à chaque virgule
-            splitted = item.split(',')
-            for t in splitted:
-                clean_t = t.strip() # On enlève les espaces 
-                if clean_t in WHITELIST:
-                    existing_clean_tags.add(clean_t)
-    
-    if not existing_clean_tags:
-        return sorted(WHITELIST)
-        
-    return sorted(list(existing_clean_tags))
 
+def get_tags_vocabulary():
+    # Mis en cache par le dépôt jusqu'au prochain chargement
+    response = repository.search_games({"size": 0, "aggs": {"tags": TAGS_AGGREGATION}})
+    return tag_counts(response)
 
-@st.cache_resource
-def get_elasticsearch():
-    es_host = os.getenv("ES_HOST", "elasticsearch")
-    es_port = os.getenv("ES_PORT", "9200")
-    return Elasticsearch(f"http://{es_host}:{es_port}")
 
-es = get_elasticsearch()
+def tag_counts(response):
+    return {bucket["key"]: bucket["doc_count"] for bucket in response["aggregations"]["tags"]["buckets"]}
+
 
 with st.sidebar:
     st.header("Filtres")
@@ -115,12 +71,9 @@ with st.sidebar:
     include_free = st.checkbox("Inclure les jeux gratuits", value=True)    
     st.divider()
     
-    # filtre catégories
-    try:
-        tags_list = get_tags_list()
-    except Exception:
-        tags_list = []
-    selected_tags = st.multiselect("Catégories", tags_list)
+    # filtre catégories : la liste est affichée après la recherche, avec le nombre de résultats de chaque catégorie
+    tags_placeholder = st.empty()
+    selected_tags = st.session_state.get("selected_tags", [])
 
     #potentiel meilleurs jeux à découvrir 
 
@@ -131,116 +84,230 @@ with st.sidebar:
 
 
 st.title("Recherche")
-query = st.text_input("Rechercher un jeu", placeholder="Ex: action, sport...")
+autocomplete = st.toggle("Autocomplétion des titres", value=True,
+                         help="La saisie ne propose que des titres ; la recherche complète part avec le bouton Rechercher ou en choisissant un titre.")
+
 
-col1, col2 = st.columns([3, 1])
+def choose_suggestion(title):
+    # Titre choisi : il remplace la saisie et lance la recherche complète
+    st.session_state["search_input"] = title
+    st.session_state["search_text"] = title
+
+
+def submit_search():
+    st.session_state["search_text"] = st.session_state["search_input"]
+
+
+typed = st.text_input("Rechercher un jeu", placeholder="Ex: action, sport...", key="search_input")
+if not autocomplete or not typed:
+    # Sans autocomplétion, chaque saisie validée lance la recherche complète ; une saisie vidée efface la recherche
+    st.session_state["search_text"] = typed
+else:
+    st.button("Rechercher", on_click=submit_search)
+
+# Suggestions de titres pendant la saisie, tant qu'elle n'a pas été envoyée à la recherche complète :
+# suggesteur "completion" d'Elasticsearch, les préfixes fréquents restent en mémoire
+if autocomplete and typed and typed != st.session_state.get("search_text"):
+    try:
+        started = time.perf_counter()
+        suggestions = repository.suggest_titles(typed, SUGGESTIONS, repository.load_id())
+        elapsed = (time.perf_counter() - started) * 1000
+        for suggestion in suggestions:
+            image_col, title_col = st.columns([1, 8])
+            if suggestion.get("thumbnail_link"):
+                image_col.image(suggestion["thumbnail_link"], width=80)
+            title_col.button(suggestion["title"], key=f"suggestion_{suggestion['app_id']}",
+                             on_click=choose_suggestion, args=(suggestion["title"],))
+        if suggestions:
+            st.caption(f"{len(suggestions)} suggestions en {elapsed:.1f} ms.")
+        else:
+            st.caption("Aucun titre ne commence par cette saisie.")
+    except Exception as exc:
+        st.error(f"Elasticsearch indisponible: {exc}")
+
+# Texte de la recherche complète : la dernière saisie envoyée (ou choisie parmi les suggestions)
+query = st.session_state.get("search_text", "")
+
+col1, col2, col3 = st.columns([3, 1, 1])
 
 with col1:
-    limit_val = st.slider("Nombre de résultats", 10, 200, 50)
+    page_size = st.slider("Nombre de résultats par page", 10, 200, 50)
 
 with col2:
+    sort_label = st.selectbox("Trier par", list(SORTS))
+
+with col3:
     show_all = st.checkbox("Voir TOUT")
 
-if show_all:
-    limit = 10000
-else:
-    limit = limit_val
 
-if query or max_price != DEFAULT_MAX_PRICE or selected_tags or show_all:
-    try:
-        search_query = {
-            "bool": {
-                "must": [],
-                "filter": [],
-                "must_not": []
-            }
+def build_search_query():
+    search_query = {
+        "bool": {
+            "must": [],
+            "filter": [],
+            "must_not": []
         }
+    }
 
-        # Si l'utilisateur a écrit quelque chose on gère le texte : 
-        if query:
-            search_query["bool"]["must"].append({
-                "multi_match": {
-                    "query": query,
-                    "fields": ["title^3", "tags", "review_text"],
-                    "fuzziness": "AUTO"
-                }
-            })
-        else:
-            # Si pas de mot clé mais des filtres alors on prend tout 
-            search_query["bool"]["must"].append({"match_all": {}})
+    # Si l'utilisateur a écrit quelque chose on gère le texte : 
+    if query:
+        search_query["bool"]["must"].append({
+            "multi_match": {
+                "query": query,
+                "fields": ["title^3", "title.prefix", "tags", "review_text"],
+                "fuzziness": "AUTO"
+            }
+        })
+    else:
+        # Si pas de mot clé mais des filtres alors on prend tout 
+        search_query["bool"]["must"].append({"match_all": {}})
 
-        
-        # On gère les tags sélectionnés
-        for tag in selected_tags:
-            search_query["bool"]["filter"].append({"match": {"tags": tag}})
+    # On gère les tags sélectionnés
+    for tag in selected_tags:
+        search_query["bool"]["filter"].append({"term": {"tags": tag}})
 
+    # Tous les filtres sont appliqués par Elasticsearch sur les champs numériques : on ne transfère que la page affichée
+    if include_free:
+        search_query["bool"]["filter"].append({"range": {"price_eur": {"lte": max_price}}})
+    else:
+        search_query["bool"]["filter"].append({"range": {"price_eur": {"gt": 0, "lte": max_price}}})
 
-        # On recupere plus de resultats pour que le filtrage prix ne reduise pas trop notre affichage
-        fetch_size = 10000 if show_all else 3000
+    # filtre meilleurs jeux pas connus 
+    if show_hidden_games:
+        search_query["bool"]["filter"] += [{"range": {"review_score": {"gte": 90}}}, {"range": {"review_count": {"lt": 2000}}}]
+    #filtre meilleurs jeux et connus 
+    elif show_best_games:
+        search_query["bool"]["filter"] += [{"range": {"review_score": {"gte": 95}}}, {"range": {"review_count": {"gt": 50000}}}]
+    #filtre jeux bruyants 
+    elif jeux_bruits:
+        search_query["bool"]["filter"] += [{"range": {"review_score": {"gt": 40, "lt": 75}}}, {"range": {"review_count": {"gt": 10000}}}]
 
-        response = es.search(
-            index="steam_games",
-            size=fetch_size,
-            query=search_query,
-        )
-        
+    return search_query
+
+
+def search_page(search_query, page):
+    offset = (page - 1) * page_size
+    # Le nombre de résultats par catégorie est calculé dans la même requête que la page
+    body = {"query": search_query, "size": page_size, "track_total_hits": True, "_source": SOURCE_FIELDS,
+            "sort": SORTS[sort_label], "aggs": {"tags": TAGS_AGGREGATION}}
+
+    # Pages courantes : from/size suffit tant qu'on reste dans la fenêtre de 10 000 résultats d'Elasticsearch
+    if offset + page_size <= MAX_RESULT_WINDOW:
+        return repository.search_games({**body, "from": offset})
+
+    # Pages profondes : search_after sur un point-in-time, en repartant de la dernière page déjà parcourue
+    cursors = st.session_state["search_cursors"]
+    if not st.session_state.get("search_pit"):
+        st.session_state["search_pit"] = repository.open_search_pit(PIT_KEEP_ALIVE)
+
+    start = max([known for known in cursors if known < page], default=0)
+    for current in range(start + 1, page + 1):
+        # Les pages intermédiaires ne servent qu'à obtenir les valeurs de tri de leur dernier résultat
+        paged_body = {**body, "pit": {"id": st.session_state["search_pit"], "keep_alive": PIT_KEEP_ALIVE}}
+        if current != page:
+            paged_body["_source"] = False
+            del paged_body["aggs"]
+        if cursors.get(current - 1):
+            paged_body["search_after"] = cursors[current - 1]
+        response = repository.search_games_pit(paged_body)
+        st.session_state["search_pit"] = response.get("pit_id", st.session_state["search_pit"])
+        hits = response["hits"]["hits"]
+        if not hits:
+            # Résultats épuisés avant la page demandée : les pages intermédiaires n'ont pas d'agrégations
+            return response if current == page else None
+        cursors[current] = hits[-1]["sort"]
+    return response
+
+
+def reset_paging(signature):
+    # Nouvelle recherche : on revient à la première page et on libère le point-in-time de la précédente
+    if st.session_state.get("search_pit"):
+        try:
+            repository.close_search_pit(st.session_state["search_pit"])
+        except Exception:
+            pass
+    st.session_state["search_signature"] = signature
+    st.session_state["search_page"] = 1
+    st.session_state["search_cursors"] = {}
+    st.session_state["search_pit"] = None
+
+
+facet_counts = None
+if query or max_price != DEFAULT_MAX_PRICE or selected_tags or show_all:
+    try:
+        search_query = build_search_query()
+        signature = json.dumps(search_query, sort_keys=True) + f"|{page_size}|{sort_label}"
+        if st.session_state.get("search_signature") != signature:
+            reset_paging(signature)
+
+        if show_hidden_games:
+            st.info("Seuls les jeux très bien notés mais pas connus sont affichés.")
+        elif show_best_games:
+            st.success("Les meilleurs jeux")
+        elif jeux_bruits:
+            st.warning("Jeux qui divisent les joueurs")
+
+        page = st.session_state.get("search_page", 1)
+        try:
+            response = search_page(search_query, page)
+        except NotFoundError:
+            # Point-in-time expiré : on le rouvre et on reparcourt depuis le début
+            reset_paging(signature)
+            response = search_page(search_query, page)
+        if response is None:
+            # Page au-delà des résultats (les données ont changé entre temps) : retour à la première page
+            reset_paging(signature)
+            st.rerun()
+
+        total = response["hits"]["total"]["value"]
+        facet_counts = tag_counts(response)
         hits = [hit.get("_source", {}) for hit in response.get("hits", {}).get("hits", [])]
         
         if hits:
             df = pd.DataFrame(hits)
-            
             df["lien_steam"] = "https://store.steampowered.com/app/" + df["app_id"].astype(str)
-            df["price_val"] = df["price"].apply(clean_price)
-            
-            df["review_count_val"] = df["review_total"].apply(clean_avis_count)
-            
-            if include_free:
-                df = df[ (df["price_val"] <= max_price) ]
-            else:
-                df = df[ (df["price_val"] <= max_price) & (df["price_val"] > 0) ]
-
-            # filtre meilleurs jeux pas connus 
-            if show_hidden_games:
-                df = df[(df["review_score"] >= 90) & (df["review_count_val"] < 2000)]
-                st.info("Seuls les jeux très bien notés mais pas connus sont affichés.")
-            
-            #filtre meilleurs jeux et connus 
-            elif show_best_games:
-                df = df[ (df["review_score"] >= 95) & (df["review_count_val"] > 50000) ]
-                st.success("Les meilleurs jeux")
-            
-            #filtre jeux bruyants 
-            elif jeux_bruits:
-                df = df[ (df["review_score"] > 40) & (df["review_score"] < 75) & (df["review_count_val"] > 10000) ]
-                st.warning("Jeux qui divisent les joueurs")
 
-            nb_restants = len(df)
-            
-            if nb_restants > 0:
-                # On limite l'affichage au nombre demande par l'utilisateur
-                df = df.head(limit)
-                st.write(f"{len(df)} résultats affichés (après filtres).")
-                
-                st.dataframe(
-                    df,
-                    column_order=["thumbnail_link", "title", "review_score", "review_total", "price", "lien_steam"],
-                    hide_index=True,
-                    column_config={
-                        "thumbnail_link": st.column_config.ImageColumn("Image"),
-                        "title": st.column_config.TextColumn("Titre", width="medium"),
-                        "review_score": st.column_config.NumberColumn("Note", format="%d%%"),
-                        "review_total": st.column_config.TextColumn("Nb Avis"), 
-                        "price": st.column_config.TextColumn("Prix"),
-                        "lien_steam": st.column_config.LinkColumn("Lien Steam", display_text="Voir la page")
-                    },
-                    use_container_width=True
-                )
-            else:
-                st.warning(f"Aucun jeu trouvé en dessous de {max_price}€ avec ces critères.")
+            page_count = math.ceil(total / page_size)
+            st.write(f"{total} résultats, page {page} sur {page_count}.")
+
+            st.dataframe(
+                df,
+                column_order=["thumbnail_link", "title", "review_score", "review_count", "price", "lien_steam"],
+                hide_index=True,
+                column_config={
+                    "thumbnail_link": st.column_config.ImageColumn("Image"),
+                    "title": st.column_config.TextColumn("Titre", width="medium"),
+                    "review_score": st.column_config.NumberColumn("Note", format="%d%%"),
+                    "review_count": st.column_config.NumberColumn("Nb Avis"),
+                    "price": st.column_config.TextColumn("Prix"),
+                    "lien_steam": st.column_config.LinkColumn("Lien Steam", display_text="Voir la page")
+                },
+                use_container_width=True
+            )
+            st.number_input("Page", min_value=1, max_value=max(page_count, 1), key="search_page")
+        elif total == 0:
+            st.warning(f"Aucun jeu trouvé en dessous de {max_price}€ avec ces critères.")
         else:
-            st.info("Aucun résultat.")
+            # Page au-delà des résultats (les données ont changé entre temps) : retour à la première page
+            st.session_state["search_page"] = 1
+            st.rerun()
             
     except Exception as exc:
         st.error(f"Elasticsearch indisponible: {exc}")
 else:
-    st.caption("Saisir un mot clé ou utiliser les filtres pour lancer la recherche.")
\ No newline at end of file
+    st.caption("Saisir un mot clé ou utiliser les filtres pour lancer la recherche.")
+
+# Liste des catégories : nombre de résultats de la recherche en cours, ou du catalogue entier sans recherche
+try:
+    vocabulary = get_tags_vocabulary()
+except Exception:
+    vocabulary = {}
+counts = facet_counts if facet_counts is not None else vocabulary
+tags_placeholder.multiselect(
+    "Catégories",
+    sorted(set(vocabulary or WHITELIST) | set(selected_tags)),
+    key="selected_tags",
+    format_func=lambda tag: f"{tag} ({counts[tag]})" if tag in counts else tag,
+)
+
+cache_sidebar()
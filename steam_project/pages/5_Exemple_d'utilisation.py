@@ -1,19 +1,14 @@
 import pandas as pd
-import pymongo
 import streamlit as st
 import plotly.express as px
 
+from steam_project import repository
+from steam_project.dashboard import cache_sidebar
+
 st.set_page_config(page_title="Example d'utilisation", page_icon="https://store.steampowered.com/favicon.ico", layout="wide")
 
 # ================== Connexion à la base de données MongoDB ==================
-@st.cache_resource
-def get_database():
-    client = pymongo.MongoClient('mongodb://mongodb:27017/')
-    database = client['projet']
-    collection = database['steam_games']
-    return collection
-
-collection = get_database()
+# Les requêtes de cette page sont écrites dans steam_project/repository.py, avec un client partagé par toutes les pages
 
 # ================== Vérification que les données existent ===================
 #df_ks = pd.read_csv('./data/steam_search.csv')
@@ -29,7 +24,7 @@ collection = get_database()
 def format_data(cur):
     # Putting the result in a dataframe for better display
     df = pd.DataFrame(list(cur))
-    df = df[['thumbnail_link', 'title', 'release', 'price', 'review_score', 'review_total', 'app_id']]
+    df = df[['thumbnail_link', 'title', 'release', 'price', 'review_score', 'review_count', 'app_id']]
 
     # Transforming df
     df['app_id'] = df['app_id'].apply(lambda x: f"https://store.steampowered.com/app/{x}")
@@ -45,7 +40,7 @@ def format_data(cur):
             "release": "Date de sortie",
             "price": "Prix",
             "review_score": "Note",
-            "review_total": "Nombre d'avis",
+            "review_count": "Nombre d'avis",
             "app_id": st.column_config.LinkColumn(
                 "Lien Steam", help="Lien vers la page Steam du jeu",
             ),
@@ -73,7 +68,7 @@ st.markdown("""
             """)
 
 # Afficher 5 jeux quelconques
-cur = collection.aggregate([{'$sample': {'size': 5}}])
+cur = repository.random_games(5)
 
 format_data(cur)
     
@@ -86,7 +81,7 @@ st.markdown("""
             """)
 
 # Triage des jeux par note croissante et affichage des 5 premiers (les pires)
-cur = collection.find({"review_score": {"$type": "number", "$ne": float("nan")}}).sort([('review_score', pymongo.ASCENDING)]).limit(5)
+cur = repository.worst_rated_games(5)
 
 format_data(cur)
 
@@ -98,14 +93,8 @@ st.markdown("""
             ### Exemple 3 : Afficher les 10 catégories avec le plus de jeux
             """)
 
-cur = collection.aggregate([
-    { '$match':     { 'tags': { '$type': 'string' } } },            # On vérifie que le champ tags est bien une chaîne de caractères
-    { '$project':   { 'tags': { '$split': ["$tags", ","] } } },     # On divise les tags en une liste
-    { '$unwind':    "$tags" },                                      # On décompose la liste pour avoir un document par tag
-    { '$group':     { '_id': "$tags" , 'count': { '$sum': 1 } } },  # On groupe par tag et on compte le nombre de jeux par tag
-    { '$sort':      { 'count': -1 } },                              # On trie par nombre de jeux décroissant
-    { '$limit':     10 }                                            # On limite à 10 résultats
-])
+# Agrégation $unwind / $group / $sort sur les tags
+cur = repository.top_tags(10)
 
 df = pd.DataFrame(list(cur))
 st.bar_chart(data=df, x='_id', y='count')
@@ -119,16 +108,18 @@ def affichage_jeux_mot(mot="Sport"):
     st.markdown(f"""
                 ### Exemple 4 : Afficher les jeux (maximum 10) avec '{mot}' dans le titre
                 """)
-    # Recherche de jeux avec le mot de la variable mot dans le titre
-    cur = collection.find( { "title": { "$regex": mot} } ).limit(10)
-    if len(list(cur)) == 0:
+    # Recherche de jeux avec le mot de la variable mot dans le titre, grâce à l'index texte sur le titre
+    # (insensible à la casse, aux accents et au pluriel, contrairement à un $regex qui parcourt toute la collection)
+    games = repository.games_with_title_word(mot, 10)
+    if len(games) == 0:
         st.write("Aucun jeu trouvé avec ce mot dans le titre.")
     else:
-        cur = collection.find( { "title": { "$regex": mot, "$options": "i"} } ).limit(10)
-        format_data(cur)
+        format_data(games)
 
 mot = st.text_input("Mot à rechercher dans le titre des jeux", "sport")
 
 affichage_jeux_mot(mot)
 
-st.markdown("---")
\ No newline at end of file
+st.markdown("---")
+
+cache_sidebar()
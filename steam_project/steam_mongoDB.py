@@ -1,51 +1,157 @@
+import argparse
 import os
+import resource
 import time
+from collections import Counter
 
 import pandas as pd
-import pymongo
-from elasticsearch import Elasticsearch, helpers
 
-# ================== Connexion à la base de données MongoDB ==================
-client = pymongo.MongoClient('mongodb://mongodb:27017/')
-database = client['projet']
-collection = database['steam_games']
+from steam_project import repository, search_index
+from steam_project.mongo_indexes import ensure_indexes
+from steam_project.normalization import normalize_record
+from steam_project.sinks import (HASH_FIELD, INDEX_NAME, batched, content_hash, delete_vanished, es_actions,
+                                 publish_load, run_bulk, upsert_changed)
 
-# ================== Vérification que les données existent ===================
-df_ks = pd.read_csv('./data/steam_search.csv')
-print(df_ks.head(5))
+# ================== Lecture du CSV par morceaux =============================
+def iter_chunks(path, chunk_size, seen):
+    # Le CSV n'est jamais chargé en entier : on ne garde en mémoire qu'un morceau et l'ensemble des app_id déjà vus.
+    # Si un jeu apparaît plusieurs fois, seule sa première occurrence est conservée.
+    for df in pd.read_csv(path, chunksize=chunk_size):
+        chunk = []
+        for record in df.to_dict('records'):
+            # Prix, notes, nombre d'avis, tags et date sont stockés en types natifs
+            record = normalize_record(record)
+            key = str(record["app_id"])
+            if record["app_id"] is None or key in seen:
+                continue
+            seen.add(key)
+            record[HASH_FIELD] = content_hash(record)
+            chunk.append(record)
+        yield chunk
 
-collection.delete_many({})
-records = df_ks.to_dict('records')
-collection.insert_many(records)
-
-print("Data inserted into MongoDB collection 'steam_games' in database 'projet'.")
+# ================== Chargement dans MongoDB =================================
+def remove_duplicates(collection, batch_size):
+    # Un ancien chargement a pu insérer plusieurs documents pour un même app_id : on n'en garde qu'un
+    groups = collection.aggregate([
+        { '$group': { '_id': "$app_id", 'ids': { '$push': "$_id" }, 'count': { '$sum': 1 } } },
+        { '$match': { 'count': { '$gt': 1 } } },
+    ], allowDiskUse=True)
+    duplicates = [doc_id for group in groups for doc_id in group['ids'][1:]]
+    for ids in batched(duplicates, batch_size):
+        collection.delete_many({"_id": {"$in": ids}})
 
 # ================== Indexation dans Elasticsearch ==========================
-es_host = os.getenv("ES_HOST", "elasticsearch")
-es_port = int(os.getenv("ES_PORT", "9200"))
-es = Elasticsearch(f"http://{es_host}:{es_port}")
-
-# Attendre qu'Elasticsearch reponde
-for i in range(30):
-    print(f"Waiting for {es} to be available... (attempt {i+1}/30)")
-    try:
-        if es.ping():
-            break
-    except Exception:
-        pass
-    time.sleep(1)
-
-index_name = "steam_games"
-if not es.indices.exists(index=index_name):
-    es.indices.create(index=index_name)
-else:
-    es.indices.delete(index=index_name)
-    es.indices.create(index=index_name)
-
-actions = []
-for record in records:
-    source = dict(record)
-    source.pop("_id", None)
-    actions.append({"_index": index_name, "_id": source.get("app_id"), "_source": source})
-helpers.bulk(es, actions)
-print(f"Data indexed into Elasticsearch index '{index_name}'.")
+def connect_elasticsearch():
+    es = repository.elasticsearch()
+
+    # Attendre qu'Elasticsearch reponde
+    for i in range(30):
+        print(f"Waiting for {es} to be available... (attempt {i+1}/30)")
+        try:
+            if es.ping():
+                break
+        except Exception:
+            pass
+        time.sleep(1)
+    return es
+
+
+def rebuild_from_mongo(es, collection, batch_size, stats):
+    # MongoDB fait foi : on reconstruit une génération complète en parcourant la collection par lots
+    generation = search_index.create_generation(es)
+    run_bulk(es, es_actions(collection.find({}, {"_id": 0}, batch_size=batch_size), [], index=generation), batch_size, stats)
+    search_index.publish_generation(es, generation)
+    print(f"Elasticsearch: alias '{INDEX_NAME}' now points to '{generation}'.")
+
+# ================== Chargement ==============================================
+def load(database, es, args):
+    collection = database['steam_games']
+    stats = Counter()
+    seen = set()
+
+    # Reconstruction complète de l'index ES dans une nouvelle génération, ou mise à jour de l'alias en place
+    rebuild = args.mode == "full" or search_index.needs_rebuild(es)
+    es_target = search_index.create_generation(es) if rebuild else INDEX_NAME
+
+    if args.mode == "full":
+        # Chargement dans une collection temporaire renommée à la fin : la collection en ligne n'est jamais vide
+        target = database['steam_games_loading']
+        target.drop()
+    else:
+        target = collection
+        # Les doublons doivent disparaître avant de (re)créer l'index unique sur app_id
+        remove_duplicates(target, args.batch_size)
+        ensure_indexes(target)
+
+    for chunk in iter_chunks(args.csv, args.chunk_size, seen):
+        # Morceau sans nouveau jeu (doublons, app_id manquants) : insert_many refuse une liste vide
+        if not chunk:
+            continue
+        stats["rows"] += len(chunk)
+        if args.mode == "full":
+            target.insert_many(chunk, ordered=False)
+            changed = chunk
+        else:
+            changed = upsert_changed(target, chunk, args.batch_size)
+        stats["upserted"] += len(changed)
+        run_bulk(es, es_actions(chunk if rebuild else changed, [], index=es_target), args.batch_size, stats)
+
+    if args.mode == "full":
+        # Les index sont construits une fois les données insérées, avant la bascule
+        ensure_indexes(target)
+        target.rename(collection.name, dropTarget=True)
+    else:
+        vanished = delete_vanished(collection, seen, args.batch_size)
+        stats["deleted"] = len(vanished)
+        if not rebuild:
+            run_bulk(es, es_actions([], vanished), args.batch_size, stats)
+    print(f"MongoDB: {stats['upserted']} written, {stats['deleted']} deleted, {stats['rows'] - stats['upserted']} unchanged.")
+
+    if rebuild:
+        search_index.publish_generation(es, es_target)
+        print(f"Elasticsearch: alias '{INDEX_NAME}' now points to '{es_target}'.")
+    else:
+        es.indices.refresh(index=INDEX_NAME)
+        # Si l'index a divergé de MongoDB (volume ES perdu, chargement interrompu...), on le reconstruit entièrement
+        if es.count(index=INDEX_NAME)["count"] != collection.count_documents({}):
+            print("Elasticsearch: document count differs from MongoDB, rebuilding the index.")
+            rebuild_from_mongo(es, collection, args.batch_size, stats)
+    return stats
+
+
+def report(stats, elapsed):
+    # ru_maxrss est exprimé en Ko sous Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    rate = stats["rows"] / elapsed if elapsed else 0
+    print(f"Load report: {stats['rows']} rows in {elapsed:.1f}s ({rate:.0f} rows/s), "
+          f"{stats['es_written']} Elasticsearch writes, {stats['es_errors']} Elasticsearch errors, peak RSS {peak_rss_mb:.0f} MB.")
+
+# ================== Programme principal =====================================
+def parse_args():
+    parser = argparse.ArgumentParser(description="Charge le CSV scrapé dans MongoDB et Elasticsearch.")
+    parser.add_argument("--csv", default="./data/steam_search.csv")
+    parser.add_argument("--mode", choices=["incremental", "full"], default=os.getenv("LOAD_MODE", "incremental"),
+                        help="incremental : n'écrit que les jeux nouveaux, modifiés ou disparus ; full : réécrit tout")
+    parser.add_argument("--chunk-size", type=int, default=int(os.getenv("LOAD_CHUNK_SIZE", "5000")),
+                        help="nombre de lignes du CSV lues et envoyées aux bases à la fois")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("LOAD_BATCH_SIZE", "1000")))
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    started = time.perf_counter()
+
+    # ================== Connexion à la base de données MongoDB ==================
+    database = repository.database()
+
+    es = connect_elasticsearch()
+    stats = load(database, es, args)
+    print(f"Data loaded into MongoDB collection 'steam_games' in database 'projet' and Elasticsearch alias '{INDEX_NAME}'.")
+    publish_load(database, stats, force=args.mode == "full")
+
+    report(stats, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Agrégats précalculés de la page "Interprétation des données".
+#
+# Les agrégations parcourent toute la collection steam_games : plutôt que de
+# les relancer à chaque affichage, le chargeur les exécute une fois par
+# chargement et écrit leurs résultats ($merge) dans de petites collections de
+# synthèse. Chaque document porte le load_id du chargement qui l'a produit et
+# la clé du groupe dans le champ "key".
+
+PRICE_BOUNDARIES = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100, 1000]
+SCORE_BOUNDARIES = [0, 20, 40, 60, 80, 90, 95, 100]
+
+SUMMARIES = {
+    # Nombre de jeux par tag
+    "analytics_tag_counts": [
+        { '$project':   { 'tags': 1 } },
+        { '$unwind':    "$tags" },
+        { '$group':     { '_id': "$tags", 'count': { '$sum': 1 } } },
+    ],
+    # Nombre de jeux par fourchette de prix de 10€
+    "analytics_price_buckets": [
+        { '$match':     { 'price_eur': { '$type': 'number' } } },
+        { '$bucket':    { 'groupBy': "$price_eur", 'boundaries': PRICE_BOUNDARIES, 'default': "others" } },
+    ],
+    # Nombre de jeux par fourchette de note
+    "analytics_score_buckets": [
+        { '$match':     { 'review_score': { '$type': 'number' } } },
+        { '$bucket':    { 'groupBy': "$review_score", 'boundaries': SCORE_BOUNDARIES, 'default': "100+" } },
+    ],
+    # Nombre de jeux et note moyenne par tag
+    "analytics_tag_scores": [
+        { '$project':   { 'tags': 1, 'review_score': 1 } },
+        { '$unwind':    "$tags" },
+        { '$group':     { '_id': "$tags", 'count': { '$sum': 1 }, 'average_review_score': { '$avg': "$review_score" } } },
+    ],
+    # Nombre de jeux et note moyenne par fourchette de prix
+    "analytics_price_scores": [
+        { '$match':     { 'price_eur': { '$type': 'number' }, 'review_score': { '$type': 'number' } } },
+        { '$bucket':    { 'groupBy': "$price_eur", 'boundaries': PRICE_BOUNDARIES, 'default': "others",
+                          'output': { 'average_review_score': { '$avg': "$review_score" }, 'count': { '$sum': 1 } } } },
+    ],
+}
+
+
+def refresh_analytics(database, load_id, source="steam_games"):
+    for name, pipeline in SUMMARIES.items():
+        database[source].aggregate(pipeline + [
+            { '$set':   { 'key': "$_id", 'load_id': load_id } },
+            { '$unset': "_id" },
+            { '$merge': { 'into': name, 'whenMatched': "replace", 'whenNotMatched': "insert" } },
+        ], allowDiskUse=True)
+        database[name].create_index("load_id")
+
+
+def prune_analytics(database, load_id):
+    # Les synthèses des chargements précédents ne sont supprimées qu'une fois le nouveau load_id publié
+    for name in SUMMARIES:
+        database[name].delete_many({"load_id": {"$ne": load_id}})
+
+
+def read_summary(database, name, load_id, sort=None, limit=0):
+    cursor = database[name].find({"load_id": load_id}, {"_id": 0, "load_id": 0})
+    if sort:
+        cursor = cursor.sort(sort)
+    return list(cursor.limit(limit))
@@ -0,0 +1,179 @@
+# Point de reprise d'un scraping (-s CRAWL_RESUMABLE=1, mode html).
+#
+# Le fichier SQLite CRAWL_CHECKPOINT_FILE sert de frontière persistante :
+#   - pages : pages de recherche planifiées, et celles déjà traitées ;
+#   - games : une ligne par app_id, avec les champs de sa ligne de recherche
+#     tant que son hover est en attente, puis le jeu complet une fois scrapé.
+# Les requêtes hover ne transportent que l'app_id : les champs attendent ici.
+#
+# Les écritures sont regroupées et enregistrées toutes les
+# CRAWL_CHECKPOINT_INTERVAL secondes. Si le processus est tué, le scraping
+# suivant reprend le même passage : les jeux déjà scrapés sont renvoyés aux
+# pipelines sans requête, puis seules les pages et les hovers non terminés
+# sont redemandés.
+#
+#     python -m steam_project.checkpoint            # état du dernier passage
+#     python -m steam_project.checkpoint --finished # code de sortie 0 si le dernier passage est allé jusqu'au bout
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+
+READ_BATCH = 1000
+
+
+class CrawlCheckpoint:
+
+    def __init__(self, path, interval):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS run (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS pages (page INTEGER PRIMARY KEY, done INTEGER NOT NULL DEFAULT 0);
+            CREATE TABLE IF NOT EXISTS games (app_id TEXT PRIMARY KEY, fields TEXT, item TEXT);
+        """)
+        self.interval = interval
+        self.last_flush = time.monotonic()
+        # Écritures pas encore enregistrées, et champs des hovers planifiés depuis le dernier enregistrement
+        self.writes = []
+        self.unflushed = {}
+        self.pages = dict(self.connection.execute("SELECT page, done FROM pages"))
+        self.app_ids = {app_id for app_id, in self.connection.execute("SELECT app_id FROM games")}
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(settings.get("CRAWL_CHECKPOINT_FILE"), settings.getfloat("CRAWL_CHECKPOINT_INTERVAL"))
+
+    # ================== Passage en cours ===================================
+    def status(self):
+        row = self.connection.execute("SELECT value FROM run WHERE key = 'status'").fetchone()
+        return row[0] if row else None
+
+    def open_run(self):
+        # True si un passage interrompu est repris, False si un nouveau passage commence
+        if self.status() == "running":
+            return True
+        self.connection.executescript("DELETE FROM pages; DELETE FROM games; DELETE FROM run;")
+        self.connection.executemany("INSERT INTO run VALUES (?, ?)", [
+            ("status", "running"), ("started_at", datetime.now(timezone.utc).isoformat()),
+        ])
+        self.connection.commit()
+        self.pages = {}
+        self.app_ids = set()
+        return False
+
+    def finish(self):
+        self.flush()
+        self.connection.executemany("INSERT OR REPLACE INTO run VALUES (?, ?)", [
+            ("status", "finished"), ("finished_at", datetime.now(timezone.utc).isoformat()),
+        ])
+        self.connection.commit()
+
+    def counts(self):
+        self.flush()
+        pages_done, pages = self.connection.execute("SELECT COALESCE(SUM(done), 0), COUNT(*) FROM pages").fetchone()
+        games_done, games = self.connection.execute("SELECT COUNT(item), COUNT(*) FROM games").fetchone()
+        return {"pages": pages, "pages_done": pages_done, "games": games, "games_done": games_done}
+
+    # ================== Pages de recherche =================================
+    def page_known(self, page):
+        return page in self.pages
+
+    def schedule_page(self, page):
+        if page not in self.pages:
+            self.pages[page] = 0
+            self.write("INSERT OR IGNORE INTO pages VALUES (?, 0)", (page,))
+
+    def page_done(self, page):
+        self.pages[page] = 1
+        self.write("INSERT OR REPLACE INTO pages VALUES (?, 1)", (page,))
+
+    def pending_pages(self):
+        return sorted(page for page, done in self.pages.items() if not done)
+
+    # ================== Jeux ===============================================
+    def game_known(self, app_id):
+        return app_id in self.app_ids
+
+    def stash(self, fields):
+        # Champs de la ligne de recherche, repris par take() quand le hover répond
+        self.app_ids.add(fields["app_id"])
+        self.unflushed[fields["app_id"]] = fields
+        self.write("INSERT OR IGNORE INTO games (app_id, fields) VALUES (?, ?)", (fields["app_id"], json.dumps(fields, ensure_ascii=False)))
+
+    def take(self, app_id):
+        if app_id in self.unflushed:
+            return self.unflushed[app_id]
+        row = self.connection.execute("SELECT fields FROM games WHERE app_id = ?", (app_id,)).fetchone()
+        return json.loads(row[0])
+
+    def complete(self, fields, tags):
+        self.app_ids.add(fields["app_id"])
+        item = json.dumps({**fields, "tags": tags}, ensure_ascii=False)
+        self.write("INSERT OR REPLACE INTO games (app_id, fields, item) VALUES (?, NULL, ?)", (fields["app_id"], item))
+
+    def pending_games(self):
+        # app_id dont le hover n'a pas répondu, lus par lots
+        yield from self.read_batches("SELECT app_id FROM games WHERE item IS NULL AND app_id > ? ORDER BY app_id LIMIT ?")
+
+    def done_items(self):
+        for item in self.read_batches("SELECT app_id, item FROM games WHERE item IS NOT NULL AND app_id > ? ORDER BY app_id LIMIT ?", with_key=True):
+            yield json.loads(item)
+
+    def read_batches(self, query, with_key=False):
+        # Pagination sur la clé : la connexion reste libre pour les écritures entre deux lots
+        self.flush()
+        last = ""
+        while True:
+            rows = self.connection.execute(query, (last, READ_BATCH)).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            for row in rows:
+                yield row[1] if with_key else row[0]
+
+    # ================== Enregistrement =====================================
+    def write(self, query, parameters):
+        self.writes.append((query, parameters))
+        if time.monotonic() - self.last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self.writes:
+            with self.connection:
+                for query, parameters in self.writes:
+                    self.connection.execute(query, parameters)
+            self.writes = []
+            self.unflushed = {}
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+def main():
+    from steam_project import settings
+
+    parser = argparse.ArgumentParser(description="État du point de reprise du scraping.")
+    parser.add_argument("--path", default=settings.CRAWL_CHECKPOINT_FILE)
+    parser.add_argument("--finished", action="store_true", help="code de sortie 0 seulement si le dernier passage est terminé")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"No checkpoint at {args.path}.")
+        sys.exit(1 if args.finished else 0)
+    checkpoint = CrawlCheckpoint(args.path, 0)
+    status = checkpoint.status()
+    print(f"Checkpoint {args.path}: {status or 'empty'}, {json.dumps(checkpoint.counts())}.")
+    checkpoint.close()
+    if args.finished:
+        sys.exit(0 if status == "finished" else 1)
+
+
+if __name__ == "__main__":
+    main()
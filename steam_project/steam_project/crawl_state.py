@@ -0,0 +1,73 @@
+# État persistant du scraping, d'un passage à l'autre.
+#
+# Pour chaque app_id on garde l'empreinte de sa ligne de recherche (prix,
+# texte et nombre d'avis) et les tags lus la dernière fois. En mode
+# incrémental (-s CRAWL_INCREMENTAL=1), un jeu dont la ligne n'a pas changé
+# reprend ses tags connus sans refaire la requête hover, tant qu'ils ont
+# moins de CRAWL_STATE_MAX_AGE_DAYS jours.
+#
+# L'état est enregistré dans un fichier SQLite, mis à jour à chaque scraping
+# (complet ou incrémental) : il est chargé en mémoire à l'ouverture et écrit
+# par lots.
+
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+FLUSH_EVERY = 1000
+
+
+def row_fingerprint(fields):
+    key = "|".join(str(fields.get(name) or "") for name in ("price", "review_text", "review_count"))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class CrawlState:
+
+    def __init__(self, path, max_age_days):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS games (app_id TEXT PRIMARY KEY, fingerprint TEXT, tags TEXT, fetched_at TEXT)"
+        )
+        self.min_fetched_at = (datetime.now(timezone.utc) - timedelta(days=max_age_days)).isoformat()
+        self.games = {app_id: (fingerprint, tags, fetched_at) for app_id, fingerprint, tags, fetched_at
+                      in self.connection.execute("SELECT app_id, fingerprint, tags, fetched_at FROM games")}
+        self.pending = []
+        self.skipped = 0
+        self.fetched = 0
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(settings.get("CRAWL_STATE_FILE"), settings.getint("CRAWL_STATE_MAX_AGE_DAYS"))
+
+    def known_tags(self, fields):
+        # Tags connus si la ligne de recherche est identique et les tags assez récents, sinon None
+        known = self.games.get(fields["app_id"])
+        if known is None:
+            return None
+        fingerprint, tags, fetched_at = known
+        if fingerprint != row_fingerprint(fields) or fetched_at < self.min_fetched_at:
+            return None
+        self.skipped += 1
+        return json.loads(tags)
+
+    def remember(self, fields, tags):
+        self.fetched += 1
+        entry = (row_fingerprint(fields), json.dumps(tags, ensure_ascii=False), datetime.now(timezone.utc).isoformat())
+        self.games[fields["app_id"]] = entry
+        self.pending.append((fields["app_id"], *entry))
+        if len(self.pending) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.connection.executemany("INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?)", self.pending)
+            self.connection.commit()
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        self.connection.close()
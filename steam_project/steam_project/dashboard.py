@@ -0,0 +1,26 @@
+# Éléments d'interface communs aux pages Streamlit.
+
+import os
+
+import pandas as pd
+import streamlit as st
+
+from steam_project import repository
+
+# DASHBOARD_DEBUG=1 : panneau de diagnostic déplié dans la barre latérale de chaque page
+DASHBOARD_DEBUG = os.getenv("DASHBOARD_DEBUG", "0") == "1"
+
+
+def cache_sidebar():
+    # Compteurs du cache des requêtes depuis le démarrage du processus Streamlit
+    stats = repository.cache.stats()
+    with st.sidebar.expander("Cache des requêtes", expanded=DASHBOARD_DEBUG):
+        hits = stats.get("hits", 0) + stats.get("shared_hits", 0)
+        lookups = hits + stats.get("misses", 0)
+        st.write(f"Chargement `{stats['load_id'] or '-'}`, {stats['entries']} entrées en mémoire"
+                 f"{' (+ fichier partagé)' if stats['shared'] else ''}.")
+        st.write(f"{hits} hits sur {lookups} lectures, {stats.get('evicted', 0)} évictions, "
+                 f"{stats.get('invalidated', 0)} entrées invalidées par un nouveau chargement.")
+        if stats["queries"]:
+            df = pd.DataFrame.from_dict(stats["queries"], orient="index").fillna(0)
+            st.dataframe(df, use_container_width=True)
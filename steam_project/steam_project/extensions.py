@@ -0,0 +1,166 @@
+# Extensions Scrapy du projet.
+#
+# CrawlReport mesure chaque scraping : requêtes par seconde, percentiles de
+# latence de téléchargement et taux d'erreur. Le rapport est écrit dans les
+# logs, dans les stats Scrapy et ajouté (une ligne JSON par scraping) au
+# fichier CRAWL_REPORT_FILE, pour comparer les profils entre eux.
+#
+# MetricsExporter écrit les mesures relevées par les middlewares (voir
+# metrics.py) au format texte Prometheus dans METRICS_FILE, toutes les
+# METRICS_INTERVAL secondes (collecteur "textfile" de node_exporter), puis un
+# résumé JSON dans METRICS_SUMMARY_FILE à la fin du scraping.
+
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timezone
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+
+from steam_project import metrics
+
+
+class CrawlReport:
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.path = crawler.settings.get("CRAWL_REPORT_FILE")
+        self.latencies = []
+        self.errors = 0
+        self.started = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        extension = cls(crawler)
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.response_received, signal=signals.response_received)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.started = time.monotonic()
+
+    def response_received(self, response, request, spider):
+        if "download_latency" in request.meta:
+            self.latencies.append(request.meta["download_latency"])
+        if response.status >= 400:
+            self.errors += 1
+
+    def spider_closed(self, spider, reason):
+        elapsed = time.monotonic() - self.started
+        report = self.build_report(spider, reason, elapsed)
+
+        for key, value in report.items():
+            if isinstance(value, (int, float)):
+                self.crawler.stats.set_value(f"crawl_report/{key}", value)
+        spider.logger.info(
+            "Crawl profile %s: %d responses in %.1fs (%.2f req/s), latency p50 %.3fs p90 %.3fs p99 %.3fs, error rate %.2f%%",
+            report["profile"], report["responses"], report["elapsed_s"], report["requests_per_s"],
+            report["latency_p50_s"], report["latency_p90_s"], report["latency_p99_s"], report["error_rate"] * 100,
+        )
+
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(report) + "\n")
+
+    def build_report(self, spider, reason, elapsed):
+        stats = self.crawler.stats
+        settings = self.crawler.settings
+        responses = len(self.latencies)
+        # Erreurs : réponses HTTP >= 400 (y compris celles relancées) et exceptions de téléchargement (timeouts, DNS...)
+        exceptions = stats.get_value("downloader/exception_count", 0)
+        attempts = responses + exceptions
+        if responses > 1:
+            percentiles = statistics.quantiles(self.latencies, n=100)
+        else:
+            percentiles = (self.latencies or [0.0]) * 99
+        return {
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "spider": spider.name,
+            "profile": settings.get("CRAWL_PROFILE"),
+            "reason": reason,
+            "concurrent_requests": settings.getint("CONCURRENT_REQUESTS"),
+            "autothrottle_target_concurrency": settings.getfloat("AUTOTHROTTLE_TARGET_CONCURRENCY"),
+            "elapsed_s": round(elapsed, 2),
+            "responses": responses,
+            "items": stats.get_value("item_scraped_count", 0),
+            "retries": stats.get_value("retry/count", 0),
+            "requests_per_s": round(responses / elapsed, 2) if elapsed else 0.0,
+            "latency_p50_s": round(percentiles[49], 3),
+            "latency_p90_s": round(percentiles[89], 3),
+            "latency_p99_s": round(percentiles[98], 3),
+            "errors": self.errors + exceptions,
+            "error_rate": round((self.errors + exceptions) / attempts, 4) if attempts else 0.0,
+        }
+
+
+class MetricsExporter:
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.metrics = metrics.for_crawler(crawler)
+        self.path = crawler.settings.get("METRICS_FILE")
+        self.summary_path = crawler.settings.get("METRICS_SUMMARY_FILE")
+        self.interval = crawler.settings.getfloat("METRICS_INTERVAL")
+        self.started = None
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.get("METRICS_FILE") and not crawler.settings.get("METRICS_SUMMARY_FILE"):
+            raise NotConfigured("METRICS_FILE and METRICS_SUMMARY_FILE are not set")
+        extension = cls(crawler)
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.started = time.monotonic()
+        if self.path and self.interval:
+            self.task = task.LoopingCall(self.write_prometheus)
+            self.task.start(self.interval, now=False)
+
+    def item_scraped(self, item, response, spider):
+        self.metrics.inc("steam_items_scraped_total")
+
+    def write_prometheus(self):
+        elapsed = time.monotonic() - self.started
+        items = self.metrics.counters[("steam_items_scraped_total", ())]
+        self.metrics.set("steam_crawl_elapsed_seconds", round(elapsed, 3))
+        self.metrics.set("steam_items_per_second", round(items / elapsed, 3) if elapsed else 0.0)
+        if self.path:
+            # Fichier temporaire puis renommage : le collecteur ne lit jamais un fichier à moitié écrit
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as file:
+                file.write(self.metrics.prometheus())
+            os.replace(self.path + ".tmp", self.path)
+
+    def spider_closed(self, spider, reason):
+        if self.task and self.task.running:
+            self.task.stop()
+        self.write_prometheus()
+        summary = {
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "spider": spider.name,
+            "profile": self.crawler.settings.get("CRAWL_PROFILE"),
+            "reason": reason,
+            **self.metrics.summary(time.monotonic() - self.started),
+        }
+        for callback, row in summary["callbacks"].items():
+            spider.logger.info("Callback %s: %d calls, %.3f ms CPU per call, %s ms CPU per item", callback, row["calls"],
+                               row["cpu_ms_per_call"], row["cpu_ms_per_item"])
+        for kind, row in summary["downloads"].items():
+            spider.logger.info("Downloads %s: %d responses, %d bytes, %d cached, %d retries, latency p50 %ss p90 %ss",
+                               kind, row["responses"], row["bytes"], row["cached"], row["retries"],
+                               row.get("latency_p50_s"), row.get("latency_p90_s"))
+        spider.logger.info("Metrics: %d items in %.1fs (%.2f items/s)", summary["items"], summary["elapsed_s"], summary["items_per_s"])
+
+        if self.summary_path:
+            os.makedirs(os.path.dirname(self.summary_path) or ".", exist_ok=True)
+            with open(self.summary_path, "w", encoding="utf-8") as file:
+                json.dump(summary, file, indent=2)
@@ -0,0 +1,415 @@
+# Frontière partagée d'un scraping réparti (-s CRAWL_FRONTIER=1, mode html).
+#
+# Plusieurs processus steam_search_spider (les "workers", sur une ou
+# plusieurs machines) se partagent un même passage (CRAWL_RUN) à travers la
+# collection crawl_frontier de MongoDB (MONGO_URI, MONGO_DATABASE) :
+#   - un job par page de recherche et un job par jeu (hover), dont l'_id
+#     contient le numéro de page ou l'app_id : un jeu vu sur deux pages ou par
+#     deux workers n'est demandé qu'une fois ;
+#   - chaque worker réclame des jobs de façon atomique (find_one_and_update)
+#     et les garde sous bail (CRAWL_FRONTIER_LEASE secondes, renouvelé tant
+#     qu'il travaille, au plus CRAWL_FRONTIER_MAX_HOLD secondes) : les jobs
+#     d'un worker arrêté, tué ou bloqué reviennent dans la file à l'expiration
+#     du bail, un job en échec (requête ou callback) y revient tout de suite,
+#     jusqu'à CRAWL_FRONTIER_MAX_ATTEMPTS tentatives ;
+#   - les nouveaux jobs et les jobs terminés sont envoyés par lots depuis un
+#     thread, à chaque réclamation.
+# Les jeux sont écrits par les pipelines habituels de chaque worker. Le
+# dernier worker à terminer le passage le finalise (jeux disparus, load_id,
+# génération Elasticsearch) avec tous les jeux vus par les workers.
+#
+#     python -m steam_project.frontier crawl --workers 4              # 4 workers sur cette machine
+#     python -m steam_project.frontier crawl --workers 4 --run nuit   # même commande sur une autre machine : elle rejoint le passage
+#     python -m steam_project.frontier report --run nuit              # débit global et par worker
+#     python -m steam_project.frontier report --compare w1,w2,w4      # débit selon le nombre de workers
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pymongo
+from pymongo.errors import BulkWriteError
+
+FRONTIER_COLLECTION = "crawl_frontier"
+RUNS_COLLECTION = "crawl_runs"
+PENDING = "pending"
+# Pages de recherche réclamées avant les hovers (même ordre que les priorités des requêtes du spider)
+PAGE_PRIORITY = 10
+GAME_PRIORITY = 0
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+class MongoFrontier:
+
+    def __init__(self, database, run_id, worker, lease, max_attempts, max_hold):
+        self.jobs = database[FRONTIER_COLLECTION]
+        self.runs = database[RUNS_COLLECTION]
+        self.run_id = run_id
+        self.worker = worker
+        self.lease = timedelta(seconds=lease)
+        self.max_attempts = max_attempts
+        self.max_hold = max_hold
+        self.lock = threading.Lock()
+        self.leaving = threading.Lock()
+        # Nouveaux jobs, jobs terminés et jobs en échec pas encore envoyés,
+        # jobs réclamés par ce worker et pas encore terminés -> heure de la réclamation
+        self.pushed = []
+        self.acked = []
+        self.released = []
+        self.held = {}
+        self.exhausted = False
+        self.last_worker = None
+        self.counts = {"claimed": 0, "retaken": 0, "released": 0, "failed": 0, "duplicates": 0, "abandoned": 0}
+
+    @classmethod
+    def from_settings(cls, settings):
+        client = pymongo.MongoClient(settings.get("MONGO_URI"))
+        run_id = settings.get("CRAWL_RUN") or "default"
+        worker = settings.get("CRAWL_WORKER") or f"{socket.gethostname()}-{os.getpid()}"
+        return cls(client[settings.get("MONGO_DATABASE")], run_id, worker,
+                   settings.getfloat("CRAWL_FRONTIER_LEASE"), settings.getint("CRAWL_FRONTIER_MAX_ATTEMPTS"),
+                   settings.getfloat("CRAWL_FRONTIER_MAX_HOLD"))
+
+    # ================== Passage ============================================
+    def ensure_run(self):
+        self.runs.update_one({"_id": self.run_id}, {"$setOnInsert": {"status": "running", "started_at": utcnow()}}, upsert=True)
+
+    def open(self):
+        # Enregistre le worker et ajoute la première page de recherche si le passage commence
+        self.jobs.create_index([("run", pymongo.ASCENDING), ("state", pymongo.ASCENDING), ("priority", pymongo.DESCENDING)])
+        self.jobs.create_index([("run", pymongo.ASCENDING), ("kind", pymongo.ASCENDING)])
+        self.ensure_run()
+        self.runs.update_one({"_id": self.run_id}, {"$set": {
+            f"workers.{self.worker}.started_at": utcnow(), f"workers.{self.worker}.heartbeat": utcnow(),
+        }})
+        self.push_page(1)
+        self.sync()
+        return self.runs.find_one({"_id": self.run_id})["status"]
+
+    def once(self, key, factory, timeout=120):
+        # Valeur calculée par un seul worker du passage (le premier arrivé) et lue par les autres
+        self.ensure_run()
+        field = f"shared.{key}"
+        if self.runs.update_one({"_id": self.run_id, field: {"$exists": False}}, {"$set": {field: PENDING}}).modified_count:
+            try:
+                value = factory()
+            except Exception:
+                # Le prochain worker refera le calcul au lieu d'attendre une valeur qui ne viendra jamais
+                self.runs.update_one({"_id": self.run_id}, {"$unset": {field: ""}})
+                raise
+            self.runs.update_one({"_id": self.run_id}, {"$set": {field: value}})
+            return value
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            value = self.runs.find_one({"_id": self.run_id})["shared"][key]
+            if value != PENDING:
+                return value
+            time.sleep(0.5)
+        raise TimeoutError(f"{key} was not set by another worker of run {self.run_id!r}")
+
+    def add_totals(self, name, totals):
+        if totals:
+            self.runs.update_one({"_id": self.run_id}, {"$inc": {f"totals.{name}.{key}": value for key, value in totals.items()}})
+
+    def totals(self, name):
+        return self.runs.find_one({"_id": self.run_id}).get("totals", {}).get(name, {})
+
+    def leave(self, finished):
+        # True pour le dernier worker d'un passage terminé : c'est lui qui le finalise (un seul appel effectif)
+        with self.leaving:
+            if self.last_worker is not None:
+                return self.last_worker
+            # Jobs réclamés mais pas traités (arrêt avant la fin) : rendus tout de suite aux autres workers
+            with self.lock:
+                self.released.extend(self.held)
+                self.held.clear()
+            self.sync()
+            now = utcnow()
+            self.runs.update_one({"_id": self.run_id}, {"$set": {
+                f"workers.{self.worker}.left_at": now, f"workers.{self.worker}.heartbeat": now,
+                f"workers.{self.worker}.counts": self.counts,
+            }})
+            self.last_worker = False
+            if finished and not self.remaining():
+                run = self.runs.find_one({"_id": self.run_id})
+                active = [name for name, worker in run.get("workers", {}).items()
+                          if "left_at" not in worker and as_utc(worker["heartbeat"]) > now - self.lease]
+                if not active:
+                    self.last_worker = bool(self.runs.update_one(
+                        {"_id": self.run_id, "status": "running"}, {"$set": {"status": "finished", "finished_at": now}},
+                    ).modified_count)
+            return self.last_worker
+
+    # ================== Jobs ===============================================
+    def push_page(self, page, sequential=False):
+        with self.lock:
+            self.pushed.append({"_id": f"{self.run_id}/page/{page}", "kind": "page", "page": page,
+                                "sequential": sequential, "priority": PAGE_PRIORITY})
+
+    def push_game(self, fields, done=False, priority=GAME_PRIORITY):
+        # Un jeu dont les tags sont déjà connus (mode incrémental) est enregistré comme terminé : il compte parmi les jeux vus
+        job = {"_id": f"{self.run_id}/hover/{fields['app_id']}", "kind": "hover", "app_id": fields["app_id"],
+               "fields": fields, "priority": priority}
+        if done:
+            job.update(state="done", done_by=self.worker, done_at=utcnow())
+        with self.lock:
+            self.pushed.append(job)
+
+    def done(self, job_id):
+        with self.lock:
+            self.held.pop(job_id, None)
+            self.acked.append(job_id)
+
+    def release(self, job_id):
+        # Requête ou callback en échec : le job revient dans la file (ou passe en échec après CRAWL_FRONTIER_MAX_ATTEMPTS tentatives).
+        # Un job déjà terminé, rendu ou abandonné n'est plus à ce worker
+        with self.lock:
+            if self.held.pop(job_id, None) is not None:
+                self.released.append(job_id)
+
+    def has_unsynced(self):
+        return bool(self.pushed or self.acked or self.released)
+
+    def remaining(self):
+        return self.jobs.count_documents({"run": self.run_id, "state": {"$in": ["queued", "leased"]}})
+
+    def sync(self):
+        with self.lock:
+            pushed, self.pushed = self.pushed, []
+            acked, self.acked = self.acked, []
+            released, self.released = self.released, []
+            # Bail renouvelé pour une durée bornée : un job bloqué chez ce worker finit par revenir aux autres
+            oldest = time.monotonic() - self.max_hold
+            stale = [job_id for job_id, claimed_at in self.held.items() if claimed_at < oldest]
+            for job_id in stale:
+                del self.held[job_id]
+            self.counts["abandoned"] += len(stale)
+            held = list(self.held)
+        now = utcnow()
+        try:
+            self.send(pushed, acked, released, now)
+        except Exception:
+            # MongoDB indisponible : tout sera renvoyé au prochain envoi (les écritures sont idempotentes)
+            with self.lock:
+                self.pushed[:0], self.acked[:0], self.released[:0] = pushed, acked, released
+            raise
+        if held:
+            self.jobs.update_many({"_id": {"$in": held}, "worker": self.worker}, {"$set": {"lease_until": now + self.lease}})
+        self.runs.update_one({"_id": self.run_id}, {"$set": {f"workers.{self.worker}.heartbeat": now}})
+
+    def send(self, pushed, acked, released, now):
+        # Nouveaux jobs avant les jobs terminés : une page n'est jamais terminée avant que ses jeux soient dans la file
+        if pushed:
+            for job in pushed:
+                job.setdefault("state", "queued")
+                job.update(run=self.run_id, attempts=0)
+            try:
+                self.jobs.insert_many(pushed, ordered=False)
+            except BulkWriteError as error:
+                # Jobs déjà ajoutés (par ce worker ou un autre) : seules les autres erreurs comptent
+                errors = [detail for detail in error.details["writeErrors"] if detail["code"] != 11000]
+                if errors:
+                    raise
+                self.counts["duplicates"] += len(error.details["writeErrors"])
+        if acked:
+            self.jobs.update_many({"_id": {"$in": acked}}, {"$set": {"state": "done", "done_by": self.worker, "done_at": now}})
+        if released:
+            self.jobs.update_many({"_id": {"$in": released}, "worker": self.worker}, {"$set": {"state": "queued", "worker": None}})
+            self.counts["released"] += len(released)
+
+    def claim(self, count):
+        # Jobs en file ou dont le bail a expiré, pages d'abord
+        claimed = []
+        while len(claimed) < count:
+            now = utcnow()
+            job = self.jobs.find_one_and_update(
+                {"run": self.run_id, "$or": [{"state": "queued"}, {"state": "leased", "lease_until": {"$lt": now}}]},
+                {"$set": {"state": "leased", "worker": self.worker, "lease_until": now + self.lease}, "$inc": {"attempts": 1}},
+                sort=[("priority", pymongo.DESCENDING)],
+                return_document=pymongo.ReturnDocument.AFTER,
+            )
+            if job is None:
+                break
+            if job["attempts"] > self.max_attempts:
+                self.counts["failed"] += 1
+                self.jobs.update_one({"_id": job["_id"]}, {"$set": {"state": "failed", "worker": None}})
+                continue
+            if job["attempts"] > 1:
+                self.counts["retaken"] += 1
+            claimed.append(job)
+        with self.lock:
+            self.held.update((job["_id"], time.monotonic()) for job in claimed)
+        self.counts["claimed"] += len(claimed)
+        return claimed
+
+    def sync_and_claim(self, count):
+        # Appelé depuis un thread : le réacteur Twisted ne bloque jamais sur MongoDB
+        self.sync()
+        jobs = self.claim(count) if count > 0 else []
+        if not jobs and not self.held and not self.has_unsynced():
+            self.exhausted = not self.remaining()
+        else:
+            self.exhausted = False
+        return jobs
+
+    def app_ids(self):
+        # Tous les jeux vus pendant le passage, par tous les workers
+        return {job["app_id"] for job in self.jobs.find({"run": self.run_id, "kind": "hover"}, {"app_id": True})}
+
+    # ================== Rapport ============================================
+    def report(self):
+        run = self.runs.find_one({"_id": self.run_id})
+        if run is None:
+            return None
+        states = {row["_id"]: row["count"] for row in self.jobs.aggregate([
+            {"$match": {"run": self.run_id}},
+            {"$group": {"_id": "$state", "count": {"$sum": 1}}},
+        ])}
+        workers = {}
+        for row in self.jobs.aggregate([
+            {"$match": {"run": self.run_id, "state": "done", "done_by": {"$ne": None}}},
+            {"$group": {
+                "_id": "$done_by",
+                "pages": {"$sum": {"$cond": [{"$eq": ["$kind", "page"]}, 1, 0]}},
+                "games": {"$sum": {"$cond": [{"$eq": ["$kind", "hover"]}, 1, 0]}},
+            }},
+        ]):
+            workers[row["_id"]] = {"pages": row["pages"], "games": row["games"]}
+        for name, worker in run.get("workers", {}).items():
+            row = workers.setdefault(name, {"pages": 0, "games": 0})
+            row.update(worker.get("counts", {}))
+            if "left_at" in worker:
+                elapsed = (as_utc(worker["left_at"]) - as_utc(worker["started_at"])).total_seconds()
+                row["elapsed_s"] = round(elapsed, 2)
+                row["games_per_s"] = round(row["games"] / elapsed, 2) if elapsed else None
+
+        end = as_utc(run.get("finished_at") or utcnow())
+        elapsed = (end - as_utc(run["started_at"])).total_seconds()
+        games = sum(row["games"] for row in workers.values())
+        return {
+            "run": self.run_id,
+            "status": run["status"],
+            "workers": len(run.get("workers", {})),
+            "elapsed_s": round(elapsed, 2),
+            "games": games,
+            "games_per_s": round(games / elapsed, 2) if elapsed else None,
+            "jobs": states,
+            "per_worker": workers,
+        }
+
+
+def as_utc(value):
+    # MongoDB renvoie des dates sans fuseau, en UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+# ================== Lancement des workers ==================================
+def run_workers(run_id, workers, scrapy_args=(), worker_prefix=None, cwd=None):
+    # Lance les workers de cette machine et attend leur fin ; renvoie les codes de sortie
+    prefix = worker_prefix or socket.gethostname()
+    processes = []
+    for index in range(1, workers + 1):
+        name = f"{prefix}-{index}"
+        command = [
+            sys.executable, "-m", "scrapy", "crawl", "steam_search_spider",
+            "-s", "CRAWL_FRONTIER=1", "-s", f"CRAWL_RUN={run_id}", "-s", f"CRAWL_WORKER={name}",
+            # Un fichier de mesures par worker
+            "-s", f"METRICS_FILE=data/crawl_metrics.{name}.prom", "-s", f"METRICS_SUMMARY_FILE=data/crawl_metrics.{name}.json",
+            *scrapy_args,
+        ]
+        processes.append(subprocess.Popen(command, cwd=cwd))
+    return [process.wait() for process in processes]
+
+
+def print_report(report):
+    print(f"Run {report['run']} ({report['status']}): {report['games']} games in {report['elapsed_s']}s "
+          f"with {report['workers']} workers, {report['games_per_s']} games/s, jobs {json.dumps(report['jobs'])}.")
+    for name, row in sorted(report["per_worker"].items()):
+        print(f"  {name:<24} {row['pages']:>5} pages {row['games']:>7} games {row.get('games_per_s') or '-':>8} games/s "
+              f"(claimed {row.get('claimed', 0)}, retaken {row.get('retaken', 0)}, released {row.get('released', 0)})")
+
+
+def scaling(reports):
+    # Accélération et efficacité de chaque passage par rapport au premier (le moins de workers en général)
+    base = reports[0]
+    rows = []
+    for report in reports:
+        speedup = report["games_per_s"] / base["games_per_s"] if base["games_per_s"] and report["games_per_s"] else None
+        rows.append({
+            "run": report["run"],
+            "status": report["status"],
+            "workers": report["workers"],
+            "games": report["games"],
+            "elapsed_s": report["elapsed_s"],
+            "games_per_s": report["games_per_s"],
+            "speedup": round(speedup, 2) if speedup else None,
+            "efficiency": round(speedup * base["workers"] / report["workers"], 2) if speedup and report["workers"] else None,
+        })
+    return rows
+
+
+def print_scaling(rows):
+    print(f"{'run':<20} {'workers':>7} {'games':>8} {'elapsed s':>10} {'games/s':>9} {'speedup':>8} {'efficiency':>10}")
+    for row in rows:
+        print(f"{row['run']:<20} {row['workers']:>7} {row['games']:>8} {row['elapsed_s']:>10} {row['games_per_s'] or '-':>9} "
+              f"{row['speedup'] or '-':>8} {row['efficiency'] or '-':>10}")
+
+
+def load_report(settings, run_id):
+    settings.set("CRAWL_RUN", run_id)
+    settings.set("CRAWL_WORKER", "report")
+    return MongoFrontier.from_settings(settings).report()
+
+
+def main():
+    from scrapy.utils.project import get_project_settings
+
+    parser = argparse.ArgumentParser(description="Scraping réparti sur plusieurs processus avec une frontière MongoDB.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    crawl = commands.add_parser("crawl", help="lance des workers sur cette machine et attend la fin du passage")
+    crawl.add_argument("--workers", type=int, default=os.cpu_count())
+    crawl.add_argument("--run", default=None, help="identifiant du passage (nouveau passage horodaté par défaut)")
+    crawl.add_argument("scrapy_args", nargs=argparse.REMAINDER, help="options passées à chaque worker, après --")
+    report = commands.add_parser("report", help="débit global et par worker d'un passage, ou comparaison de plusieurs passages")
+    runs = report.add_mutually_exclusive_group(required=True)
+    runs.add_argument("--run")
+    runs.add_argument("--compare", help="passages à comparer, séparés par des virgules (run1,run2,...)")
+    args = parser.parse_args()
+
+    settings = get_project_settings()
+    if args.command == "report" and args.compare:
+        run_ids = args.compare.split(",")
+        reports = [load_report(settings, run_id) for run_id in run_ids]
+        missing = [run_id for run_id, result in zip(run_ids, reports) if result is None]
+        if missing:
+            print(f"No run {', '.join(missing)} in {RUNS_COLLECTION}.")
+            sys.exit(1)
+        print_scaling(scaling(reports))
+        return
+
+    if args.command == "crawl":
+        run_id = args.run or utcnow().strftime("%Y%m%d%H%M%S")
+        scrapy_args = [arg for arg in args.scrapy_args if arg != "--"]
+        codes = run_workers(run_id, args.workers, scrapy_args)
+        print(f"Workers exited with {codes}.")
+    else:
+        run_id = args.run
+    result = load_report(settings, run_id)
+    if result is None:
+        print(f"No run {run_id!r} in {RUNS_COLLECTION}.")
+        sys.exit(1)
+    print_report(result)
+    sys.exit(0 if result["status"] == "finished" else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+# Politique du cache HTTP du scraping incrémental.
+#
+# RFC2616Policy revalide les réponses en cache avec If-None-Match et
+# If-Modified-Since (ETag / Last-Modified) : une page hover inchangée revient
+# en 304 et n'est pas retéléchargée. Les pages de recherche, elles, ne sont
+# jamais mises en cache, pour toujours voir les nouveaux prix et avis.
+
+from scrapy.extensions.httpcache import RFC2616Policy
+
+
+class HoverCachePolicy(RFC2616Policy):
+
+    def should_cache_request(self, request):
+        return "/apphoverpublic/" in request.url and super().should_cache_request(request)
@@ -7,6 +7,14 @@ import scrapy
 
 
 class SteamProjectItem(scrapy.Item):
-    # define the fields for your item here like:
-    # name = scrapy.Field()
-    pass
+    # Champs tels que scrapés, convertis en types natifs par SteamProjectPipeline
+    app_id = scrapy.Field()             # int (identifiant Steam), ou str pour les lots (bundles), dont l'identifiant est composé ("377160,435870")
+    title = scrapy.Field()              # str
+    thumbnail_link = scrapy.Field()     # str (url de la miniature)
+    release = scrapy.Field()            # datetime, None si la date est inconnue ("Coming soon"...)
+    review_text = scrapy.Field()        # str ("Very Positive"...)
+    review_score = scrapy.Field()       # int (% d'avis positifs), None sans avis
+    review_count = scrapy.Field()       # int (nombre d'avis)
+    price = scrapy.Field()              # str (libellé affiché : "19,99€", "Gratuit")
+    price_eur = scrapy.Field()          # float (0.0 pour les jeux gratuits)
+    tags = scrapy.Field()               # list[str]
@@ -0,0 +1,28 @@
+# Suivi des chargements de données.
+#
+# Chaque chargement qui modifie les données reçoit un identifiant (load_id),
+# enregistré dans la collection "loads". Les agrégats précalculés sont
+# versionnés par cet identifiant, et les pages s'en servent pour savoir si
+# leurs résultats en cache sont encore valides.
+
+from datetime import datetime, timezone
+
+LOADS_COLLECTION = "loads"
+CURRENT_LOAD = "steam_games"
+
+
+def new_load_id():
+    return datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S%f")
+
+
+def record_load(database, load_id, stats):
+    database[LOADS_COLLECTION].update_one(
+        {"_id": CURRENT_LOAD},
+        {"$set": {"load_id": load_id, "loaded_at": datetime.now(timezone.utc), "stats": dict(stats)}},
+        upsert=True,
+    )
+
+
+def current_load_id(database):
+    load = database[LOADS_COLLECTION].find_one({"_id": CURRENT_LOAD}, {"load_id": 1})
+    return load["load_id"] if load else None
@@ -0,0 +1,179 @@
+# Mesures d'un scraping, relevées par les middlewares du projet.
+#
+# Le middleware de spider mesure le temps CPU de chaque callback (parse,
+# parse_hover...) et ce qu'il produit ; le middleware de téléchargement
+# mesure la latence et la taille des réponses, séparément pour les pages de
+# recherche, les hovers et l'API, ainsi que les relances, les réponses de
+# limitation (403/429/503) et les erreurs réseau. L'extension MetricsExporter
+# les écrit au format texte Prometheus pendant le scraping et en résumé JSON
+# à la fin.
+
+import weakref
+from collections import Counter
+
+# Bornes des histogrammes, en secondes
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CPU_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+THROTTLE_HTTP_CODES = {403, 429, 503}
+
+HELP = {
+    "steam_download_latency_seconds": ("histogram", "Download latency of non-cached responses"),
+    "steam_callback_cpu_seconds": ("histogram", "CPU time spent in a spider callback, per response"),
+    "steam_responses_total": ("counter", "Responses received, by URL kind and HTTP status"),
+    "steam_response_bytes_total": ("counter", "Response body bytes received"),
+    "steam_cached_responses_total": ("counter", "Responses served by the HTTP cache"),
+    "steam_retries_total": ("counter", "Requests sent again by the retry middleware"),
+    "steam_throttled_responses_total": ("counter", "403, 429 and 503 responses"),
+    "steam_download_exceptions_total": ("counter", "Downloads failed with an exception"),
+    "steam_callback_items_total": ("counter", "Items yielded by a spider callback"),
+    "steam_callback_requests_total": ("counter", "Requests yielded by a spider callback"),
+    "steam_items_scraped_total": ("counter", "Items that went through all the pipelines"),
+    "steam_crawl_elapsed_seconds": ("gauge", "Time since the spider was opened"),
+    "steam_items_per_second": ("gauge", "Scraped items per second since the spider was opened"),
+}
+
+# Un seul jeu de mesures par crawler, partagé par les middlewares et l'extension
+REGISTRY = weakref.WeakKeyDictionary()
+
+
+def for_crawler(crawler):
+    if crawler not in REGISTRY:
+        REGISTRY[crawler] = CrawlMetrics()
+    return REGISTRY[crawler]
+
+
+def url_kind(url):
+    if "/apphoverpublic/" in url:
+        return "hover"
+    if "/search" in url:
+        return "listing"
+    if "api.steampowered.com" in url:
+        return "api"
+    return "other"
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        # Borne supérieure du bucket qui contient le quantile (le maximum observé pour le dernier bucket)
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets + (self.max,), self.counts):
+            cumulative += count
+            if count and cumulative >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class CrawlMetrics:
+
+    def __init__(self):
+        self.counters = Counter()
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, labels=(), value=1):
+        self.counters[(name, labels)] += value
+
+    def set(self, name, value, labels=()):
+        self.gauges[(name, labels)] = value
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram(buckets)
+        self.histograms[key].observe(value)
+
+    def values(self, name):
+        # {labels: valeur} d'un compteur
+        return {labels: value for (metric, labels), value in self.counters.items() if metric == name}
+
+    # ================== Format texte Prometheus ============================
+    def prometheus(self):
+        lines = []
+        series = {}
+        for (name, labels), value in list(self.counters.items()) + list(self.gauges.items()):
+            series.setdefault(name, []).append(f"{name}{format_labels(labels)} {value}")
+        for (name, labels), histogram in self.histograms.items():
+            cumulative = 0
+            samples = series.setdefault(name, [])
+            for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                cumulative += count
+                samples.append(f"{name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+            samples.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+            samples.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+        for name in sorted(series):
+            kind, description = HELP.get(name, ("untyped", name))
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}", *series[name]]
+        return "\n".join(lines) + "\n"
+
+    # ================== Résumé JSON ========================================
+    def summary(self, elapsed):
+        items = sum(self.values("steam_items_scraped_total").values())
+        callbacks = {}
+        for (name, labels), histogram in self.histograms.items():
+            if name != "steam_callback_cpu_seconds":
+                continue
+            callback = dict(labels)["callback"]
+            produced = self.counters[("steam_callback_items_total", labels)]
+            callbacks[callback] = {
+                "calls": histogram.count,
+                "cpu_s": round(histogram.sum, 3),
+                "cpu_ms_per_call": round(histogram.sum * 1000 / histogram.count, 3),
+                "cpu_ms_per_item": round(histogram.sum * 1000 / produced, 3) if produced else None,
+                "items": produced,
+                "requests": self.counters[("steam_callback_requests_total", labels)],
+            }
+
+        downloads = {}
+        for (name, labels), value in self.counters.items():
+            if name == "steam_responses_total":
+                kind = downloads.setdefault(dict(labels)["kind"], Counter())
+                kind["responses"] += value
+        for kind, row in downloads.items():
+            labels = (("kind", kind),)
+            row["bytes"] = self.counters[("steam_response_bytes_total", labels)]
+            row["cached"] = self.counters[("steam_cached_responses_total", labels)]
+            row["retries"] = self.counters[("steam_retries_total", labels)]
+            histogram = self.histograms.get(("steam_download_latency_seconds", labels))
+            if histogram and histogram.count:
+                row.update({
+                    "latency_mean_s": round(histogram.sum / histogram.count, 3),
+                    "latency_p50_s": histogram.quantile(0.5),
+                    "latency_p90_s": histogram.quantile(0.9),
+                    "latency_p99_s": histogram.quantile(0.99),
+                })
+
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "items": items,
+            "items_per_s": round(items / elapsed, 2) if elapsed else 0.0,
+            "callbacks": callbacks,
+            "downloads": {kind: dict(row) for kind, row in downloads.items()},
+            "throttled": {"/".join(str(value) for _, value in labels): count for labels, count in self.values("steam_throttled_responses_total").items()},
+            "exceptions": {"/".join(str(value) for _, value in labels): count for labels, count in self.values("steam_download_exceptions_total").items()},
+        }
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
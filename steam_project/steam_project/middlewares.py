@@ -1,103 +1,161 @@
-# Define here the models for your spider middleware
+# Middlewares du projet.
 #
-# See documentation in:
-# https://docs.scrapy.org/en/latest/topics/spider-middleware.html
+# SteamProjectSpiderMiddleware et SteamProjectDownloaderMiddleware ne
+# modifient rien : ils relèvent les mesures du scraping (voir metrics.py).
+# BackoffRetryMiddleware remplace la relance de Scrapy. RecordReplayMiddleware
+# enregistre les réponses ou les rejoue sans réseau (voir recordings.py).
 
-from scrapy import signals
+import time
 
-# useful for handling different item types with a single interface
-from itemadapter import is_item, ItemAdapter
+import scrapy
+from scrapy.downloadermiddlewares.retry import RetryMiddleware
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+
+from steam_project import metrics
+from steam_project.recordings import Recording
 
 
 class SteamProjectSpiderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the spider middleware does not modify the
-    # passed objects.
+    # Placé au plus près du spider (ordre 990) : le résultat reçu est le générateur du callback lui-même,
+    # le temps CPU mesuré ne comprend donc que le callback et pas les autres middlewares
+
+    def __init__(self, crawler):
+        self.metrics = metrics.for_crawler(crawler)
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
-        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
-        return s
+        return cls(crawler)
 
-    def process_spider_input(self, response, spider):
-        # Called for each response that goes through the spider
-        # middleware and into the spider.
+    def process_spider_output(self, response, result, spider):
+        callback = getattr(response.request.callback, "__name__", "parse") if response.request else "parse"
+        labels = (("callback", callback),)
+        # thread_time : seul le fil du réacteur compte, pas les fils d'écriture des pipelines
+        cpu = 0.0
+        items = requests = 0
+        iterator = iter(result)
+        try:
+            while True:
+                started = time.thread_time()
+                try:
+                    output = next(iterator)
+                except StopIteration:
+                    cpu += time.thread_time() - started
+                    break
+                cpu += time.thread_time() - started
+                if isinstance(output, scrapy.Request):
+                    requests += 1
+                else:
+                    items += 1
+                yield output
+        finally:
+            self.metrics.observe("steam_callback_cpu_seconds", labels, cpu, metrics.CPU_BUCKETS)
+            self.metrics.inc("steam_callback_items_total", labels, items)
+            self.metrics.inc("steam_callback_requests_total", labels, requests)
 
-        # Should return None or raise an exception.
-        return None
 
-    def process_spider_output(self, response, result, spider):
-        # Called with the results returned from the Spider, after
-        # it has processed the response.
+class SteamProjectDownloaderMiddleware:
+    # Placé au plus près du téléchargeur (ordre 950, après le cache HTTP) : chaque tentative est vue,
+    # y compris les réponses 429/503 que la relance renverra
 
-        # Must return an iterable of Request, or item objects.
-        for i in result:
-            yield i
+    def __init__(self, crawler):
+        self.metrics = metrics.for_crawler(crawler)
 
-    def process_spider_exception(self, response, exception, spider):
-        # Called when a spider or process_spider_input() method
-        # (from other spider middleware) raises an exception.
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
 
-        # Should return either None or an iterable of Request or item objects.
-        pass
+    def process_request(self, request, spider):
+        if request.meta.get("retry_times"):
+            self.metrics.inc("steam_retries_total", (("kind", metrics.url_kind(request.url)),))
+        return None
 
-    def process_start_requests(self, start_requests, spider):
-        # Called with the start requests of the spider, and works
-        # similarly to the process_spider_output() method, except
-        # that it doesn’t have a response associated.
+    def process_response(self, request, response, spider):
+        kind = metrics.url_kind(request.url)
+        labels = (("kind", kind),)
+        self.metrics.inc("steam_responses_total", labels + (("status", response.status),))
+        if "cached" in response.flags:
+            self.metrics.inc("steam_cached_responses_total", labels)
+        else:
+            self.metrics.inc("steam_response_bytes_total", labels, len(response.body))
+            if "download_latency" in request.meta:
+                self.metrics.observe("steam_download_latency_seconds", labels, request.meta["download_latency"], metrics.LATENCY_BUCKETS)
+        if response.status in metrics.THROTTLE_HTTP_CODES:
+            self.metrics.inc("steam_throttled_responses_total", labels + (("status", response.status),))
+        return response
 
-        # Must return only requests (not items).
-        for r in start_requests:
-            yield r
+    def process_exception(self, request, exception, spider):
+        labels = (("kind", metrics.url_kind(request.url)), ("exception", type(exception).__name__))
+        self.metrics.inc("steam_download_exceptions_total", labels)
+        return None
 
-    def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
 
+class BackoffRetryMiddleware(RetryMiddleware):
+    # Relance de Scrapy, avec en plus un ralentissement du domaine quand Steam répond 429 ou 503 :
+    # le délai du slot double (au moins RETRY_BACKOFF_BASE, au plus RETRY_BACKOFF_MAX, en respectant Retry-After),
+    # puis l'AutoThrottle le fait redescendre quand les réponses redeviennent normales.
+    BACKOFF_HTTP_CODES = {429, 503}
 
-class SteamProjectDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+    def __init__(self, settings, crawler):
+        super().__init__(settings)
+        self.crawler = crawler
+        self.backoff_base = settings.getfloat("RETRY_BACKOFF_BASE")
+        self.backoff_max = settings.getfloat("RETRY_BACKOFF_MAX")
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
-        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
-        return s
-
-    def process_request(self, request, spider):
-        # Called for each request that goes through the downloader
-        # middleware.
-
-        # Must either:
-        # - return None: continue processing this request
-        # - or return a Response object
-        # - or return a Request object
-        # - or raise IgnoreRequest: process_exception() methods of
-        #   installed downloader middleware will be called
-        return None
+        return cls(crawler.settings, crawler)
 
     def process_response(self, request, response, spider):
-        # Called with the response returned from the downloader.
+        if response.status in self.BACKOFF_HTTP_CODES and self.backoff_base:
+            self.slow_down(request, response, spider)
+        return super().process_response(request, response, spider)
+
+    def slow_down(self, request, response, spider):
+        slot = self.crawler.engine.downloader.slots.get(request.meta.get("download_slot"))
+        if slot is None:
+            return
+        delay = max(slot.delay * 2, self.backoff_base)
+        retry_after = response.headers.get(b"Retry-After", b"").decode()
+        if retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        slot.delay = min(delay, self.backoff_max)
+        self.crawler.stats.inc_value("retry/backoff_count")
+        spider.logger.debug("Backing off %s to %.1fs after HTTP %d", request.meta.get("download_slot"), slot.delay, response.status)
+
+
+class RecordReplayMiddleware:
+    # Ordre 580, juste après la décompression (590) : les réponses sont enregistrées décompressées, donc
+    # directement utilisables par les callbacks du spider (benchmarks/bench_parse.py)
+    # -s RECORDING_MODE=record : scraping normal, chaque réponse 200 est enregistrée dans RECORDING_DIR
+    # -s RECORDING_MODE=replay : aucune requête réseau, une URL absente de l'enregistrement est ignorée
+
+    def __init__(self, crawler, mode, directory):
+        self.stats = crawler.stats
+        self.mode = mode
+        self.recording = Recording(directory)
 
-        # Must either;
-        # - return a Response object
-        # - return a Request object
-        # - or raise IgnoreRequest
-        return response
-
-    def process_exception(self, request, exception, spider):
-        # Called when a download handler or a process_request()
-        # (from other downloader middleware) raises an exception.
+    @classmethod
+    def from_crawler(cls, crawler):
+        mode = crawler.settings.get("RECORDING_MODE")
+        if not mode:
+            raise NotConfigured("RECORDING_MODE is not set")
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown recording mode {mode!r} (expected record or replay)")
+        return cls(crawler, mode, crawler.settings.get("RECORDING_DIR"))
 
-        # Must either:
-        # - return None: continue processing this exception
-        # - return a Response object: stops process_exception() chain
-        # - return a Request object: stops process_exception() chain
-        pass
+    def process_request(self, request, spider):
+        # Les requêtes locales (data:, file:) ne sont ni enregistrées ni rejouées
+        if self.mode != "replay" or not request.url.startswith("http"):
+            return None
+        response = self.recording.response(request.url, request)
+        if response is None:
+            self.stats.inc_value("recording/missing")
+            raise IgnoreRequest(f"Not in recording: {request.url}")
+        self.stats.inc_value("recording/replayed")
+        return response
 
-    def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
+    def process_response(self, request, response, spider):
+        if self.mode == "record" and response.status == 200 and "replayed" not in response.flags:
+            self.recording.save(response)
+            self.stats.inc_value("recording/saved")
+        return response
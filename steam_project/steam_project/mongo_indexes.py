@@ -0,0 +1,50 @@
+# Index déclarés de la collection steam_games.
+#
+# Le chargeur appelle ensure_indexes après chaque chargement : les index
+# manquants sont créés, ceux qui ne sont plus déclarés (ou dont la définition a
+# changé) sont supprimés. Chaque index correspond à une requête des pages :
+#   - app_id             : clé des upserts du chargeur (unique), pagination par plage de la page d'accueil
+#   - review_score       : tri par note (Exemple 2), fourchettes de notes
+#   - tags               : filtres par tag (multikey) ; les catégories de la page Recherche et leur
+#                          nombre de jeux viennent d'une agrégation Elasticsearch, pas de MongoDB
+#   - price_eur          : fourchettes de prix
+#   - tags + review_score: meilleurs jeux d'une catégorie
+#   - title (collation)  : tri et égalité sur le titre sans tenir compte de la casse ni des accents
+#   - title (texte)      : recherche de mots dans le titre (Exemple 4)
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+INDEXES = [
+    IndexModel([("app_id", ASCENDING)], name="app_id", unique=True),
+    IndexModel([("review_score", ASCENDING)], name="review_score"),
+    IndexModel([("tags", ASCENDING)], name="tags"),
+    IndexModel([("price_eur", ASCENDING)], name="price_eur"),
+    IndexModel([("tags", ASCENDING), ("review_score", DESCENDING)], name="tags_review_score"),
+    IndexModel([("title", ASCENDING)], name="title_ci", collation={"locale": "fr", "strength": 1}),
+    IndexModel([("title", TEXT)], name="title_text", default_language="french"),
+]
+
+
+def index_signature(key, unique=False, collation=None):
+    # Ce qui identifie un index : ses clés et ses options principales
+    collation = collation or {}
+    return list(key), bool(unique), collation.get("locale"), collation.get("strength")
+
+
+def ensure_indexes(collection):
+    declared = {model.document["name"]: model.document for model in INDEXES}
+
+    for name, spec in collection.index_information().items():
+        if name == "_id_":
+            continue
+        model = declared.get(name)
+        if model is None:
+            collection.drop_index(name)
+        elif "_fts" in dict(spec["key"]):
+            # Index texte : MongoDB stocke une forme interne (_fts, _ftsx), on se contente du nom
+            continue
+        elif index_signature(spec["key"], spec.get("unique"), spec.get("collation")) != index_signature(
+                model["key"].items(), model.get("unique"), model.get("collation")):
+            collection.drop_index(name)
+
+    collection.create_indexes(INDEXES)
@@ -0,0 +1,133 @@
+# Normalisation des jeux scrapés en types natifs.
+#
+# Le scraper récupère tout sous forme de texte ("19,99€", "Gratuit",
+# "2,478,430", "21 Aug, 2012", tags séparés par des virgules). On convertit
+# une seule fois, à l'écriture, pour que MongoDB et Elasticsearch stockent des
+# nombres, des dates et des listes directement interrogeables.
+#
+# Toutes les fonctions acceptent aussi une valeur déjà normalisée : relire un
+# CSV exporté après normalisation donne le même résultat.
+
+import math
+import re
+from datetime import date, datetime
+
+FREE_WORDS = ("gratuit", "free")
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+    # Abréviations françaises (pages Steam en français)
+    "janv": 1, "févr": 2, "mars": 3, "avr": 4, "mai": 5, "juin": 6,
+    "juil": 7, "août": 8, "sept": 9, "déc": 12,
+}
+
+NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+DAY_MONTH_YEAR_RE = re.compile(r"^(\d{1,2}) ([^\W\d]+)\.?,? (\d{4})$")
+MONTH_DAY_YEAR_RE = re.compile(r"^([^\W\d]+)\.? (\d{1,2}),? (\d{4})$")
+MONTH_YEAR_RE = re.compile(r"^([^\W\d]+)\.?,? (\d{4})$")
+YEAR_RE = re.compile(r"^(\d{4})$")
+
+
+def is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value)) or (isinstance(value, str) and not value.strip())
+
+
+def parse_price(value):
+    # "19,99€" -> 19.99, "Gratuit" -> 0.0, prix inconnu -> None
+    if is_missing(value):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).lower().replace("€", "").replace(" ", "").replace("\xa0", "")
+    if any(word in text for word in FREE_WORDS):
+        return 0.0
+    if "," in text:
+        # Format français : le point sépare les milliers, la virgule les décimales
+        text = text.replace(".", "").replace(",", ".")
+    match = NUMBER_RE.search(text)
+    return float(match.group()) if match else None
+
+
+def parse_int(value):
+    # "2,478,430" -> 2478430, "86" -> 86, "N/A" -> None
+    if is_missing(value):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    digits = "".join(filter(str.isdigit, str(value)))
+    return int(digits) if digits else None
+
+
+def parse_tags(value):
+    # Liste de tags, qu'ils arrivent en liste (spider) ou joints par des virgules (CSV)
+    if is_missing(value):
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [tag.strip() for tag in value if isinstance(tag, str) and tag.strip()]
+
+
+def parse_release(value):
+    # "21 Aug, 2012" -> datetime(2012, 8, 21) ; "Coming soon", "To be announced" -> None
+    if is_missing(value):
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    text = " ".join(str(value).split())
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+
+    day, month, year = 1, None, None
+    if match := DAY_MONTH_YEAR_RE.match(text):
+        day, month, year = match.group(1), match.group(2), match.group(3)
+    elif match := MONTH_DAY_YEAR_RE.match(text):
+        month, day, year = match.group(1), match.group(2), match.group(3)
+    elif match := MONTH_YEAR_RE.match(text):
+        month, year = match.group(1), match.group(2)
+    elif match := YEAR_RE.match(text):
+        month, year = "jan", match.group(1)
+    else:
+        return None
+
+    month = MONTHS.get(month.lower()[:4]) or MONTHS.get(month.lower()[:3])
+    if month is None:
+        return None
+    try:
+        return datetime(int(year), month, int(day))
+    except ValueError:
+        return None
+
+
+def parse_app_id(value):
+    # Les app_id sont numériques, mais les lots (bundles) peuvent avoir des identifiants composés
+    if is_missing(value):
+        return None
+    app_id = parse_int(value) if isinstance(value, (int, float)) or str(value).strip().isdigit() else None
+    return app_id if app_id is not None else str(value).strip()
+
+
+def normalize_record(record):
+    # review_total est l'ancien nom de review_count dans les CSV déjà scrapés
+    review_count = record.get("review_count", record.get("review_total"))
+    price = record.get("price")
+    price_eur = record.get("price_eur")
+    if is_missing(price_eur):
+        price_eur = price
+    return {
+        "app_id": parse_app_id(record.get("app_id")),
+        "title": None if is_missing(record.get("title")) else record.get("title"),
+        "thumbnail_link": None if is_missing(record.get("thumbnail_link")) else record.get("thumbnail_link"),
+        "release": parse_release(record.get("release")),
+        "review_text": None if is_missing(record.get("review_text")) else record.get("review_text"),
+        "review_score": parse_int(record.get("review_score")),
+        "review_count": parse_int(review_count) or 0,
+        # Le libellé du prix est gardé tel quel pour l'affichage
+        "price": None if is_missing(price) else str(price),
+        "price_eur": parse_price(price_eur),
+        "tags": parse_tags(record.get("tags")),
+    }
@@ -0,0 +1,138 @@
+# Extraction des champs des pages Steam.
+#
+# Les expressions XPath sont compilées une seule fois et appliquées
+# directement sur l'arbre lxml : on évite de construire un objet Selector de
+# Scrapy pour chaque nœud parcouru, ce qui représente l'essentiel du coût de
+# parsing quand on traite des milliers de lignes de recherche. Les champs d'une
+# ligne sont lus en un seul parcours de ses éléments, au lieu d'une recherche
+# XPath par champ (3 fois plus rapide, voir benchmarks/bench_parse.py).
+#
+# Les valeurs restent du texte brut, converties ensuite par SteamProjectPipeline.
+
+import re
+
+from lxml import etree
+
+SEARCH_ROWS = etree.XPath('//a[contains(@class, "search_result_row")]')
+TEXT_NODES = etree.XPath('text()')
+# Arbre lxml simple plutôt que lxml.html : pas de classes HtmlElement à résoudre pour chaque nœud parcouru
+# (les hovers se parsent un tiers plus vite). Utilisé seulement depuis le fil du réacteur.
+HTML_PARSER = etree.HTMLParser()
+SEARCH_TOTAL = etree.XPath('//div[@class="search_pagination_left"]//text()')
+HOVER_TAGS = etree.XPath('.//div[@class="app_tag"]/text()')
+
+NUMBER_RE = re.compile(r"\d[\d,.\s]*\d|\d")
+
+HOVER_URL = "https://store.steampowered.com/apphoverpublic/{app_id}?review_score_preference=0&l=french&ls[]=french&origin=https://store.steampowered.com&pagev6=true"
+
+
+def parse_html(text):
+    # Page complète ou fragment (results_html de l'API de recherche) ; None si le texte est vide
+    if not text or not text.strip():
+        return None
+    return etree.fromstring(text, HTML_PARSER)
+
+
+def search_rows(document):
+    return SEARCH_ROWS(document) if document is not None else []
+
+
+def row_elements(row):
+    # Un seul parcours des éléments de la ligne, dans l'ordre du document : pour chaque champ, la première valeur
+    # trouvée, comme le premier résultat des chemins XPath équivalents indiqués en commentaire
+    title = thumbnail = release = review = price = None
+    for element in row.iter("span", "div", "img"):
+        tag = element.tag
+        css_class = element.get("class")
+        if tag == "div":
+            if css_class == "search_released responsive_secondrow":      # .//div[@class="search_released responsive_secondrow"]/text()
+                release = release if release is not None else first_text(element)
+            elif css_class == "discount_final_price":                   # .//div[@class="discount_final_price"]/text()
+                price = price if price is not None else first_text(element)
+        elif tag == "span":
+            if css_class == "title":                                     # .//span[@class="title"]/text()
+                title = title if title is not None else first_text(element)
+            elif review is None and element.getparent().get("class") == "search_reviewscore responsive_secondrow":
+                review = element.get("data-tooltip-html")                # .//div[@class="search_reviewscore responsive_secondrow"]/span/@data-tooltip-html
+        elif thumbnail is None and element.getparent().get("class") == "search_capsule":
+            thumbnail = element.get("src")                              # .//div[@class="search_capsule"]/img/@src
+    return title, thumbnail, release, review, price
+
+
+def row_fields(row):
+    # Champs d'une ligne de recherche, avec les noms de SteamProjectItem
+    title, thumbnail, release, review, price = row_elements(row)
+    review_value = clean_spaces(review)
+
+    # Nettoyer review_value : "Texte<br>95% of the 1,234 user reviews..."
+    if review_value is not None:
+        parts = review_value.split("<br>")
+        words = parts[1].split(" ")
+        review_text = parts[0].strip()
+        review_score = words[0].strip()[0:-1]
+        review_count = words[3].strip()
+    else:
+        review_text = "No reviews"
+        review_score = "N/A"
+        review_count = "0"
+
+    # Valeur par défaut pour les jeux sans prix
+    price = clean_spaces(price)
+    if price is None:
+        price = "Gratuit"
+
+    return {
+        "app_id": row.get("data-ds-appid"),
+        "title": clean_spaces(title),
+        "thumbnail_link": thumbnail,
+        "release": clean_spaces(release),
+        "review_text": review_text,
+        "review_score": review_score,
+        "review_count": review_count,
+        "price": price,
+    }
+
+
+def search_total(document):
+    # Nombre total de résultats, lu dans "showing 1 - 25 of 12,345" (quelle que soit la langue)
+    if document is None:
+        return None
+    numbers = NUMBER_RE.findall(" ".join(SEARCH_TOTAL(document)))
+    if not numbers:
+        return None
+    return int(re.sub(r"\D", "", numbers[-1]))
+
+
+def hover_tags(document):
+    if document is None:
+        return []
+    return [clean_spaces(tag) for tag in HOVER_TAGS(document)]
+
+
+def hover_url(app_id):
+    return HOVER_URL.format(app_id=app_id)
+
+
+def app_key(app_id):
+    # Clé de dédoublonnage d'une ligne : un lot ou un pack ("10,80") garde tous ses app_id, triés, et ne se confond
+    # donc ni avec un de ses jeux ni avec un autre lot qui en partage une partie
+    if app_id is None:
+        return None
+    return ",".join(sorted({part.strip() for part in app_id.split(",") if part.strip()}))
+
+
+def first(values):
+    return str(values[0]) if values else None
+
+
+def first_text(element):
+    # Premier nœud texte de l'élément : son .text, sauf s'il commence par un élément enfant
+    if element.text is not None:
+        return element.text
+    return first(TEXT_NODES(element))
+
+
+# Fonction pour retirer les espaces inutiles
+def clean_spaces(string_):
+    if string_ is not None:
+        return " ".join(string_.split())
@@ -4,10 +4,210 @@
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
 
+import time
+from collections import Counter
+
+import pymongo
+from elasticsearch import Elasticsearch, helpers
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import DropItem, NotConfigured
+from twisted.internet import defer, task, threads
+
+from steam_project import search_index
+from steam_project.mongo_indexes import ensure_indexes
+from steam_project.normalization import normalize_record
+from steam_project.sinks import HASH_FIELD, content_hash, delete_vanished, es_actions, publish_load, run_bulk, upsert_changed
 
 
 class SteamProjectPipeline:
+    # Convertit les champs texte du scraping en types natifs (prix, notes, nombre d'avis, tags, date)
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        normalized = normalize_record(adapter.asdict())
+        if normalized["app_id"] is None:
+            raise DropItem("Jeu sans app_id")
+
+        for field, value in normalized.items():
+            adapter[field] = value
+        return item
+
+
+
+class BatchingPipeline:
+    # Base des pipelines d'écriture : les jeux sont regroupés en lots bornés en taille (STORE_BATCH_SIZE) et en temps
+    # (STORE_FLUSH_INTERVAL secondes), écrits depuis un thread pour ne jamais bloquer le réacteur Twisted.
+    # Au-delà de STORE_MAX_PENDING lots en cours d'écriture, le scraping attend la fin d'une écriture.
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.stats = crawler.stats
+        self.settings = settings
+        self.batch_size = settings.getint("STORE_BATCH_SIZE")
+        self.flush_interval = settings.getfloat("STORE_FLUSH_INTERVAL")
+        self.max_pending = settings.getint("STORE_MAX_PENDING")
+        self.buffer = []
+        self.pending = set()
+        self.seen = set()
+        self.totals = Counter()
+        self.last_flush = time.monotonic()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = cls(crawler)
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def open_spider(self, spider):
+        self.spider = spider
+        self.timer = task.LoopingCall(self.flush_if_due)
+        self.timer.start(self.flush_interval, now=False)
+        return threads.deferToThread(self.connect)
+
     def process_item(self, item, spider):
+        record = ItemAdapter(item).asdict()
+        # Un jeu peut apparaître sur deux pages de recherche : seule sa première occurrence est écrite
+        if record["app_id"] in self.seen:
+            return item
+        self.seen.add(record["app_id"])
+        self.buffer.append(record)
+
+        if len(self.buffer) >= self.batch_size:
+            flushing = self.flush()
+            if len(self.pending) > self.max_pending:
+                return flushing.addBoth(lambda _: item)
         return item
+
+    def flush_if_due(self):
+        if self.buffer and time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        batch, self.buffer = self.buffer, []
+        self.last_flush = time.monotonic()
+        flushing = threads.deferToThread(self.write, batch)
+        self.pending.add(flushing)
+        # Les compteurs sont mis à jour dans le thread du réacteur, une fois le lot écrit
+        flushing.addCallbacks(self.count, self.write_failed, errbackArgs=(len(batch),))
+        flushing.addBoth(self.written, flushing)
+        return flushing
+
+    def count(self, counts):
+        self.totals.update(counts)
+        for key, value in counts.items():
+            self.stats.inc_value(f"{self.name}/{key}", value)
+
+    def write_failed(self, failure, count):
+        self.stats.inc_value(f"{self.name}/failed", count)
+        self.spider.logger.error("%s: failed to write %d games: %s", self.name, count, failure.getErrorMessage())
+
+    def written(self, result, flushing):
+        self.pending.discard(flushing)
+
+    @defer.inlineCallbacks
+    def close_spider(self, spider):
+        self.timer.stop()
+        if self.buffer:
+            self.flush()
+        yield defer.DeferredList(list(self.pending))
+        if spider.frontier is not None:
+            # Compteurs de ce worker ajoutés à ceux du passage avant que le dernier worker ne le finalise
+            yield threads.deferToThread(spider.frontier.add_totals, self.name, self.totals)
+
+    def spider_closed(self, spider, reason):
+        if spider.frontier is not None:
+            return threads.deferToThread(self.finalize_shared, spider.frontier, reason == "finished")
+        # Les jeux absents du scraping ne sont supprimés qu'après un scraping complet
+        return threads.deferToThread(self.finalize, reason == "finished")
+
+    def finalize_shared(self, frontier, finished):
+        # Scraping réparti : seul le dernier worker du passage finalise, avec les jeux et les compteurs de tous les workers
+        last_worker = frontier.leave(finished)
+        if last_worker:
+            self.seen = frontier.app_ids()
+            self.totals = Counter(frontier.totals(self.name))
+        self.finalize(last_worker)
+
+    def seen_ids(self):
+        return {str(app_id) for app_id in self.seen}
+
+
+class MongoPipeline(BatchingPipeline):
+    # Écrit les jeux dans la collection steam_games pendant le scraping (upsert des seuls jeux modifiés),
+    # puis publie un nouveau load_id en fin de scraping
+    name = "mongodb"
+
+    def __init__(self, crawler):
+        if not crawler.settings.get("MONGO_URI"):
+            raise NotConfigured("MONGO_URI is not set")
+        super().__init__(crawler)
+
+    def connect(self):
+        self.client = pymongo.MongoClient(self.settings.get("MONGO_URI"))
+        self.collection = self.client[self.settings.get("MONGO_DATABASE")]["steam_games"]
+        ensure_indexes(self.collection)
+
+    def write(self, batch):
+        for record in batch:
+            record[HASH_FIELD] = content_hash(record)
+        changed = upsert_changed(self.collection, batch, self.batch_size)
+        return Counter(rows=len(batch), upserted=len(changed))
+
+    def finalize(self, complete):
+        if complete:
+            self.totals["deleted"] = len(delete_vanished(self.collection, self.seen_ids(), self.batch_size))
+            publish_load(self.collection.database, self.totals, force=False)
+        self.client.close()
+
+
+class ElasticsearchPipeline(BatchingPipeline):
+    # Indexe les jeux pendant le scraping : ils sont cherchables dès le refresh suivant de l'index
+    name = "elasticsearch"
+
+    def __init__(self, crawler):
+        if not crawler.settings.get("ELASTICSEARCH_URL"):
+            raise NotConfigured("ELASTICSEARCH_URL is not set")
+        super().__init__(crawler)
+
+    def connect(self):
+        self.es = Elasticsearch(self.settings.get("ELASTICSEARCH_URL"))
+        # Elasticsearch peut démarrer après le scraper : on attend qu'il réponde
+        for _ in range(30):
+            try:
+                if self.es.ping():
+                    break
+            except Exception:
+                pass
+            time.sleep(1)
+        if self.spider.frontier is not None:
+            # Scraping réparti : un seul worker choisit l'index, tous les workers y écrivent
+            self.generation = self.spider.frontier.once("elasticsearch_generation", self.choose_generation)
+        else:
+            self.generation = self.choose_generation()
+        self.target = self.generation or search_index.ALIAS
+
+    def choose_generation(self):
+        if not search_index.live_indices(self.es):
+            # Premier scraping : l'index vide est publié tout de suite et se remplit au fil du scraping
+            search_index.publish_generation(self.es, search_index.create_generation(self.es))
+        elif search_index.needs_rebuild(self.es):
+            # Schéma périmé : on remplit une nouvelle génération, publiée en fin de scraping
+            return search_index.create_generation(self.es)
+        return None
+
+    def write(self, batch):
+        counts = Counter()
+        run_bulk(self.es, es_actions(batch, [], index=self.target), self.batch_size, counts)
+        return Counter(written=counts["es_written"], errors=counts["es_errors"])
+
+    def finalize(self, complete):
+        if complete and self.generation:
+            search_index.publish_generation(self.es, self.generation)
+        elif complete:
+            seen = self.seen_ids()
+            live_ids = (hit["_id"] for hit in helpers.scan(self.es, index=self.target, _source=False, query={"query": {"match_all": {}}}))
+            vanished = [app_id for app_id in live_ids if app_id not in seen]
+            run_bulk(self.es, es_actions([], vanished, index=self.target), self.batch_size, Counter())
+            self.es.indices.refresh(index=self.target)
+        self.es.close()
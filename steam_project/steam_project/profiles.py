@@ -0,0 +1,103 @@
+# Profils de scraping, choisis depuis la ligne de commande :
+#
+#     scrapy crawl steam_search_spider -s CRAWL_PROFILE=fast -o data/steam_search.csv
+#
+# Chaque profil fixe la concurrence, la cible de l'AutoThrottle, la politique
+# de relance (nombre d'essais et ralentissement sur 429/503) et le cache DNS.
+# Les réglages passés explicitement avec -s restent prioritaires sur le profil.
+#
+# -s CRAWL_INCREMENTAL=1 ajoute à n'importe quel profil le cache HTTP
+# persistant des pages hover (voir httpcache.py et crawl_state.py).
+#
+# -s RECORDING_MODE=replay rejoue un enregistrement sans réseau : plus de délai
+# ni d'AutoThrottle, quel que soit le profil (voir recordings.py).
+
+DEFAULT_PROFILE = "polite"
+
+# Réglages communs à tous les profils
+COMMON = {
+    "AUTOTHROTTLE_ENABLED": True,
+    "RETRY_ENABLED": True,
+    "RETRY_HTTP_CODES": [429, 500, 502, 503, 504, 522, 524, 408],
+    "DNSCACHE_ENABLED": True,
+    "DNSCACHE_SIZE": 1000,
+}
+
+CRAWL_PROFILES = {
+    # Scraping de jour : peu de requêtes en parallèle, on ralentit fortement dès que Steam répond 429
+    "polite": {
+        **COMMON,
+        "CONCURRENT_REQUESTS": 8,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 4,
+        "DOWNLOAD_DELAY": 0.5,
+        "AUTOTHROTTLE_START_DELAY": 1,
+        "AUTOTHROTTLE_MAX_DELAY": 30,
+        "AUTOTHROTTLE_TARGET_CONCURRENCY": 2.0,
+        "RETRY_TIMES": 5,
+        "RETRY_BACKOFF_BASE": 5,
+        "RETRY_BACKOFF_MAX": 120,
+        "DNS_TIMEOUT": 10,
+        "DOWNLOAD_TIMEOUT": 30,
+    },
+    # Rafraîchissement rapide : l'AutoThrottle vise 8 requêtes en parallèle sur store.steampowered.com
+    "fast": {
+        **COMMON,
+        "CONCURRENT_REQUESTS": 32,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 16,
+        "DOWNLOAD_DELAY": 0,
+        "AUTOTHROTTLE_START_DELAY": 0.25,
+        "AUTOTHROTTLE_MAX_DELAY": 10,
+        "AUTOTHROTTLE_TARGET_CONCURRENCY": 8.0,
+        "RETRY_TIMES": 2,
+        "RETRY_BACKOFF_BASE": 1,
+        "RETRY_BACKOFF_MAX": 30,
+        "DNS_TIMEOUT": 5,
+        "DOWNLOAD_TIMEOUT": 15,
+    },
+    # Longs rattrapages sans surveillance : débit moyen, beaucoup de relances et des pauses longues
+    "backfill": {
+        **COMMON,
+        "CONCURRENT_REQUESTS": 16,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 8,
+        "DOWNLOAD_DELAY": 0.25,
+        "AUTOTHROTTLE_START_DELAY": 1,
+        "AUTOTHROTTLE_MAX_DELAY": 60,
+        "AUTOTHROTTLE_TARGET_CONCURRENCY": 4.0,
+        "RETRY_TIMES": 8,
+        "RETRY_BACKOFF_BASE": 10,
+        "RETRY_BACKOFF_MAX": 300,
+        "DNS_TIMEOUT": 30,
+        "DOWNLOAD_TIMEOUT": 60,
+    },
+}
+
+# Scraping incrémental : cache HTTP persistant, revalidé par ETag / Last-Modified
+INCREMENTAL = {
+    "HTTPCACHE_ENABLED": True,
+    "HTTPCACHE_POLICY": "steam_project.httpcache.HoverCachePolicy",
+    "HTTPCACHE_ALWAYS_STORE": True,
+    "HTTPCACHE_DIR": "httpcache",
+    "HTTPCACHE_IGNORE_HTTP_CODES": [429, 500, 502, 503, 504],
+}
+
+# Rejeu d'un enregistrement : les réponses sont lues sur le disque, rien ne sert de ralentir
+REPLAY = {
+    "AUTOTHROTTLE_ENABLED": False,
+    "DOWNLOAD_DELAY": 0,
+    "CONCURRENT_REQUESTS": 64,
+    "CONCURRENT_REQUESTS_PER_DOMAIN": 64,
+    "HTTPCACHE_ENABLED": False,
+}
+
+
+def apply_profile(settings):
+    name = settings.get("CRAWL_PROFILE") or DEFAULT_PROFILE
+    if name not in CRAWL_PROFILES:
+        raise ValueError(f"Unknown crawl profile {name!r} (expected one of: {', '.join(CRAWL_PROFILES)})")
+    settings.set("CRAWL_PROFILE", name, priority="spider")
+    # Priorité "spider" : inférieure à celle des options -s de la ligne de commande
+    settings.setdict(CRAWL_PROFILES[name], priority="spider")
+    if settings.getbool("CRAWL_INCREMENTAL"):
+        settings.setdict(INCREMENTAL, priority="spider")
+    if settings.get("RECORDING_MODE") == "replay":
+        settings.setdict(REPLAY, priority="spider")
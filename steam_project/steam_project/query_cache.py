@@ -0,0 +1,158 @@
+# Cache des requêtes des pages Streamlit.
+#
+# Chaque résultat est rangé sous (load_id, nom de la requête, paramètres) : le
+# load_id est celui du dernier chargement, enregistré par le chargeur dans la
+# collection "loads". Tant qu'il ne change pas, une vue déjà affichée ne coûte
+# aucune requête ; quand il change, les entrées des chargements précédents
+# sont supprimées, et seulement elles.
+#
+# Le cache en mémoire est borné (éviction LRU) et partagé par toutes les
+# sessions du processus. Avec un fichier sqlite (QUERY_CACHE_FILE), les
+# résultats sont aussi partagés entre plusieurs processus Streamlit du même
+# hôte.
+
+import json
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+
+# load_id utilisé pour ranger les résultats calculés avant le premier chargement
+NO_LOAD = ""
+
+
+def make_key(name, args, kwargs):
+    # Les paramètres sont des valeurs simples, des listes ou des dictionnaires (corps de requête Elasticsearch)
+    return name + json.dumps([args, kwargs], sort_keys=True, default=str, ensure_ascii=False)
+
+
+class SharedStore:
+    # Table sqlite partagée entre processus ; les plus anciennes entrées sont supprimées au-delà de max_entries
+
+    def __init__(self, path, max_entries):
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS query_cache (key TEXT PRIMARY KEY, load_id TEXT, expires REAL, stored REAL, value BLOB)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS query_cache_stored ON query_cache (stored)")
+
+    def get(self, load_id, key, now):
+        row = self.connection.execute(
+            "SELECT expires, value FROM query_cache WHERE key = ? AND load_id = ? AND expires > ?", (key, load_id, now)
+        ).fetchone()
+        return (row[0], pickle.loads(row[1])) if row else None
+
+    def put(self, load_id, key, expires, value, now):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO query_cache VALUES (?, ?, ?, ?, ?)",
+            (key, load_id, expires, now, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)),
+        )
+        self.connection.execute(
+            "DELETE FROM query_cache WHERE key IN (SELECT key FROM query_cache ORDER BY stored DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def invalidate(self, load_id, now):
+        self.connection.execute("DELETE FROM query_cache WHERE load_id != ? OR expires <= ?", (load_id, now))
+
+
+class QueryCache:
+    def __init__(self, current_load, max_entries=1024, ttl=3600, path=None, load_check_interval=10):
+        # current_load : fonction qui lit le load_id du dernier chargement, rappelée au plus toutes les load_check_interval secondes
+        self.current_load = current_load
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.load_check_interval = load_check_interval
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.per_query = {}
+        self.store = SharedStore(path, max_entries * 4) if path else None
+        self.load_id = None
+        self.load_checked = float("-inf")
+
+    def current_load_id(self):
+        now = time.monotonic()
+        if now - self.load_checked >= self.load_check_interval:
+            load_id = self.current_load() or NO_LOAD
+            with self.lock:
+                self.load_checked = now
+                if load_id != self.load_id:
+                    self.invalidate(load_id)
+        return self.load_id
+
+    def invalidate(self, load_id):
+        # Appelé sous self.lock : on ne garde que les entrées du nouveau chargement
+        stale = [key for key in self.entries if key[0] != load_id]
+        for key in stale:
+            del self.entries[key]
+        self.counters["invalidated"] += len(stale)
+        if self.store:
+            self.store.invalidate(load_id, time.time())
+        self.load_id = load_id
+
+    def count(self, name, event):
+        self.counters[event] += 1
+        self.per_query.setdefault(name, Counter())[event] += 1
+
+    def get_or_compute(self, name, args, kwargs, compute, ttl=None):
+        load_id = self.current_load_id()
+        key = (load_id, make_key(name, args, kwargs))
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.count(name, "hits")
+                return entry[1]
+            if self.store:
+                entry = self.store.get(load_id, key[1], now)
+                if entry:
+                    self.remember(key, entry)
+                    self.count(name, "shared_hits")
+                    return entry[1]
+
+        # La requête est exécutée hors du verrou : les autres sessions continuent d'être servies
+        started = time.perf_counter()
+        value = compute(*args, **kwargs)
+        elapsed = time.perf_counter() - started
+        entry = (now + (ttl or self.ttl), value)
+        with self.lock:
+            self.count(name, "misses")
+            self.per_query[name]["miss_seconds"] += elapsed
+            # Un nouveau chargement a pu être détecté pendant la requête : le résultat n'est pas rangé sous l'ancien load_id
+            if load_id == self.load_id:
+                self.remember(key, entry)
+                if self.store:
+                    self.store.put(load_id, key[1], entry[0], value, now)
+        return value
+
+    def remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evicted"] += 1
+
+    def cached(self, ttl=None):
+        # Décorateur des fonctions de requête ; les résultats renvoyés sont partagés et ne doivent pas être modifiés
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                return self.get_or_compute(function.__name__, args, kwargs, function, ttl)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        with self.lock:
+            return {
+                "load_id": self.load_id,
+                "entries": len(self.entries),
+                "shared": self.store is not None,
+                **self.counters,
+                "queries": {name: dict(counters) for name, counters in self.per_query.items()},
+            }
@@ -0,0 +1,70 @@
+# Enregistrement des réponses Steam pour rejouer le spider hors ligne.
+#
+# Un enregistrement est un dossier : chaque corps de réponse y est écrit
+# compressé (gzip) sous l'empreinte de son URL canonique, et index.jsonl
+# garde l'URL, le statut et les en-têtes de chaque réponse. Un enregistrement
+# est produit par un vrai scraping (-s RECORDING_MODE=record), puis rejoué
+# sans réseau et à pleine vitesse (-s RECORDING_MODE=replay) ou directement
+# par benchmarks/bench_parse.py.
+
+import gzip
+import hashlib
+import json
+import os
+
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from w3lib.url import canonicalize_url
+
+
+def url_key(url):
+    return hashlib.sha1(canonicalize_url(url).encode()).hexdigest()
+
+
+class Recording:
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.jsonl")
+        self.entries = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as file:
+                for line in file:
+                    entry = json.loads(line)
+                    self.entries[entry["key"]] = entry
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, url):
+        return url_key(url) in self.entries
+
+    def urls(self):
+        return [entry["url"] for entry in self.entries.values()]
+
+    def save(self, response):
+        # Une URL déjà enregistrée est remplacée par sa dernière réponse
+        os.makedirs(self.directory, exist_ok=True)
+        key = url_key(response.url)
+        with gzip.open(os.path.join(self.directory, key + ".gz"), "wb", compresslevel=6) as file:
+            file.write(response.body)
+        entry = {
+            "key": key,
+            "url": response.url,
+            "status": response.status,
+            "headers": {name.decode(): [value.decode("latin-1") for value in values] for name, values in response.headers.items()},
+        }
+        self.entries[key] = entry
+        with open(self.index_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry) + "\n")
+
+    def response(self, url, request=None):
+        # Réponse Scrapy du bon type (HtmlResponse, TextResponse...) ; None si l'URL n'a pas été enregistrée
+        entry = self.entries.get(url_key(url))
+        if entry is None:
+            return None
+        with gzip.open(os.path.join(self.directory, entry["key"] + ".gz"), "rb") as file:
+            body = file.read()
+        headers = Headers({name: values for name, values in entry["headers"].items()})
+        cls = responsetypes.from_args(headers=headers, url=entry["url"], body=body)
+        return cls(url=url, status=entry["status"], headers=headers, body=body, request=request, flags=["replayed"])
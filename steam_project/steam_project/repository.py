@@ -0,0 +1,198 @@
+# Accès aux données des pages Streamlit et du chargeur.
+#
+# Un seul client MongoDB et un seul client Elasticsearch par processus,
+# partagés par toutes les sessions Streamlit, avec des pools de connexions
+# réglés par variables d'environnement. Les pages n'appellent que les
+# fonctions de requête ci-dessous, une par besoin d'affichage : c'est le seul
+# code qui parle aux bases. Leurs résultats sont mis en cache par load_id
+# (voir query_cache.py) : une vue déjà affichée ne coûte aucune requête tant
+# qu'aucun nouveau chargement n'a eu lieu.
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+
+import pymongo
+from elasticsearch import Elasticsearch
+
+from steam_project import search_index
+from steam_project.analytics import read_summary
+from steam_project.loads import current_load_id
+from steam_project.query_cache import QueryCache
+from steam_project.snapshot import read_snapshot, snapshot_path
+
+# ================== Configuration des connexions ============================
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongodb:27017/")
+MONGO_DATABASE = os.getenv("MONGO_DATABASE", "projet")
+MONGO_OPTIONS = {
+    "appname": "steam_project",
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "2")),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+    "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000")),
+    "compressors": os.getenv("MONGO_COMPRESSORS", "zlib"),
+    "retryReads": True,
+    "retryWrites": True,
+    # primaryPreferred : les lectures des pages continuent sur un secondaire si le primaire est indisponible
+    "readPreference": os.getenv("MONGO_READ_PREFERENCE", "primaryPreferred"),
+}
+
+ES_URL = os.getenv("ELASTICSEARCH_URL") or f"http://{os.getenv('ES_HOST', 'elasticsearch')}:{os.getenv('ES_PORT', '9200')}"
+ES_OPTIONS = {
+    "maxsize": int(os.getenv("ES_MAX_CONNECTIONS", "25")),
+    "timeout": int(os.getenv("ES_TIMEOUT", "10")),
+    "max_retries": int(os.getenv("ES_MAX_RETRIES", "2")),
+    "retry_on_timeout": True,
+    "http_compress": True,
+}
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "3600"))
+# Fichier sqlite partagé par les processus Streamlit de l'hôte ; vide : cache propre à chaque processus
+QUERY_CACHE_FILE = os.getenv("QUERY_CACHE_FILE") or None
+# Délai maximal avant qu'un nouveau chargement soit vu par les pages
+LOAD_CHECK_INTERVAL = int(os.getenv("LOAD_CHECK_INTERVAL", "10"))
+# Requêtes exécutées en parallèle pour une page, toutes sessions confondues
+QUERY_WORKERS = int(os.getenv("QUERY_WORKERS", "8"))
+
+
+@lru_cache(maxsize=None)
+def mongo_client():
+    return pymongo.MongoClient(MONGO_URI, **MONGO_OPTIONS)
+
+
+def database():
+    return mongo_client()[MONGO_DATABASE]
+
+
+def games():
+    return database()["steam_games"]
+
+
+@lru_cache(maxsize=None)
+def elasticsearch():
+    return Elasticsearch(ES_URL, **ES_OPTIONS)
+
+# ================== Chargements et cache ====================================
+cache = QueryCache(lambda: current_load_id(database()), QUERY_CACHE_SIZE, QUERY_CACHE_TTL, QUERY_CACHE_FILE, LOAD_CHECK_INTERVAL)
+
+
+def load_id():
+    # Relu dans la collection "loads" au plus toutes les LOAD_CHECK_INTERVAL secondes
+    return cache.current_load_id() or None
+
+# ================== Exécution parallèle =====================================
+executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="repository")
+
+
+def timed(query):
+    started = time.perf_counter()
+    result = query()
+    return result, time.perf_counter() - started
+
+
+def run_concurrently(queries):
+    # queries : {nom: fonction sans argument}. Toutes les requêtes partent tout de suite ; le générateur renvoyé
+    # donne (nom, résultat, secondes) dans l'ordre d'arrivée des réponses
+    futures = {executor.submit(timed, query): name for name, query in queries.items()}
+
+    def completed():
+        for future in as_completed(futures):
+            result, seconds = future.result()
+            yield futures[future], result, seconds
+    return completed()
+
+# ================== Page d'accueil ==========================================
+@cache.cached()
+def game_count():
+    # Lu dans les métadonnées de la collection, sans parcourir les documents
+    return games().estimated_document_count()
+
+
+def after_app_id_filter(after_app_id):
+    # Les app_id sont des entiers, sauf ceux des lots (texte, "377160,435870"). Le tri place tous les
+    # nombres avant les textes, mais $gt ne compare que des valeurs du même type : après un entier,
+    # les app_id texte restent tous à venir
+    if after_app_id is None:
+        return {}
+    if isinstance(after_app_id, str):
+        return {"app_id": {"$gt": after_app_id}}
+    return {"$or": [{"app_id": {"$gt": after_app_id}}, {"app_id": {"$type": "string"}}]}
+
+
+@cache.cached()
+def games_page(after_app_id, skip, page_size, columns):
+    # Jeux triés par app_id, à partir du dernier app_id de la page précédente (index unique app_id)
+    query = after_app_id_filter(after_app_id)
+    cursor = games().find(query, {"_id": 0, **{column: 1 for column in columns}})
+    return list(cursor.sort("app_id", pymongo.ASCENDING).skip(skip).limit(page_size).batch_size(page_size))
+
+# ================== Interprétation des données ==============================
+@cache.cached()
+def summary(name, load_id, sort=None, limit=0):
+    # Agrégats précalculés au chargement (voir analytics.py)
+    return read_summary(database(), name, load_id, sort=sort, limit=limit)
+
+
+def catalogue(load_id, columns, filters=None):
+    # Catalogue entier lu dans l'instantané Parquet du chargement (voir snapshot.py) : seulement les colonnes
+    # demandées, filtres poussés jusqu'aux fichiers, fichiers mappés en mémoire. None tant qu'il n'existe pas.
+    # Pas de cache ici : le DataFrame est gardé par la page (st.cache_resource), sans copie entre les sessions
+    if load_id is None or not os.path.isdir(snapshot_path(load_id)):
+        return None
+    return read_snapshot(snapshot_path(load_id), columns=columns, filters=filters)
+
+# ================== Recherche ===============================================
+@cache.cached()
+def search_games(body):
+    return elasticsearch().search(index=search_index.ALIAS, body=body)
+
+
+def open_search_pit(keep_alive):
+    return elasticsearch().open_point_in_time(index=search_index.ALIAS, keep_alive=keep_alive)["id"]
+
+
+def search_games_pit(body):
+    # Requête sur un point-in-time : l'index est donné par le point-in-time, pas dans l'URL.
+    # Pas de cache : le point-in-time et les curseurs sont propres à une session
+    return elasticsearch().search(body=body)
+
+
+def close_search_pit(pit_id):
+    elasticsearch().close_point_in_time(body={"id": pit_id})
+
+
+def suggest_titles(prefix, size, load_id):
+    return search_index.suggest_titles(elasticsearch(), prefix, size, load_id)
+
+# ================== Exemples d'utilisation ==================================
+def random_games(size):
+    # Pas de cache : un tirage différent à chaque affichage
+    return list(games().aggregate([{'$sample': {'size': size}}]))
+
+
+@cache.cached()
+def worst_rated_games(limit):
+    # Tri par note croissante sur l'index review_score, les jeux sans note sont exclus
+    return list(games().find({"review_score": {"$type": "number"}}).sort([('review_score', pymongo.ASCENDING)]).limit(limit))
+
+
+@cache.cached()
+def top_tags(limit):
+    return list(games().aggregate([
+        { '$project':   { 'tags': 1 } },                                # Les tags sont déjà stockés sous forme de liste
+        { '$unwind':    "$tags" },                                      # On décompose la liste pour avoir un document par tag
+        { '$group':     { '_id': "$tags" , 'count': { '$sum': 1 } } },  # On groupe par tag et on compte le nombre de jeux par tag
+        { '$sort':      { 'count': -1 } },                              # On trie par nombre de jeux décroissant
+        { '$limit':     limit }                                         # On limite le nombre de résultats
+    ]))
+
+
+@cache.cached()
+def games_with_title_word(word, limit):
+    # Index texte sur le titre : insensible à la casse, aux accents et au pluriel, contrairement à un $regex
+    cursor = games().find({"$text": {"$search": word}}, {"score": {"$meta": "textScore"}})
+    return list(cursor.sort([('score', {"$meta": "textScore"})]).limit(limit))
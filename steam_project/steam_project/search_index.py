@@ -0,0 +1,168 @@
+# Gestion de l'index Elasticsearch des jeux Steam.
+#
+# Les pages interrogent toujours l'alias "steam_games". Chaque reconstruction
+# complète se fait dans un nouvel index horodaté (une "génération"), chargé
+# sans refresh ni réplicas, puis l'alias est basculé atomiquement dessus :
+# la recherche ne voit jamais d'index vide ou absent.
+
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from elasticsearch.exceptions import NotFoundError
+
+ALIAS = "steam_games"
+
+# À incrémenter à chaque changement de mapping ou de réglages : force une reconstruction au prochain chargement
+SCHEMA_VERSION = 5
+
+# Nombre de générations conservées (celle en ligne comprise), pour pouvoir revenir en arrière
+KEEP_GENERATIONS = int(os.getenv("ES_KEEP_GENERATIONS", "2"))
+
+# Nombre de préfixes gardés en mémoire par l'autocomplétion
+SUGGEST_CACHE_SIZE = int(os.getenv("SUGGEST_CACHE_SIZE", "4096"))
+SUGGEST_FIELDS = ["app_id", "title", "thumbnail_link"]
+
+# Réglages pendant le chargement en masse, puis une fois l'index en ligne
+BULK_SETTINGS = {"number_of_replicas": 0, "refresh_interval": "-1"}
+LIVE_SETTINGS = {"number_of_replicas": int(os.getenv("ES_REPLICAS", "0")), "refresh_interval": "1s"}
+
+
+# Analyse du texte : titres en français, insensibles à la casse et aux accents
+ANALYSIS = {
+    "filter": {
+        "french_elision": {"type": "elision", "articles_case": True,
+                           "articles": ["l", "m", "t", "qu", "n", "s", "j", "d", "c", "jusqu", "quoiqu", "lorsqu", "puisqu"]},
+        "french_stemmer": {"type": "stemmer", "language": "light_french"},
+        "title_edge_ngram": {"type": "edge_ngram", "min_gram": 1, "max_gram": 20},
+    },
+    "normalizer": {
+        "folded": {"type": "custom", "filter": ["lowercase", "asciifolding"]},
+    },
+    "analyzer": {
+        "french_folded": {"tokenizer": "standard", "filter": ["french_elision", "lowercase", "asciifolding", "french_stemmer"]},
+        # Préfixes des mots du titre à l'indexation ("counter" -> "c", "co", "cou"...), mots entiers à la recherche
+        "title_prefix": {"tokenizer": "standard", "filter": ["lowercase", "asciifolding", "title_edge_ngram"]},
+        "title_prefix_search": {"tokenizer": "standard", "filter": ["lowercase", "asciifolding"]},
+    },
+}
+
+# Mapping explicite : aucun champ n'est deviné par Elasticsearch (dynamic: false)
+MAPPINGS = {
+    "dynamic": False,
+    "_meta": {"schema_version": SCHEMA_VERSION},
+    "properties": {
+        "app_id": {"type": "keyword"},
+        "title": {
+            "type": "text",
+            "analyzer": "french_folded",
+            "fields": {
+                "prefix": {"type": "text", "analyzer": "title_prefix", "search_analyzer": "title_prefix_search"},
+                "sort": {"type": "keyword", "normalizer": "folded"},
+                # Autocomplétion : suggesteur "completion", servi depuis une structure en mémoire
+                "suggest": {"type": "completion", "analyzer": "title_prefix_search"},
+            },
+        },
+        # Tags en keyword : filtres exacts et agrégation des catégories (facettes) sur la page Recherche
+        "tags": {"type": "keyword"},
+        "review_text": {"type": "text", "analyzer": "french_folded"},
+        "review_score": {"type": "integer"},
+        "review_count": {"type": "integer"},
+        "price_eur": {"type": "scaled_float", "scaling_factor": 100},
+        "release": {"type": "date"},
+        # Champs seulement affichés : stockés dans _source mais ni indexés ni triables
+        "price": {"type": "keyword", "index": False, "doc_values": False},
+        "thumbnail_link": {"type": "keyword", "index": False, "doc_values": False},
+    },
+}
+
+
+def put_template(es):
+    # Modèle appliqué à toutes les générations "steam_games-*"
+    es.indices.put_index_template(name=ALIAS, body={
+        "index_patterns": [f"{ALIAS}-*"],
+        "priority": 100,
+        "template": {"settings": {"analysis": ANALYSIS}, "mappings": MAPPINGS},
+        "_meta": {"schema_version": SCHEMA_VERSION},
+    })
+
+
+def index_body():
+    # Le mapping et l'analyse viennent du modèle, seuls les réglages du chargement en masse sont propres à la création
+    return {"settings": {"index": BULK_SETTINGS}}
+
+
+def generation_name():
+    return f"{ALIAS}-{datetime.now(timezone.utc):%Y%m%d%H%M%S}"
+
+
+def live_indices(es):
+    try:
+        return sorted(es.indices.get_alias(name=ALIAS))
+    except NotFoundError:
+        return []
+
+
+def needs_rebuild(es):
+    # Pas d'alias (premier chargement, ou ancien index "steam_games" créé sans alias) ou schéma périmé
+    indices = live_indices(es)
+    if len(indices) != 1:
+        return True
+    mapping = es.indices.get_mapping(index=indices[0])[indices[0]]["mappings"]
+    return mapping.get("_meta", {}).get("schema_version") != SCHEMA_VERSION
+
+
+def create_generation(es):
+    put_template(es)
+    name = generation_name()
+    es.indices.create(index=name, body=index_body())
+    return name
+
+
+def warm_up(es, name):
+    # Quelques requêtes représentatives pour charger les structures en cache avant la bascule
+    es.search(index=name, size=0, track_total_hits=True, query={"match_all": {}})
+    es.search(index=name, size=10, query={"match_all": {}})
+
+
+def publish_generation(es, name):
+    # Remise des réglages de production, attente que l'index soit prêt puis bascule atomique de l'alias
+    es.indices.put_settings(index=name, body={"index": LIVE_SETTINGS})
+    es.indices.refresh(index=name)
+    es.cluster.health(index=name, wait_for_status="yellow", timeout="60s")
+    warm_up(es, name)
+
+    actions = [{"remove": {"index": index, "alias": ALIAS}} for index in live_indices(es)]
+    if es.indices.exists(index=ALIAS) and not es.indices.exists_alias(name=ALIAS):
+        # Ancien index concret nommé "steam_games" : il est supprimé dans la même opération atomique
+        actions.append({"remove_index": {"index": ALIAS}})
+    actions.append({"add": {"index": name, "alias": ALIAS}})
+    es.indices.update_aliases(body={"actions": actions})
+
+    prune_generations(es)
+
+
+def prune_generations(es, keep=KEEP_GENERATIONS):
+    live = set(live_indices(es))
+    generations = sorted(es.indices.get(index=f"{ALIAS}-*"), reverse=True)
+    for index in generations[keep:]:
+        if index not in live:
+            es.indices.delete(index=index)
+
+
+def suggest_titles(es, prefix, size=8, load_id=None):
+    # Titres commençant par le préfixe saisi, avec app_id et miniature
+    prefix = " ".join(prefix.lower().split())
+    if not prefix:
+        return []
+    return list(cached_suggestions(es, prefix, size, load_id))
+
+
+@lru_cache(maxsize=SUGGEST_CACHE_SIZE)
+def cached_suggestions(es, prefix, size, load_id):
+    # load_id ne sert qu'à la clé du cache : après un nouveau chargement, les anciennes entrées ne sont plus lues
+    response = es.search(index=ALIAS, body={
+        "_source": SUGGEST_FIELDS,
+        "suggest": {"titles": {"prefix": prefix, "completion": {"field": "title.suggest", "size": size, "skip_duplicates": True}}},
+    })
+    return tuple(option["_source"] for option in response["suggest"]["titles"][0]["options"])
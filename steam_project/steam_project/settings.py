@@ -7,6 +7,8 @@
 #     https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import os
+
 BOT_NAME = "steam_project"
 
 SPIDER_MODULES = ["steam_project.spiders"]
@@ -19,6 +21,38 @@ NEWSPIDER_MODULE = "steam_project.spiders"
 # Obey robots.txt rules
 ROBOTSTXT_OBEY = True
 
+# Profil de scraping (concurrence, AutoThrottle, relances, cache DNS), voir profiles.py.
+# Se choisit en ligne de commande : scrapy crawl steam_search_spider -s CRAWL_PROFILE=fast
+CRAWL_PROFILE = "polite"
+
+# Nombre maximum de pages de recherche scrapées (pour éviter de scraper tout Steam)
+SEARCH_MAX_PAGES = 100
+
+# Mode json (-a mode=json) : nombre de jeux par requête à l'API du magasin
+STEAM_API_BATCH_SIZE = 50
+
+# Scraping incrémental (-s CRAWL_INCREMENTAL=1) : les jeux dont la ligne de recherche n'a pas changé
+# reprennent leurs tags du passage précédent, enregistrés dans CRAWL_STATE_FILE (voir crawl_state.py)
+CRAWL_INCREMENTAL = False
+CRAWL_STATE_FILE = "data/crawl_state.sqlite"
+CRAWL_STATE_MAX_AGE_DAYS = 7
+# Scraping avec reprise (mode html) : -s CRAWL_RESUMABLE=1, voir checkpoint.py
+CRAWL_RESUMABLE = False
+CRAWL_CHECKPOINT_FILE = "data/crawl_checkpoint.sqlite"
+CRAWL_CHECKPOINT_INTERVAL = 10
+# Scraping réparti entre plusieurs workers (mode html) : -s CRAWL_FRONTIER=1, voir frontier.py
+CRAWL_FRONTIER = False
+CRAWL_RUN = None
+CRAWL_WORKER = None
+CRAWL_FRONTIER_LEASE = 300
+CRAWL_FRONTIER_MAX_ATTEMPTS = 3
+# Durée maximale (secondes) pendant laquelle un worker renouvelle le bail d'un même job
+CRAWL_FRONTIER_MAX_HOLD = 1800
+CRAWL_FRONTIER_PREFETCH = 64
+CRAWL_FRONTIER_POLL_INTERVAL = 0.5
+# Ordre des hovers : "reviews" (jeux les plus commentés d'abord), "rank" (ordre des résultats de recherche) ou "none"
+CRAWL_PRIORITY = "reviews"
+
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
 #CONCURRENT_REQUESTS = 32
 
@@ -44,27 +78,57 @@ ROBOTSTXT_OBEY = True
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "steam_project.middlewares.SteamProjectSpiderMiddleware": 543,
-#}
+# Mesures du scraping (voir metrics.py) : au plus près du spider, pour ne mesurer que les callbacks
+SPIDER_MIDDLEWARES = {
+    "steam_project.middlewares.SteamProjectSpiderMiddleware": 990,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "steam_project.middlewares.SteamProjectDownloaderMiddleware": 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    "scrapy.downloadermiddlewares.retry.RetryMiddleware": None,
+    "steam_project.middlewares.BackoffRetryMiddleware": 550,
+    # Après le cache HTTP (900) : voit chaque tentative et distingue les réponses servies par le cache
+    "steam_project.middlewares.SteamProjectDownloaderMiddleware": 950,
+    "steam_project.middlewares.RecordReplayMiddleware": 580,
+}
+
+# Enregistrement des réponses pour rejouer le spider hors ligne : "record", "replay" ou vide (voir recordings.py)
+RECORDING_MODE = None
+RECORDING_DIR = "data/recordings"
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
-#    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+EXTENSIONS = {
+    "steam_project.extensions.CrawlReport": 500,
+    "steam_project.extensions.MetricsExporter": 510,
+}
+
+# Rapport de chaque scraping (req/s, latences, taux d'erreur), une ligne JSON par scraping
+CRAWL_REPORT_FILE = "data/crawl_reports.jsonl"
+
+# Mesures au format Prometheus, réécrites toutes les METRICS_INTERVAL secondes, et résumé JSON du dernier scraping
+METRICS_FILE = "data/crawl_metrics.prom"
+METRICS_INTERVAL = 15
+METRICS_SUMMARY_FILE = "data/crawl_metrics.json"
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
-#    "steam_project.pipelines.SteamProjectPipeline": 300,
-#}
+ITEM_PIPELINES = {
+    "steam_project.pipelines.SteamProjectPipeline": 300,
+    "steam_project.pipelines.MongoPipeline": 400,
+    "steam_project.pipelines.ElasticsearchPipeline": 500,
+}
+
+# Écriture des jeux dans MongoDB et Elasticsearch pendant le scraping.
+# Chaque pipeline est désactivé si son adresse n'est pas définie (scraping vers un CSV seulement).
+MONGO_URI = os.getenv("MONGO_URI")
+MONGO_DATABASE = "projet"
+ELASTICSEARCH_URL = os.getenv("ELASTICSEARCH_URL")
+# Lots bornés en taille et en temps, écrits depuis des threads
+STORE_BATCH_SIZE = 500
+STORE_FLUSH_INTERVAL = 5
+STORE_MAX_PENDING = 4
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -91,3 +155,4 @@ ROBOTSTXT_OBEY = True
 REQUEST_FINGERPRINTER_IMPLEMENTATION = "2.7"
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 FEED_EXPORT_ENCODING = "utf-8"
+FEED_EXPORT_FIELDS = ["app_id", "title", "thumbnail_link", "release", "review_text", "review_score", "review_count", "price", "price_eur", "tags"]
@@ -0,0 +1,99 @@
+# Écriture des jeux dans MongoDB et Elasticsearch.
+#
+# Fonctions partagées par le chargeur CSV (steam_mongoDB.py) et les pipelines
+# Scrapy, qui écrivent les jeux au fil du scraping : upsert des seuls jeux
+# modifiés (empreinte du contenu), suppression des jeux disparus, envoi en
+# masse vers Elasticsearch et publication d'un nouveau load_id.
+
+import hashlib
+import json
+import os
+
+import pymongo
+from elasticsearch import helpers
+
+from steam_project import search_index
+from steam_project.analytics import prune_analytics, refresh_analytics
+from steam_project.loads import current_load_id, new_load_id, record_load
+from steam_project.snapshot import snapshot_path, write_snapshot
+
+INDEX_NAME = search_index.ALIAS
+HASH_FIELD = "content_hash"
+
+
+def content_hash(record):
+    # Empreinte du contenu d'un jeu, indépendante de l'ordre des champs
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def batched(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+# ================== MongoDB =================================================
+def upsert_changed(collection, chunk, batch_size):
+    # On ne relit que l'empreinte des jeux du morceau, puis on réécrit seulement ceux qui ont changé
+    stored = {str(doc["app_id"]): doc.get(HASH_FIELD) for doc in collection.find(
+        {"app_id": {"$in": [record["app_id"] for record in chunk]}}, {"_id": 0, "app_id": 1, HASH_FIELD: 1})}
+    changed = [record for record in chunk if stored.get(str(record["app_id"])) != record[HASH_FIELD]]
+
+    for batch in batched(changed, batch_size):
+        collection.bulk_write([pymongo.ReplaceOne({"app_id": record["app_id"]}, record, upsert=True) for record in batch], ordered=False)
+    return changed
+
+
+def delete_vanished(collection, seen, batch_size):
+    vanished = [doc["app_id"] for doc in collection.find({}, {"_id": 0, "app_id": 1}) if str(doc.get("app_id")) not in seen]
+    for ids in batched(vanished, batch_size):
+        collection.delete_many({"app_id": {"$in": ids}})
+    return vanished
+
+# ================== Elasticsearch ===========================================
+def es_source(record):
+    source = dict(record)
+    source.pop("_id", None)
+    source.pop(HASH_FIELD, None)
+    return source
+
+
+def es_actions(changed, vanished, index=INDEX_NAME):
+    for record in changed:
+        yield {"_op_type": "index", "_index": index, "_id": str(record["app_id"]), "_source": es_source(record)}
+    for app_id in vanished:
+        yield {"_op_type": "delete", "_index": index, "_id": str(app_id)}
+
+
+def run_bulk(es, actions, batch_size, stats):
+    for ok, info in helpers.streaming_bulk(es, actions, chunk_size=batch_size, raise_on_error=False):
+        # Supprimer un document déjà absent de l'index n'est pas une erreur
+        if ok or info.get("delete", {}).get("status") == 404:
+            stats["es_written"] += 1
+        else:
+            if not stats["es_errors"]:
+                print(f"Elasticsearch: first bulk error: {info}")
+            stats["es_errors"] += 1
+
+# ================== Publication du chargement ==============================
+def publish_load(database, stats, force):
+    # Un nouveau load_id n'est attribué que si les données ont changé : les agrégats et les caches restent valides sinon
+    load_id = current_load_id(database)
+    if load_id and not force and not (stats["upserted"] or stats["deleted"]):
+        print(f"No data change, keeping load '{load_id}'.")
+        if not os.path.isdir(snapshot_path(load_id)):
+            write_collection_snapshot(database, load_id)
+        return load_id
+
+    load_id = new_load_id()
+    refresh_analytics(database, load_id)
+    # L'instantané Parquet est prêt avant la publication du load_id
+    write_collection_snapshot(database, load_id)
+    record_load(database, load_id, stats)
+    prune_analytics(database, load_id)
+    print(f"Load '{load_id}' published, analytics summaries refreshed.")
+    return load_id
+
+
+def write_collection_snapshot(database, load_id):
+    path = write_snapshot(database["steam_games"].find({}, {"_id": 0, HASH_FIELD: 0}, batch_size=10_000), load_id)
+    print(f"Parquet snapshot written to {path}.")
@@ -0,0 +1,105 @@
+# Instantané Parquet du catalogue.
+#
+# À chaque nouveau chargement, le catalogue est écrit en Parquet typé et
+# compressé (zstd) dans data/snapshot/<load_id>, partitionné par année de
+# sortie (release_year=2019/...). Les lecteurs ne lisent que les colonnes
+# dont ils ont besoin, les filtres sont poussés jusqu'aux fichiers (partitions
+# et statistiques des row groups) et les fichiers sont mappés en mémoire au
+# lieu d'être recopiés.
+#
+#     python -m steam_project.snapshot data/steam_search.csv    # instantané depuis un CSV
+
+import argparse
+import os
+import shutil
+from itertools import islice
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from steam_project.loads import new_load_id
+from steam_project.normalization import normalize_record
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "data/snapshot")
+KEEP_SNAPSHOTS = 2
+BATCH_SIZE = 50_000
+
+PARTITIONING = ds.partitioning(pa.schema([("release_year", pa.int16())]), flavor="hive")
+SCHEMA = pa.schema([
+    # Texte : les lots (bundles) ont un app_id composé ("377160,435870")
+    ("app_id", pa.string()),
+    ("title", pa.string()),
+    ("thumbnail_link", pa.string()),
+    ("release", pa.timestamp("ms")),
+    ("review_text", pa.string()),
+    ("review_score", pa.int8()),
+    ("review_count", pa.int64()),
+    ("price", pa.string()),
+    ("price_eur", pa.float64()),
+    ("tags", pa.list_(pa.string())),
+    ("release_year", pa.int16()),
+])
+
+
+def snapshot_path(load_id, directory=SNAPSHOT_DIR):
+    return os.path.join(directory, load_id)
+
+
+def record_batches(records, batch_size):
+    # Les champs absents du schéma (_id, content_hash...) sont ignorés
+    records = iter(records)
+    while True:
+        rows = list(islice(records, batch_size))
+        if not rows:
+            return
+        for row in rows:
+            row["app_id"] = None if row.get("app_id") is None else str(row["app_id"])
+            row["release_year"] = row["release"].year if row.get("release") else None
+        yield pa.RecordBatch.from_pylist(rows, schema=SCHEMA)
+
+
+def write_snapshot(records, load_id, directory=SNAPSHOT_DIR, batch_size=BATCH_SIZE):
+    # Écrit dans un dossier temporaire puis le renomme : un lecteur ne voit jamais d'instantané incomplet
+    path = snapshot_path(load_id, directory)
+    staging = path + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    ds.write_dataset(
+        record_batches(records, batch_size), staging, schema=SCHEMA, format="parquet", partitioning=PARTITIONING,
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+        max_rows_per_group=batch_size, existing_data_behavior="overwrite_or_ignore",
+    )
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(staging, path)
+    prune_snapshots(directory)
+    return path
+
+
+def read_snapshot(path, columns=None, filters=None, arrow_dtypes=True):
+    # filters au format pyarrow, par exemple [("release_year", ">=", 2020), ("price_eur", "<=", 10)].
+    # Avec arrow_dtypes, les colonnes restent des tableaux Arrow (pd.ArrowDtype) : pas de conversion des
+    # chaînes et des listes de tags en objets Python, deux fois moins de mémoire et de temps sur 1M de jeux.
+    table = pq.read_table(path, columns=columns, filters=filters, partitioning=PARTITIONING, memory_map=True)
+    return table.to_pandas(types_mapper=pd.ArrowDtype if arrow_dtypes else None)
+
+
+def prune_snapshots(directory=SNAPSHOT_DIR, keep=KEEP_SNAPSHOTS):
+    # Les load_id sont horodatés : l'ordre alphabétique est l'ordre chronologique
+    snapshots = sorted(name for name in os.listdir(directory) if not name.endswith(".tmp"))
+    for name in snapshots[:-keep]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Écrit un instantané Parquet à partir d'un CSV scrapé.")
+    parser.add_argument("csv")
+    parser.add_argument("--directory", default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+
+    records = (normalize_record(record) for chunk in pd.read_csv(args.csv, chunksize=BATCH_SIZE) for record in chunk.to_dict("records"))
+    print(f"Snapshot written to {write_snapshot(records, new_load_id(), args.directory)}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,378 @@
+import json
+import math
+from urllib.parse import quote
+
 import scrapy
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider
+from twisted.internet import task, threads
+
+from steam_project.checkpoint import CrawlCheckpoint
+from steam_project.crawl_state import CrawlState
+from steam_project.frontier import MongoFrontier
+from steam_project.items import SteamProjectItem
+from steam_project.normalization import parse_int
+from steam_project.parsing import app_key, hover_tags, hover_url, parse_html, row_fields, search_rows, search_total
+from steam_project.profiles import apply_profile
+
+
+# Pages de recherche avant tous les hovers (dont la priorité va de -SEARCH_MAX_PAGES à 7, voir hover_priority)
+SEARCH_PRIORITY = 10
 
 
 class SteamSearchSpiderSpider(scrapy.Spider):
 
     name = "steam_search_spider"
-    
+
     # Urls utilisées pour débuter le scraping
-    allowed_domains = ["store.steampowered.com"]
-    start_urls = ["https://store.steampowered.com/search?term=&page=1&count=100"]
-    current_page = 1
-
-    def parse(self, response):
-        # Passer en revue chaque jeu sur la page de recherche en utilisant la classe search_result_row
-        for cit in response.xpath('//a[contains(@class, "search_result_row")]'):
-            # Extraire les informations importantes pour chaque jeu
-            id_value = cit.xpath('.//@data-ds-appid').get()
-            title_value = clean_spaces(cit.xpath('.//span[@class="title"]/text()').get())
-            thumbnail_link = cit.xpath('.//div[@class="search_capsule"]/img/@src').get()
-            release_value = clean_spaces(cit.xpath('.//div[@class="search_released responsive_secondrow"]/text()').get())
-            review_value = clean_spaces(cit.xpath('.//div[@class="search_reviewscore responsive_secondrow"]/span/@data-tooltip-html').get())
-
-            # Nettoyer review_value
-            if review_value is not None:
-                review_text = review_value.split("<br>")[0].strip()
-                review_score = review_value.split("<br>")[1].split(" ")[0].strip()[0:-1]
-                review_total = review_value.split("<br>")[1].split(" ")[3].strip()
+    allowed_domains = ["store.steampowered.com", "api.steampowered.com"]
+    search_url = "https://store.steampowered.com/search?term=&page={page}&count=100"
+    start_urls = [search_url.format(page=1)]
+
+    # Mode "json" (-a mode=json) : API de recherche et tags récupérés par lots depuis l'API du magasin
+    mode = "html"
+    results_url = "https://store.steampowered.com/search/results/?term=&start={start}&count=100&infinite=1"
+    tag_list_url = "https://api.steampowered.com/IStoreService/GetTagList/v1/?language=french"
+    store_items_url = "https://api.steampowered.com/IStoreBrowseService/GetItems/v1/?input_json={input_json}"
+
+    crawl_state = None
+    checkpoint = None
+    frontier = None
+    frontier_loop = None
+    worker_name = "local"
+
+    @classmethod
+    def update_settings(cls, settings):
+        super().update_settings(settings)
+        # Réglages du profil choisi avec -s CRAWL_PROFILE=... (polite par défaut)
+        apply_profile(settings)
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        # Créée avant l'ouverture des pipelines, qui finalisent le passage réparti avec elle
+        if crawler.settings.getbool("CRAWL_FRONTIER"):
+            spider.frontier = MongoFrontier.from_settings(crawler.settings)
+            # Nom du worker utilisable dans le chemin de l'export : -O "data/export.%(worker_name)s.csv"
+            spider.worker_name = spider.frontier.worker
+        return spider
+
+    def start_requests(self):
+        # Clé de chaque jeu déjà vu sur une page de recherche -> True si sa première ligne a demandé un hover
+        self.seen_apps = {}
+        if self.settings.get("CRAWL_STATE_FILE"):
+            self.crawl_state = CrawlState.from_settings(self.settings)
+
+        if self.mode == "html":
+            if self.frontier is not None:
+                yield from self.frontier_start_requests()
+            elif self.settings.getbool("CRAWL_RESUMABLE"):
+                yield from self.resumable_start_requests()
             else:
-                review_text = "No reviews"
-                review_score = "N/A"
-                review_total = "0"
+                yield from super().start_requests()
+        elif self.mode == "json":
+            if self.settings.getbool("CRAWL_RESUMABLE"):
+                self.logger.warning("CRAWL_RESUMABLE only applies to the html mode, the json mode crawl starts over")
+            if self.frontier is not None:
+                raise ValueError("CRAWL_FRONTIER only applies to the html mode")
+            # Le nom des tags n'est pas dans les réponses de l'API : on charge d'abord la liste complète
+            yield scrapy.Request(url=self.tag_list_url, callback=self.parse_tag_list, priority=2)
+        else:
+            raise ValueError(f"Unknown spider mode {self.mode!r} (expected html or json)")
+
+    # ================== Mode html ==========================================
+    def resumable_start_requests(self):
+        self.checkpoint = CrawlCheckpoint.from_settings(self.settings)
+        if not self.checkpoint.open_run():
+            self.checkpoint.schedule_page(1)
+            yield self.search_request(1)
+            return
+
+        # Reprise : les jeux déjà scrapés repartent dans les pipelines (requête data: locale, sans réseau),
+        # puis seules les pages et les hovers non terminés sont redemandés
+        counts = self.checkpoint.counts()
+        self.logger.info("Resuming crawl: %d/%d search pages and %d/%d games already done",
+                         counts["pages_done"], counts["pages"], counts["games_done"], counts["games"])
+        self.crawler.stats.set_value("checkpoint/resumed_items", counts["games_done"])
+        yield scrapy.Request("data:,", callback=self.replay_checkpoint, dont_filter=True, priority=SEARCH_PRIORITY + 1)
+        for page in self.checkpoint.pending_pages():
+            self.crawler.stats.inc_value("checkpoint/resumed_pages")
+            yield self.search_request(page)
+        for app_id in self.checkpoint.pending_games():
+            self.crawler.stats.inc_value("checkpoint/resumed_hovers")
+            yield scrapy.Request(url=hover_url(app_id), callback=self.parse_hover, cb_kwargs={"app_id": app_id})
+
+    def replay_checkpoint(self, response):
+        for item in self.checkpoint.done_items():
+            yield SteamProjectItem(**item)
+
+    def parse(self, response, page=1):
+        document = parse_html(response.text)
+        rows = search_rows(document)
+        max_pages = self.settings.getint("SEARCH_MAX_PAGES")
+
+        # Pagination : le numéro de page voyage avec la requête, pas dans l'état du spider
+        if page == 1:
+            # La première page donne le nombre total de résultats : toutes les autres pages sont planifiées d'un coup
+            total = search_total(document)
+            if total is not None and rows:
+                last_page = min(math.ceil(total / len(rows)), max_pages)
+                self.logger.info("%d results, scheduling %d search pages", total, last_page)
+                for next_page in range(2, last_page + 1):
+                    if self.should_schedule(next_page):
+                        yield from self.next_search(next_page)
+            elif rows and max_pages > 1 and self.should_schedule(2):
+                # Total introuvable (page modifiée par Steam) : on repasse à l'enchaînement page par page
+                self.logger.warning("Search result count not found, falling back to sequential pagination")
+                yield from self.next_search(2, sequential=True)
+        elif response.meta.get("sequential") and rows and page < max_pages and self.should_schedule(page + 1):
+            yield from self.next_search(page + 1, sequential=True)
+
+        # Passer en revue chaque jeu sur la page de recherche, puis parser sa page hover pour obtenir les tags
+        for row in rows:
+            fields = row_fields(row)
+            key = app_key(fields["app_id"])
+            if key in self.seen_apps:
+                # Les résultats se décalent pendant la pagination : un jeu déjà vu sur une autre page n'est pas redemandé
+                self.crawler.stats.inc_value("dedupe/duplicate_rows")
+                if self.seen_apps[key]:
+                    self.crawler.stats.inc_value("dedupe/saved_requests")
+                continue
+            if key is not None and "," in key:
+                self.crawler.stats.inc_value("dedupe/bundles")
+            if self.checkpoint is not None and self.checkpoint.game_known(fields["app_id"]):
+                # Page refaite après une reprise : ce jeu est déjà scrapé ou son hover est déjà planifié
+                self.seen_apps[key] = True
+                continue
+            tags = self.known_tags(fields)
+            self.seen_apps[key] = tags is None
+            priority = self.hover_priority(fields, page)
+            if self.frontier is not None:
+                # Scraping réparti : le hover devient un job de la frontière, dédoublonné par app_id entre les workers
+                self.frontier.push_game(fields, done=tags is not None, priority=priority)
+                if tags is not None:
+                    yield self.game_item(fields, tags)
+            elif tags is not None:
+                yield self.game_item(fields, tags)
+            else:
+                yield self.hover_request(fields, priority)
+
+        if self.checkpoint is not None:
+            self.checkpoint.page_done(page)
+        if self.frontier is not None:
+            self.frontier.done(response.meta["frontier_job"])
+
+    def should_schedule(self, page):
+        # Après une reprise, les pages déjà planifiées sont redemandées par le point de reprise lui-même
+        return self.checkpoint is None or not self.checkpoint.page_known(page)
+
+    def hover_priority(self, fields, page):
+        # CRAWL_PRIORITY : dans un scraping limité (temps, nombre de requêtes), les jeux les plus utiles passent d'abord
+        policy = self.settings.get("CRAWL_PRIORITY")
+        if policy == "reviews":
+            # Nombre de chiffres du nombre d'avis : 0 sans avis, 7 à partir d'un million
+            review_count = parse_int(fields["review_count"]) or 0
+            return len(str(review_count)) if review_count else 0
+        if policy == "rank":
+            # Ordre des résultats de recherche (pertinence Steam) : les premières pages d'abord
+            return -page
+        return 0
+
+    def next_search(self, page, sequential=False):
+        if self.frontier is not None:
+            self.frontier.push_page(page, sequential)
+        else:
+            yield self.search_request(page, sequential)
 
-            price_value = clean_spaces(cit.xpath('.//div[@class="discount_final_price"]/text()').get())
+    def search_request(self, page, sequential=False):
+        if self.checkpoint is not None:
+            self.checkpoint.schedule_page(page)
+        # Pages de recherche prioritaires sur les hovers : la liste complète des jeux est connue au plus tôt
+        return scrapy.Request(url=self.search_url.format(page=page), callback=self.parse, cb_kwargs={"page": page},
+                              meta={"sequential": sequential}, priority=SEARCH_PRIORITY)
 
-            # Construction de l'url du hover pour obtenir les tags
-            hover_url = f"https://store.steampowered.com/apphoverpublic/{id_value}?review_score_preference=0&l=french&ls[]=french&origin=https://store.steampowered.com&pagev6=true"
+    def hover_request(self, fields, priority=0):
+        if self.checkpoint is None:
+            return scrapy.Request(url=hover_url(fields["app_id"]), callback=self.parse_hover, cb_kwargs={"fields": fields},
+                                  priority=priority)
+        # Scraping avec reprise : les champs attendent dans le point de reprise, la requête ne porte que l'app_id
+        self.checkpoint.stash(fields)
+        return scrapy.Request(url=hover_url(fields["app_id"]), callback=self.parse_hover, cb_kwargs={"app_id": fields["app_id"]},
+                              priority=priority)
 
-            # Valeur par défaut pour les jeux sans prix
-            if price_value is None:
-                price_value = "Gratuit"
+    def parse_hover(self, response, fields=None, app_id=None):
+        if fields is None:
+            fields = self.checkpoint.take(app_id)
+        # Recuperer les tags depuis le hover
+        tags = hover_tags(parse_html(response.text))
+        self.remember(fields, tags)
+        yield self.game_item(fields, tags)
+        if self.frontier is not None:
+            self.frontier.done(response.meta["frontier_job"])
 
-            # Parser la page hover pour obtenir les tags
-            yield scrapy.Request(url=hover_url, callback=self.parse_hover, meta={'app_id': id_value, 'title': title_value, 'thumbnail_link': thumbnail_link, 'release': release_value, 'review_text': review_text, 'review_score': review_score, 'review_total': review_total, 'price': price_value})
-        
-        # Pagination
-        self.current_page += 1
+    def game_item(self, fields, tags):
+        if self.checkpoint is not None:
+            self.checkpoint.complete(fields, tags)
+        # Les valeurs sont encore du texte brut, SteamProjectPipeline les convertit en types natifs
+        return SteamProjectItem(**fields, tags=tags)
 
-        # Limiter aux 100 premières pages pour éviter de scraper tout Steam
-        if self.current_page > 100:
+    # ================== Scraping réparti (frontière MongoDB) ===============
+    def frontier_start_requests(self):
+        # Aucune requête de départ : les jobs sont réclamés à la frontière en continu, par lots de CRAWL_FRONTIER_PREFETCH
+        self.refilling = False
+        self.crawler.signals.connect(self.frontier_idle, signal=signals.spider_idle)
+        self.crawler.signals.connect(self.frontier_dropped, signal=signals.request_dropped)
+        self.crawler.signals.connect(self.frontier_callback_failed, signal=signals.spider_error)
+        opening = threads.deferToThread(self.frontier.open)
+        opening.addCallbacks(self.frontier_opened, self.frontier_unavailable)
+        yield from ()
+
+    def frontier_opened(self, status):
+        self.logger.info("Worker %s joined crawl run %s (%s)", self.frontier.worker, self.frontier.run_id, status)
+        self.frontier_loop = task.LoopingCall(self.refill)
+        self.frontier_loop.start(self.settings.getfloat("CRAWL_FRONTIER_POLL_INTERVAL"))
+
+    def frontier_unavailable(self, failure):
+        self.logger.error("Cannot join crawl run %s: %s", self.frontier.run_id, failure.getErrorMessage())
+        self.crawler.engine.close_spider(self, "frontier_unavailable")
+
+    def refill(self):
+        if self.refilling:
             return
+        self.refilling = True
+        wanted = self.settings.getint("CRAWL_FRONTIER_PREFETCH") - len(self.frontier.held)
+        claiming = threads.deferToThread(self.frontier.sync_and_claim, wanted)
+        claiming.addCallbacks(self.schedule_jobs, self.frontier_error)
+        claiming.addBoth(self.refilled)
+
+    def refilled(self, result):
+        self.refilling = False
+
+    def frontier_error(self, failure):
+        self.logger.error("Frontier unavailable: %s", failure.getErrorMessage())
+
+    def schedule_jobs(self, jobs):
+        for job in jobs:
+            self.crawler.stats.inc_value(f"frontier/claimed/{job['kind']}")
+            self.crawler.engine.crawl(self.job_request(job))
+
+    def job_request(self, job):
+        if job["kind"] == "page":
+            request = self.search_request(job["page"], job["sequential"])
+        else:
+            request = self.hover_request(job["fields"], job["priority"])
+        # La frontière dédoublonne les jobs : un job repris après expiration de son bail ne doit pas être filtré
+        return request.replace(dont_filter=True, errback=self.frontier_failed, meta={**request.meta, "frontier_job": job["_id"]})
+
+    def frontier_failed(self, failure):
+        self.crawler.stats.inc_value("frontier/released")
+        self.frontier.release(failure.request.meta["frontier_job"])
+
+    def frontier_dropped(self, request, spider):
+        if "frontier_job" in request.meta:
+            self.crawler.stats.inc_value("frontier/released")
+            self.frontier.release(request.meta["frontier_job"])
+
+    def frontier_callback_failed(self, failure, response, spider):
+        # Callback en échec (page modifiée par Steam, point de reprise incohérent) : le job n'est jamais terminé,
+        # il revient dans la file au lieu de rester réclamé par ce worker et de bloquer la fin du passage
+        if "frontier_job" in response.meta:
+            self.crawler.stats.inc_value("frontier/released")
+            self.frontier.release(response.meta["frontier_job"])
+
+    def frontier_idle(self, spider):
+        # Le worker s'arrête quand la frontière est vide pour tous les workers (pas seulement pour lui)
+        if not self.frontier.exhausted or self.frontier.held or self.frontier.has_unsynced():
+            raise DontCloseSpider
+
+    # ================== Mode json ==========================================
+    def parse_tag_list(self, response):
+        self.tag_names = {tag["tagid"]: tag["name"] for tag in response.json()["response"]["tags"]}
+        yield self.results_request(0)
+
+    def results_request(self, start):
+        return scrapy.Request(url=self.results_url.format(start=start), callback=self.parse_results,
+                              cb_kwargs={"start": start}, priority=1)
+
+    def parse_results(self, response, start):
+        # Même découpage que le mode html, mais sur le fragment results_html : pas de page complète à parser
+        data = response.json()
+        rows = [row_fields(row) for row in search_rows(parse_html(data.get("results_html")))]
+        max_pages = self.settings.getint("SEARCH_MAX_PAGES")
+
+        if start == 0 and rows:
+            total = min(data.get("total_count", 0), max_pages * len(rows))
+            self.logger.info("%d results, scheduling %d search pages", data.get("total_count", 0), math.ceil(total / len(rows)))
+            for next_start in range(len(rows), total, len(rows)):
+                yield self.results_request(next_start)
+
+        # Jeux inchangés depuis le dernier passage (mode incrémental) : pas de requête
+        pending = []
+        for fields in rows:
+            tags = self.known_tags(fields)
+            if tags is None:
+                pending.append(fields)
+            else:
+                yield SteamProjectItem(**fields, tags=tags)
+
+        # Une requête à l'API du magasin par lot de jeux, au lieu d'un hover par jeu
+        batch_size = self.settings.getint("STEAM_API_BATCH_SIZE")
+        for offset in range(0, len(pending), batch_size):
+            yield self.store_items_request(pending[offset:offset + batch_size])
+
+    def store_items_request(self, rows):
+        input_json = {
+            # Les lots et packs ont un data-ds-appid composé ("10,80") : ils n'ont pas de tags dans l'API
+            "ids": [{"appid": int(row["app_id"])} for row in rows if (row["app_id"] or "").isdigit()],
+            "context": {"language": "french", "country_code": "FR"},
+            "data_request": {"include_tag_count": 20},
+        }
+        url = self.store_items_url.format(input_json=quote(json.dumps(input_json, separators=(",", ":"))))
+        return scrapy.Request(url=url, callback=self.parse_store_items, cb_kwargs={"rows": rows})
+
+    def parse_store_items(self, response, rows):
+        store_items = {item["appid"]: item for item in response.json()["response"].get("store_items", [])}
+        for fields in rows:
+            store_item = store_items.get(int(fields["app_id"]), {}) if (fields["app_id"] or "").isdigit() else {}
+            # Tags triés par poids décroissant, comme dans le hover
+            tag_ids = [tag["tagid"] for tag in sorted(store_item.get("tags", []), key=lambda tag: -tag.get("weight", 0))]
+            tags = [self.tag_names[tag_id] for tag_id in tag_ids if tag_id in self.tag_names]
+            self.remember(fields, tags)
+            yield SteamProjectItem(**fields, tags=tags)
+
+    # ================== Scraping incrémental ===============================
+    def known_tags(self, fields):
+        if self.crawl_state is None or not self.settings.getbool("CRAWL_INCREMENTAL"):
+            return None
+        return self.crawl_state.known_tags(fields)
+
+    def remember(self, fields, tags):
+        if self.crawl_state is not None:
+            self.crawl_state.remember(fields, tags)
+
+    def frontier_left(self, last_worker, reason):
+        self.logger.info("Worker %s left crawl run %s (%s)%s: %s", self.frontier.worker, self.frontier.run_id, reason,
+                         ", last worker" if last_worker else "", json.dumps(self.frontier.counts))
+        for key, value in self.frontier.counts.items():
+            self.crawler.stats.set_value(f"frontier/{key}", value)
 
-        next_page_url = f"https://store.steampowered.com/search?term=&page={self.current_page}&count=100"
-        yield scrapy.Request(url=next_page_url, callback=self.parse)
-
-    def parse_hover(self, response):
-        # Redefinir les valeurs extraites précédemment
-        app_id = response.meta['app_id']
-        title = response.meta['title']
-        release = response.meta['release']
-        price = response.meta['price']
-        thumbnail_link = response.meta['thumbnail_link']
-        review_text = response.meta['review_text']
-        review_score = response.meta['review_score']
-        review_total = response.meta['review_total']
-
-        # Recuperer les tags depuis le hover un par un
-        tags = []
-        for tag in response.xpath('.//div[@class="app_tag"]/text()'):
-            tags.append(clean_spaces(tag.get()))
-        print(tags)
-
-        yield {'app_id': app_id, 'title': title, 'thumbnail_link': thumbnail_link, 'release': release, 'review_text': review_text, 'review_score': review_score, 'review_total': review_total, 'price': price, 'tags': tags}
-
-# Fonction pour retirer les espaces inutiles
-def clean_spaces(string_):
-    if string_ is not None:
-        return " ".join(string_.split())
\ No newline at end of file
+    def closed(self, reason):
+        leaving = None
+        if self.frontier is not None:
+            if self.frontier_loop is not None and self.frontier_loop.running:
+                self.frontier_loop.stop()
+            leaving = threads.deferToThread(self.frontier.leave, reason == "finished")
+            leaving.addCallback(self.frontier_left, reason)
+        if self.checkpoint is not None:
+            # Un passage arrêté avant la fin (arrêt demandé, processus tué) sera repris au prochain lancement
+            if reason == "finished":
+                self.checkpoint.finish()
+            counts = self.checkpoint.counts()
+            self.logger.info("Checkpoint: %d/%d search pages and %d/%d games done (%s)",
+                             counts["pages_done"], counts["pages"], counts["games_done"], counts["games"], reason)
+            self.checkpoint.close()
+        if self.crawl_state is not None:
+            self.logger.info("Crawl state: %d games fetched, %d unchanged games skipped", self.crawl_state.fetched, self.crawl_state.skipped)
+            self.crawler.stats.set_value("incremental/skipped", self.crawl_state.skipped)
+            self.crawl_state.close()
+        return leaving